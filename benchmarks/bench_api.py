@@ -0,0 +1,150 @@
+import sys
+import time
+import argparse
+import contextlib
+import threading
+
+from ubeefresh import api as ufdapi
+from ubeefresh.metrics import MetricsRegistry
+
+from .fake_freshdesk import FakeFreshdesk
+from .synthetic import synthetic_portal
+
+SCENARIOS = ('read', 'push', 'delete')
+
+
+def percentile(values: list, q: float) -> float:
+    if len(values) == 0:
+        return 0.0
+
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = list()
+        self._lock = threading.Lock()
+
+    def __call__(self, res, *args, **kwargs):
+        with self._lock:
+            self.latencies.append(res.elapsed.total_seconds())
+
+
+def make_client(server: FakeFreshdesk,
+                rate_limit: float = None,
+                hedge: bool = False) -> (ufdapi.UbeeFreshAPI, Recorder):
+
+    fd = ufdapi.UbeeFreshAPI(base_url=server.base_url, rate_limit=rate_limit, metrics=MetricsRegistry(), hedge=hedge)
+
+    recorder = Recorder()
+    fd._session.hooks['response'].append(recorder)
+
+    return fd, recorder
+
+
+def run_scenario(scenario: str,
+                 n_articles: int,
+                 langs: tuple = ('fr', 'de'),
+                 latency: float = 0.0,
+                 jitter: float = 0.0,
+                 server_rate_limit: int = None,
+                 rate_limit: float = None,
+                 jobs: int = 8,
+                 hedge: bool = False) -> dict:
+
+    with FakeFreshdesk(latency=latency, jitter=jitter, rate_limit=server_rate_limit, langs=langs) as server:
+        if scenario in ('read', 'delete'):
+            server.generate(n_articles)
+
+        fd, recorder = make_client(server, rate_limit=rate_limit, hedge=hedge)
+        recorder.latencies.clear()
+        requests_before = server.requests
+
+        # The library prints progress, keep the report readable
+        with contextlib.redirect_stdout(None):
+            start = time.perf_counter()
+
+            if scenario == 'read':
+                fd.read_portal('Benchmark', verbosity=0)
+
+            elif scenario == 'push':
+                portal = synthetic_portal(n_articles, langs=langs)
+                start = time.perf_counter()
+                for category in portal.categories:
+                    fd.create_category(category=category, create_folders=True, create_translations=True)
+
+            elif scenario == 'delete':
+                for category_id in list(server.nodes['categories']):
+                    fd.delete_subtree(category_id=category_id, max_workers=jobs, verbosity=0)
+
+            else:
+                raise ValueError('Unknown scenario {}'.format(scenario))
+
+            elapsed = time.perf_counter() - start
+
+    n_requests = server.requests - requests_before
+
+    return {
+        'scenario': scenario,
+        'articles': n_articles,
+        'requests': n_requests,
+        'seconds': elapsed,
+        'req_per_s': n_requests / elapsed if elapsed > 0 else 0.0,
+        'articles_per_s': n_articles / elapsed if elapsed > 0 else 0.0,
+        'p50_ms': percentile(recorder.latencies, 0.50) * 1e3,
+        'p99_ms': percentile(recorder.latencies, 0.99) * 1e3,
+        'retries': sum(stats['retries'] for stats in fd.metrics.snapshot().values())
+    }
+
+
+def print_report(results: list, file=sys.stdout):
+    header = '{:<8} {:>8} {:>9} {:>9} {:>10} {:>11} {:>9} {:>9} {:>8}'.format(
+        'scenario', 'articles', 'requests', 'seconds', 'req/s', 'articles/s', 'p50 ms', 'p99 ms', 'retries')
+
+    print(header, file=file)
+    print('-' * len(header), file=file)
+
+    for r in results:
+        print('{:<8} {:>8} {:>9} {:>9.2f} {:>10.1f} {:>11.1f} {:>9.2f} {:>9.2f} {:>8}'.format(
+            r['scenario'], r['articles'], r['requests'], r['seconds'], r['req_per_s'], r['articles_per_s'],
+            r['p50_ms'], r['p99_ms'], r['retries']), file=file)
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description='Benchmark UbeeFreshAPI against a local Freshdesk stand-in.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000],
+                        help='synthetic portal sizes in articles, e.g. 1000 10000 100000')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--langs', nargs='*', default=['fr', 'de'])
+    parser.add_argument('--latency', type=float, default=0.0, help='server-side latency per call in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random server-side latency, up to this many seconds')
+    parser.add_argument('--server-rate-limit', type=int, default=None, help='calls per minute before the server 429s')
+    parser.add_argument('--rate-limit', type=float, default=None, help='client-side rate limit in calls per minute')
+    parser.add_argument('--jobs', type=int, default=8, help='parallelism for concurrent scenarios')
+    parser.add_argument('--hedge', action='store_true', help='duplicate slow GETs after their p95 latency')
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in args.sizes:
+        for scenario in args.scenarios:
+            results.append(run_scenario(
+                scenario,
+                size,
+                langs=tuple(args.langs),
+                latency=args.latency,
+                jitter=args.jitter,
+                server_rate_limit=args.server_rate_limit,
+                rate_limit=args.rate_limit,
+                jobs=args.jobs,
+                hedge=args.hedge))
+
+            print_report(results[-1:], file=sys.stderr)
+
+    print_report(results)
+
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import contextlib
+import subprocess
+import tracemalloc
+
+from ubeefresh import ubeefresh as uf
+from ubeefresh import transport
+from ubeefresh.sheets import UbeeSheet
+
+from .synthetic import markdown_body, synthetic_grid
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+
+def measure(func, repeat: int = 3) -> dict:
+    # Best-of timing first, then a separate traced run for the memory peak (tracing slows things down)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'seconds': min(timings), 'peak_kb': peak / 1024}
+
+
+def build_stages(n_rows: int, langs: tuple, workdir: str) -> dict:
+    rnd = random.Random(0)
+    bodies = [markdown_body(rnd, paragraphs=2) for _ in range(n_rows)]
+    grid = synthetic_grid(n_rows, langs=langs)
+
+    with contextlib.redirect_stdout(None):
+        category = uf.UbeeFreshPortal.parse_sheet(grid, gs_id='bench', sheet_title='Bench', sheet_id=0)
+
+    sheet = UbeeSheet(name='Bench', data=grid)
+
+    portal = uf.UbeeFreshPortal(name='Benchmark')
+    portal.add_category(category)
+
+    # A listing page as Freshdesk returns it: HTML bodies and their text version
+    page = [{'id': i, 'title': 'Article {}'.format(i), 'description': uf.filter_article_contents(body),
+             'description_text': uf.textify(body), 'status': 2, 'type': 1, 'folder_id': 1}
+            for i, body in enumerate(bodies)]
+    page_bytes = json.dumps(page).encode('utf-8')
+
+    snapshot = os.path.join(workdir, 'portal.p')
+    preview = os.path.join(workdir, 'preview.html')
+    portal.save(snapshot)
+
+    def quiet(func):
+        def wrapper():
+            with contextlib.redirect_stdout(None):
+                return func()
+        return wrapper
+
+    return {
+        'textify': lambda: [uf.textify(body) for body in bodies],
+        'filter_article_contents': lambda: [uf.filter_article_contents(body) for body in bodies],
+        'parse_sheet': quiet(lambda: uf.UbeeFreshPortal.parse_sheet(grid, gs_id='bench', sheet_title='Bench',
+                                                                    sheet_id=0)),
+        'json_decode': lambda: transport.json_loads(page_bytes),
+        'json_decode_stdlib': lambda: json.loads(page_bytes.decode('utf-8')),
+        'json_encode': lambda: transport.json_dumps(page),
+        'json_encode_stdlib': lambda: json.dumps(page).encode('utf-8'),
+        'sheet_scan': lambda: [sum(1 for value in sheet.col(i) if value != '') for i in range(sheet.w)],
+        'render_preview': quiet(lambda: portal.render_preview(preview)),
+        'save': lambda: portal.save(snapshot),
+        'load': lambda: uf.UbeeFreshPortal.load(snapshot)
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(BASELINE_DIR)).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(n_rows: int = 500, langs: tuple = ('fr', 'de'), repeat: int = 3, stages: list = None) -> dict:
+    results = {}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        available = build_stages(n_rows, langs, workdir)
+
+        for name, func in available.items():
+            if stages is not None and name not in stages:
+                continue
+
+            results[name] = measure(func, repeat=repeat)
+            print('{:<24} {:>9.2f} ms {:>10.0f} KB'.format(
+                name, results[name]['seconds'] * 1e3, results[name]['peak_kb']), file=sys.stderr)
+
+    return {
+        'rows': n_rows,
+        'langs': list(langs),
+        'python': platform.python_version(),
+        'json_codec': transport.JSON_CODEC,
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'stages': results
+    }
+
+
+def baseline_path(name: str) -> str:
+    return name if name.endswith('.json') else os.path.join(BASELINE_DIR, '{}.json'.format(name))
+
+
+def save_baseline(report: dict, name: str):
+    path = baseline_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, 'w') as of:
+        json.dump(report, of, indent=2, sort_keys=True)
+
+    print('Saved baseline to {}'.format(path))
+
+
+def compare(report: dict, name: str, file=sys.stdout):
+    with open(baseline_path(name)) as f:
+        baseline = json.load(f)
+
+    if baseline.get('rows') != report.get('rows') or baseline.get('langs') != report.get('langs'):
+        print('Warning: baseline was measured on {} rows / {}'.format(baseline.get('rows'), baseline.get('langs')),
+              file=file)
+
+    print('{:<24} {:>11} {:>11} {:>8} {:>11} {:>11} {:>8}'.format(
+        'stage', 'base ms', 'now ms', 'delta', 'base KB', 'now KB', 'delta'), file=file)
+
+    for stage, now in report['stages'].items():
+        base = baseline['stages'].get(stage)
+        if base is None:
+            print('{:<24} {:>11} {:>11.2f}'.format(stage, '-', now['seconds'] * 1e3), file=file)
+            continue
+
+        print('{:<24} {:>11.2f} {:>11.2f} {:>+7.1f}% {:>11.0f} {:>11.0f} {:>+7.1f}%'.format(
+            stage,
+            base['seconds'] * 1e3, now['seconds'] * 1e3, 100 * (now['seconds'] / base['seconds'] - 1),
+            base['peak_kb'], now['peak_kb'], 100 * (now['peak_kb'] / base['peak_kb'] - 1) if base['peak_kb'] else 0),
+            file=file)
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description='CPU micro-benchmarks for parsing, text extraction, '
+                                                 'rendering and snapshots.')
+    parser.add_argument('--rows', type=int, default=500, help='article rows in the synthetic sheet')
+    parser.add_argument('--langs', nargs='*', default=['fr', 'de'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--stages', nargs='+', default=None)
+    parser.add_argument('--save-baseline', metavar='NAME', help='store results under benchmarks/baselines/NAME.json')
+    parser.add_argument('--compare', metavar='NAME', help='compare against a stored baseline')
+    args = parser.parse_args(argv)
+
+    report = run(n_rows=args.rows, langs=tuple(args.langs), repeat=args.repeat, stages=args.stages)
+
+    if args.compare is not None:
+        compare(report, args.compare)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.save_baseline is not None:
+        save_baseline(report, args.save_baseline)
+
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+HEAVY = ('gspread', 'oauth2client', 'markdown2', 'bs4', 'lxml', 'multiprocessing')
+
+# Entry points used by short-lived jobs and what they must not drag in at import time
+GUARDS = {
+    'ubeefresh': HEAVY + ('requests',),
+    'ubeefresh.api': HEAVY,
+    'ubeefresh.ubeefresh': HEAVY + ('requests',),
+    'ubeefresh.sheets': HEAVY + ('requests',),
+    'ubeefresh.export': HEAVY + ('requests',),
+}
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_profile(module: str) -> dict:
+    # A fresh interpreter per module, -X importtime reports self and cumulative microseconds per import
+    code = 'import sys, json, {m}; print(json.dumps(sorted(sys.modules)))'.format(m=module)
+    res = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, capture_output=True, text=True,
+                         env=dict(os.environ, PYTHONPATH=ROOT))
+
+    if res.returncode != 0:
+        raise RuntimeError('Importing {} failed:\n{}'.format(module, res.stderr))
+
+    timings = []
+    for line in res.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+
+        self_us, cumulative_us, name = [part.strip() for part in line[len('import time:'):].split('|')]
+        timings.append({'module': name, 'self_us': int(self_us), 'cumulative_us': int(cumulative_us)})
+
+    top = [t for t in timings if t['module'] == module]
+
+    return {
+        'module': module,
+        'total_ms': top[-1]['cumulative_us'] / 1e3 if len(top) > 0 else 0.0,
+        'slowest': sorted(timings, key=lambda t: t['self_us'], reverse=True)[:10],
+        'loaded': json.loads(res.stdout.strip().splitlines()[-1])
+    }
+
+
+def check(profile: dict, forbidden: tuple, budget_ms: float = None) -> list:
+    problems = []
+
+    for name in forbidden:
+        if any(m == name or m.startswith(name + '.') for m in profile['loaded']):
+            problems.append('{} imports {}'.format(profile['module'], name))
+
+    if budget_ms is not None and profile['total_ms'] > budget_ms:
+        problems.append('{} took {:.1f} ms to import, budget is {:.1f} ms'.format(
+            profile['module'], profile['total_ms'], budget_ms))
+
+    return problems
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description='Measure and guard the import time of ubeefresh entry points.')
+    parser.add_argument('--modules', nargs='+', default=list(GUARDS))
+    parser.add_argument('--repeat', type=int, default=3, help='best-of runs per module')
+    parser.add_argument('--budget-ms', type=float, default=None, help='fail when an import takes longer than this')
+    parser.add_argument('--top', type=int, default=5, help='slowest imports to list per module')
+    args = parser.parse_args(argv)
+
+    problems = []
+
+    for module in args.modules:
+        profile = min([import_profile(module) for _ in range(args.repeat)], key=lambda p: p['total_ms'])
+
+        print('{:<24} {:>9.1f} ms {:>5} modules'.format(module, profile['total_ms'], len(profile['loaded'])))
+        for t in profile['slowest'][:args.top]:
+            print('    {:<40} {:>9.1f} ms self'.format(t['module'], t['self_us'] / 1e3))
+
+        problems += check(profile, GUARDS.get(module, HEAVY), args.budget_ms)
+
+    for problem in problems:
+        print('FAIL: {}'.format(problem), file=sys.stderr)
+
+    return 1 if len(problems) > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,358 @@
+import re
+import json
+import time
+import random
+import threading
+from collections import deque
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+CHILDREN = {'categories': 'folders', 'folders': 'articles'}
+
+_PATH_RE = re.compile(r'^/api/v2/solutions/(categories|folders|articles)(?:/(\d+))?(?:/([a-z]{2}(?:-[a-zA-Z]{2})?|folders|articles))?/?$')
+
+
+class FakeFreshdesk:
+    def __init__(self,
+                 latency: float = 0.0,
+                 jitter: float = 0.0,
+                 rate_limit: int = None,
+                 primary_lang: str = 'en',
+                 langs: tuple = ('fr', 'de'),
+                 strict_delete: bool = True,
+                 body_size: int = 20,
+                 host: str = '127.0.0.1',
+                 port: int = 0):
+
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.primary_lang = primary_lang
+        self.langs = list(langs)
+        self.strict_delete = strict_delete
+        self.body_size = body_size
+
+        # id -> record, translations are (kind, id) -> {lang: record}
+        self.nodes = {'categories': dict(), 'folders': dict(), 'articles': dict()}
+        self.children = {'categories': dict(), 'folders': dict()}
+        self.translations = dict()
+
+        # (method, path) -> status code answered instead, e.g. ('DELETE', '/api/v2/solutions/articles/1005'): 500
+        self.faults = dict()
+
+        self.requests = 0
+        self._next_id = 1000
+        self._window = deque()
+        self._lock = threading.Lock()
+
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    def __repr__(self):
+        return '<FakeFreshdesk[{}, {} categories, {} folders, {} articles]>'.format(
+            self.base_url, len(self.nodes['categories']), len(self.nodes['folders']), len(self.nodes['articles']))
+
+    @property
+    def base_url(self) -> str:
+        return 'http://{}:{}/api/'.format(*self._server.server_address[:2])
+
+    def start(self) -> 'FakeFreshdesk':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'FakeFreshdesk':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+        return False
+
+    # -------------------------------------------------------
+    # Data
+
+    def _new_id(self) -> int:
+        self._next_id += 1
+        return self._next_id
+
+    def add(self, kind: str, record: dict, parent_id: int = None) -> dict:
+        record = dict(record)
+        record['id'] = self._new_id()
+        record['created_at'] = record['updated_at'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+
+        if kind == 'folders':
+            record['category_id'] = parent_id
+        elif kind == 'articles':
+            record['folder_id'] = parent_id
+            record.setdefault('status', 2)
+            record.setdefault('type', 1)
+
+        self.nodes[kind][record['id']] = record
+
+        if kind in self.children:
+            self.children[kind][record['id']] = list()
+
+        if parent_id is not None:
+            self.children['categories' if kind == 'folders' else 'folders'][parent_id].append(record['id'])
+
+        return record
+
+    def generate(self,
+                 n_articles: int,
+                 articles_per_folder: int = 20,
+                 folders_per_category: int = 10,
+                 translated: float = 1.0,
+                 seed: int = 0) -> 'FakeFreshdesk':
+
+        # Descriptions are rendered on request so that 100k-article portals stay small in memory
+        rnd = random.Random(seed)
+
+        n_folders = max(1, -(-n_articles // articles_per_folder))
+        n_categories = max(1, -(-n_folders // folders_per_category))
+
+        article_no = 0
+        for ic in range(n_categories):
+            category = self.add('categories', {'name': 'Category {}'.format(ic), 'description': 'Category {}'.format(ic),
+                                               'visible_in_portals': [1]})
+            self._generate_translations('categories', category['id'], translated, rnd)
+
+            for jf in range(folders_per_category):
+                if article_no >= n_articles:
+                    break
+
+                folder = self.add('folders', {'name': 'Folder {}.{}'.format(ic, jf), 'description': None,
+                                              'visibility': 1}, parent_id=category['id'])
+                self._generate_translations('folders', folder['id'], translated, rnd)
+
+                for ka in range(articles_per_folder):
+                    if article_no >= n_articles:
+                        break
+
+                    article = self.add('articles', {'title': 'Article {}'.format(article_no)}, parent_id=folder['id'])
+                    self._generate_translations('articles', article['id'], translated, rnd)
+
+                    article_no += 1
+
+        return self
+
+    def _generate_translations(self, kind: str, node_id: int, translated: float, rnd: random.Random):
+        for lang in self.langs:
+            if rnd.random() < translated:
+                node = self.nodes[kind][node_id]
+                record = {key: value for key, value in node.items() if key in ('id', 'name', 'description', 'title',
+                                                                                'status', 'type')}
+                if 'name' in record:
+                    record['name'] = '{} [{}]'.format(record['name'], lang)
+                if 'title' in record:
+                    record['title'] = '{} [{}]'.format(record['title'], lang)
+
+                self.translations.setdefault((kind, node_id), dict())[lang] = record
+
+    def _render(self, kind: str, record: dict, lang: str = None) -> dict:
+        if kind == 'articles' and 'description' not in record:
+            record = dict(record)
+            record['description'] = ''.join(
+                '<p>Paragraph {} of article {} ({}) with <b>some</b> markup and a <a href="#">link</a>.</p>'.format(
+                    i, record['id'], lang if lang is not None else self.primary_lang)
+                for i in range(self.body_size))
+            record['description_text'] = record['description']
+
+        return record
+
+    # -------------------------------------------------------
+    # HTTP
+
+    def _throttled(self) -> float:
+        if self.rate_limit is None:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            while len(self._window) > 0 and now - self._window[0] > 60.0:
+                self._window.popleft()
+
+            if len(self._window) >= self.rate_limit:
+                return 60.0 - (now - self._window[0])
+
+            self._window.append(now)
+
+        return 0.0
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            # Headers and body go out in separate writes, avoid delayed-ACK stalls on keep-alive
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, code: int, data=None, headers: dict = None):
+                body = json.dumps(data).encode() if data is not None else b''
+
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in (headers if headers is not None else {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _body(self) -> dict:
+                n = int(self.headers.get('Content-Length', 0))
+                return json.loads(self.rfile.read(n)) if n > 0 else dict()
+
+            def _handle(self, method: str):
+                body = self._body() if method in ('POST', 'PUT') else None
+
+                with fake._lock:
+                    fake.requests += 1
+
+                if fake.latency > 0 or fake.jitter > 0:
+                    time.sleep(fake.latency + random.random() * fake.jitter)
+
+                wait = fake._throttled()
+                if wait > 0:
+                    return self._reply(429, {'message': 'Rate limit exceeded'}, {'Retry-After': '{:.0f}'.format(wait + 1)})
+
+                url = urlsplit(self.path)
+                query = parse_qs(url.query)
+
+                if url.path.rstrip('/') == '/api/v2/settings/helpdesk':
+                    if method != 'GET':
+                        return self._reply(405, {'message': 'Method not allowed'})
+
+                    return self._reply(200, {'primary_language': fake.primary_lang,
+                                             'supported_languages': fake.langs,
+                                             'portal_languages': fake.langs})
+
+                fault = fake.faults.get((method, url.path.rstrip('/')))
+                if fault is not None:
+                    return self._reply(fault, {'message': 'Injected failure'})
+
+                match = _PATH_RE.match(url.path)
+                if match is None:
+                    return self._reply(404, {'message': 'Not found'})
+
+                kind, node_id, tail = match.group(1), match.group(2), match.group(3)
+                node_id = int(node_id) if node_id is not None else None
+
+                with fake._lock:
+                    code, data = fake.dispatch(method, kind, node_id, tail, body, query)
+
+                self._reply(code, data)
+
+            def do_GET(self):
+                self._handle('GET')
+
+            def do_POST(self):
+                self._handle('POST')
+
+            def do_PUT(self):
+                self._handle('PUT')
+
+            def do_DELETE(self):
+                self._handle('DELETE')
+
+        return Handler
+
+    def dispatch(self, method: str, kind: str, node_id: int, tail: str, body: dict, query: dict):
+        not_found = (404, {'message': 'Not found'})
+        page = int(query.get('page', ['1'])[0])
+        per_page = min(int(query.get('per_page', ['30'])[0]), 100)
+
+        def duplicate():
+            return 409, {'description': 'Validation failed',
+                         'errors': [{'field': 'name', 'message': 'It should be a unique value', 'code': 'duplicate_value'}]}
+
+        # Listing: /categories, /categories/{id}/folders, /folders/{id}/articles
+        if node_id is None or tail in ('folders', 'articles'):
+            if node_id is None and kind != 'categories':
+                return not_found
+
+            if node_id is not None and (CHILDREN.get(kind) != tail or node_id not in self.nodes[kind]):
+                return not_found
+
+            child_kind = tail if node_id is not None else 'categories'
+            ids = self.children[kind][node_id] if node_id is not None else list(self.nodes['categories'])
+
+            if method == 'GET':
+                chunk = ids[(page - 1) * per_page:page * per_page]
+                return 200, [self._render(child_kind, self.nodes[child_kind][i]) for i in chunk]
+
+            if method == 'POST':
+                key = 'title' if child_kind == 'articles' else 'name'
+                if any(self.nodes[child_kind][i].get(key) == body.get(key) for i in ids):
+                    return duplicate()
+
+                return 201, self.add(child_kind, body, parent_id=node_id)
+
+            return 405, {'message': 'Method not allowed'}
+
+        if node_id not in self.nodes[kind]:
+            return not_found
+
+        node = self.nodes[kind][node_id]
+
+        # Translations: /{kind}/{id}/{lang}
+        if tail is not None:
+            translations = self.translations.setdefault((kind, node_id), dict())
+
+            if method == 'GET':
+                if tail not in translations:
+                    return not_found
+                return 200, self._render(kind, translations[tail], lang=tail)
+
+            if method == 'POST':
+                if tail in translations:
+                    return duplicate()
+                translations[tail] = dict(body, id=node_id)
+                return 201, translations[tail]
+
+            if method == 'PUT':
+                if tail not in translations:
+                    return not_found
+                translations[tail].update(body)
+                return 200, translations[tail]
+
+            return 405, {'message': 'Method not allowed'}
+
+        if method == 'GET':
+            return 200, self._render(kind, node)
+
+        if method == 'PUT':
+            node.update(body)
+            node['updated_at'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+            return 200, self._render(kind, node)
+
+        if method == 'DELETE':
+            if kind in self.children and len(self.children[kind][node_id]) > 0 and self.strict_delete:
+                return 405, {'message': 'Not empty'}
+
+            self._remove(kind, node_id)
+            return 204, None
+
+        return 405, {'message': 'Method not allowed'}
+
+    def _remove(self, kind: str, node_id: int):
+        node = self.nodes[kind].pop(node_id)
+        self.translations.pop((kind, node_id), None)
+
+        for child_id in self.children.get(kind, dict()).pop(node_id, []):
+            self._remove(CHILDREN[kind], child_id)
+
+        parent = node.get('category_id') if kind == 'folders' else node.get('folder_id')
+        if parent is not None:
+            siblings = self.children['categories' if kind == 'folders' else 'folders'].get(parent, [])
+            if node_id in siblings:
+                siblings.remove(node_id)
@@ -0,0 +1,100 @@
+import random
+
+from ubeefresh import ubeefresh as uf
+
+WORDS = ['account', 'booking', 'car', 'cancel', 'driver', 'fuel', 'insurance', 'invoice', 'key', 'licence',
+         'parking', 'payment', 'refund', 'reservation', 'station', 'subscription', 'trip', 'vehicle', 'damage']
+
+
+def sentence(rnd: random.Random, n: int = 12) -> str:
+    return ' '.join(rnd.choice(WORDS) for _ in range(n)).capitalize() + '.'
+
+
+def markdown_body(rnd: random.Random, paragraphs: int = 4) -> str:
+    parts = []
+    for i in range(paragraphs):
+        parts.append(sentence(rnd, 20) + ' **' + rnd.choice(WORDS) + '** and *' + rnd.choice(WORDS) + '*.')
+        parts.append('\n'.join('- ' + sentence(rnd, 6) for _ in range(3)))
+        parts.append('See [the {} page](https://example.com/{}).'.format(rnd.choice(WORDS), i))
+
+    return '\n\n'.join(parts)
+
+
+def synthetic_portal(n_articles: int,
+                     langs: tuple = ('fr', 'de'),
+                     articles_per_folder: int = 20,
+                     folders_per_category: int = 10,
+                     seed: int = 0) -> uf.UbeeFreshPortal:
+
+    rnd = random.Random(seed)
+    portal = uf.UbeeFreshPortal(name='Synthetic {}'.format(n_articles))
+
+    article_no = 0
+    ic = 0
+    while article_no < n_articles:
+        category = uf.UbeeFreshCategory(name='Category {}'.format(ic), desc=sentence(rnd))
+        for lang in langs:
+            category.add_translation(lang, uf.UbeeFreshCategory(name='Category {} [{}]'.format(ic, lang), lang=lang))
+        portal.add_category(category)
+
+        for jf in range(folders_per_category):
+            if article_no >= n_articles:
+                break
+
+            folder = uf.UbeeFreshFolder(name='Folder {}.{}'.format(ic, jf))
+            for lang in langs:
+                folder.add_translation(lang, uf.UbeeFreshFolder(name='Folder {}.{} [{}]'.format(ic, jf, lang), lang=lang))
+            category.add_folder(folder)
+
+            for ka in range(articles_per_folder):
+                if article_no >= n_articles:
+                    break
+
+                # desc_text is given so building the portal does not run markdown/bs4 for every node
+                body = '<p>{}</p>'.format(sentence(rnd, 40))
+                article = uf.UbeeFreshArticle(title='Article {}'.format(article_no), desc=body, desc_text=body)
+                for lang in langs:
+                    article.add_translation(lang, uf.UbeeFreshArticle(
+                        title='Article {} [{}]'.format(article_no, lang), desc=body, desc_text=body, lang=lang))
+                folder.add_article(article)
+
+                article_no += 1
+
+        ic += 1
+
+    return portal
+
+
+def synthetic_grid(n_rows: int,
+                   langs: tuple = ('fr', 'de'),
+                   rows_per_folder: int = 20,
+                   extra_columns: int = 0,
+                   seed: int = 0) -> list:
+
+    # Same layout as the FAQ workbooks: a language header row, category name and description rows,
+    # then one row per article with folder / title / markdown body blocks per language
+    rnd = random.Random(seed)
+    width = 3 * (len(langs) + 1) + extra_columns
+
+    def row(cells: list) -> list:
+        return cells + [''] * (width - len(cells))
+
+    grid = [row(['FAQ']), row([]), row([]), row([])]
+
+    for i, lang in enumerate(('en',) + tuple(langs)):
+        grid[1][3 * i] = lang
+        grid[2][3 * i] = 'Category' if lang == 'en' else 'Category [{}]'.format(lang)
+        grid[3][3 * i] = sentence(rnd)
+
+    for r in range(n_rows):
+        cells = []
+        for lang in ('en',) + tuple(langs):
+            folder = 'Folder {}'.format(r // rows_per_folder) if r % rows_per_folder == 0 else ''
+            if folder != '' and lang != 'en':
+                folder += ' [{}]'.format(lang)
+            cells += [folder, 'Article {} [{}]'.format(r, lang), markdown_body(rnd, paragraphs=2)]
+
+        cells += [sentence(rnd, 4) for _ in range(extra_columns)]
+        grid.append(cells)
+
+    return grid
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_freshdesk import FakeFreshdesk  # noqa: E402
+from ubeefresh import api as ufdapi  # noqa: E402
+
+
+@pytest.fixture
+def server():
+    with FakeFreshdesk(langs=('fr', 'de')) as fake:
+        yield fake
+
+
+@pytest.fixture
+def fd(server):
+    return ufdapi.UbeeFreshAPI(apikey='test', domain='test', base_url=server.base_url, metrics=None)
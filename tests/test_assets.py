@@ -0,0 +1,64 @@
+import hashlib
+
+from ubeefresh.assets import AssetMirror, url_key
+
+
+class StreamedResponse:
+    def __init__(self, body: bytes, status_code: int = 200):
+        self.body = body
+        self.status_code = status_code
+        self.headers = {'Content-Type': 'image/png'}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    @property
+    def content(self):
+        raise AssertionError('the whole body was read into memory')
+
+    def iter_content(self, chunk_size: int = 1):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i:i + chunk_size]
+
+
+class FakeSession:
+    def __init__(self, files: dict):
+        self.files = files
+        self.gets = []
+
+    def get(self, url: str, timeout: float = None, stream: bool = False):
+        assert stream
+        self.gets.append(url)
+        path = url.split('?')[0]
+
+        return StreamedResponse(self.files[path]) if path in self.files else StreamedResponse(b'', status_code=404)
+
+
+def test_url_key_only_drops_signatures():
+    assert url_key('https://cdn.example.com/a.png?X-Amz-Signature=1&X-Amz-Expires=60&token=t') == \
+        'https://cdn.example.com/a.png'
+    assert url_key('https://cdn.example.com/a.png?Expires=1&Signature=2') == 'https://cdn.example.com/a.png'
+    assert url_key('https://example.com/download?id=1&token=t') == 'https://example.com/download?id=1'
+    assert url_key('https://example.com/download?id=1') != url_key('https://example.com/download?id=2')
+
+
+def test_download_streams_to_disk(tmp_path):
+    body = bytes(range(256)) * 1000
+    session = FakeSession({'https://cdn.example.com/a.png': body, 'https://cdn.example.com/b.png': body})
+    mirror = AssetMirror(str(tmp_path), session=session, chunk_size=4096)
+
+    entry = mirror.download('https://cdn.example.com/a.png?X-Amz-Signature=1')
+    again = mirror.download('https://cdn.example.com/b.png?X-Amz-Signature=2')
+
+    assert entry['digest'] == hashlib.sha1(body).hexdigest()
+    assert entry['size'] == len(body)
+    assert again['file'] == entry['file']
+    with open(str(tmp_path / entry['file']), 'rb') as f:
+        assert f.read() == body
+
+    assert mirror.path('https://cdn.example.com/a.png?X-Amz-Signature=3') == entry['file']
+    assert mirror.download('https://cdn.example.com/missing.png') is None
+    assert not any(p.name.endswith('.tmp') for p in (tmp_path / 'objects').iterdir())
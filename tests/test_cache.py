@@ -0,0 +1,93 @@
+from ubeefresh.cache import SheetsCache
+
+
+class FakeWorksheet:
+    def __init__(self, sheet_id, title, values):
+        self.id, self.title, self.values = sheet_id, title, values
+
+
+class FakeSpreadsheet:
+    def __init__(self, worksheets, revision='r1'):
+        self.title = 'Workbook'
+        self.worksheets_list = worksheets
+        self.revision = revision
+        self.downloads = 0
+
+    def get_lastUpdateTime(self):
+        return self.revision
+
+    def worksheets(self):
+        return self.worksheets_list
+
+    def values_batch_get(self, ranges):
+        self.downloads += 1
+        values = {"'{}'".format(ws.title): ws.values for ws in self.worksheets_list}
+
+        return {'valueRanges': [{'range': r, 'values': values[r]} for r in ranges]}
+
+
+def fetch(cache, spreadsheet, **kwargs):
+    client = type('Client', (), {'open_by_key': lambda self, key: spreadsheet})()
+    workbook, changed = cache.fetch('gsid', client=client, **kwargs)
+
+    return workbook, sorted(changed)
+
+
+def spreadsheet():
+    return FakeSpreadsheet([FakeWorksheet(1, 'One', [['a', 'b'], ['c']]), FakeWorksheet(2, 'Two', [['d']])])
+
+
+def test_unchanged_revision_is_not_downloaded(tmp_path):
+    cache, ss = SheetsCache(str(tmp_path)), spreadsheet()
+
+    assert fetch(cache, ss)[1] == ['One', 'Two']
+    workbook, changed = fetch(cache, ss)
+
+    assert changed == [] and ss.downloads == 1
+    # Served from the cache files, padded like get_all_values
+    assert workbook.title == 'Workbook'
+    assert [sheet.name for sheet in workbook.sheets] == ['One', 'Two']
+    assert workbook['One'].data == [['a', 'b'], ['c', '']]
+
+    assert fetch(cache, ss, force=True)[1] == [] and ss.downloads == 2
+
+
+def test_changed_revision_reports_changed_tabs(tmp_path):
+    cache, ss = SheetsCache(str(tmp_path)), spreadsheet()
+    fetch(cache, ss)
+
+    # A new revision with the same values
+    ss.revision = 'r2'
+    assert fetch(cache, ss)[1] == []
+
+    ss.revision = 'r3'
+    ss.worksheets_list[1].values = [['changed']]
+    workbook, changed = fetch(cache, ss)
+    assert changed == ['Two'] and workbook['Two'].data == [['changed']]
+
+    ss.revision = 'r4'
+    del ss.worksheets_list[0]
+    workbook, changed = fetch(cache, ss)
+    assert changed == ['One'] and [sheet.name for sheet in workbook.sheets] == ['Two']
+
+
+def test_staged_fetch_is_recorded_by_commit(tmp_path):
+    cache, ss = SheetsCache(str(tmp_path)), spreadsheet()
+
+    assert fetch(cache, ss, commit=False)[1] == ['One', 'Two']
+    assert cache.manifest('gsid') is None
+    # Not committed, the same tabs are changed again
+    assert fetch(cache, ss, commit=False)[1] == ['One', 'Two']
+
+    cache.commit('gsid', skip=['Two'])
+    assert cache.manifest('gsid')['revision'] is None
+
+    # The revision did not change, but the skipped tab is read and reported again
+    assert fetch(cache, ss, commit=False)[1] == ['Two']
+    cache.commit('gsid')
+    assert cache.manifest('gsid')['revision'] == 'r1'
+    assert fetch(cache, ss)[1] == [] and ss.downloads == 3
+
+    # Nothing staged, nothing written
+    cache.commit('gsid', skip=['One'])
+    assert cache.manifest('gsid')['revision'] == 'r1'
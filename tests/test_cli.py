@@ -0,0 +1,36 @@
+import pytest
+
+from ubeefresh import cli
+
+
+@pytest.fixture(autouse=True)
+def no_credentials(monkeypatch):
+    for name in ('UBEEFRESH_API_KEY', 'UBEEFRESH_DOMAIN', 'UBEEFRESH_BASE_URL'):
+        monkeypatch.delenv(name, raising=False)
+
+
+def test_missing_credentials_are_a_usage_error(capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main(['backup', 'out.p'])
+
+    assert exit_info.value.code == 2
+    assert 'UBEEFRESH_API_KEY' in capsys.readouterr().err
+
+    with pytest.raises(SystemExit):
+        cli.main(['--api-key', 'key', 'diff', 'a.p', 'freshdesk'])
+
+
+def test_parallel_push_of_many_categories(server, tmp_path, capsys):
+    server.generate(60, articles_per_folder=5, folders_per_category=3, translated=0.5)
+    base = ['--api-key', 'key', '--base-url', server.base_url]
+    snapshot = str(tmp_path / 'kb.p')
+
+    assert cli.main(base + ['backup', snapshot]) == 0
+
+    with type(server)(langs=('fr', 'de')) as target:
+        target_base = ['--api-key', 'key', '--base-url', target.base_url]
+        assert cli.main(target_base + ['-j', '4', 'push', snapshot]) == 0
+
+        names = sorted(c['name'] for c in target.nodes['categories'].values())
+        assert names == sorted(c['name'] for c in server.nodes['categories'].values())
+        assert len(target.nodes['articles']) == 60
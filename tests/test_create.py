@@ -0,0 +1,85 @@
+from ubeefresh import ubeefresh as uf
+from ubeefresh.enums import UbeeFreshAPIError
+
+
+def new_article(folder: uf.UbeeFreshFolder, title: str, langs: tuple = ('fr', 'de')) -> uf.UbeeFreshArticle:
+    article = uf.UbeeFreshArticle(title=title, desc='<p>{}</p>'.format(title))
+    folder.add_article(article)
+
+    for lang in langs:
+        article.add_translation(lang, uf.UbeeFreshArticle(title='{} [{}]'.format(title, lang), desc='<p>-</p>',
+                                                          lang=lang))
+
+    return article
+
+
+def test_failed_translation_post_is_not_ok(server, fd):
+    server.generate(1, articles_per_folder=1, folders_per_category=1, translated=0.0)
+    folder = fd.read_portal('KB', verbosity=0).categories[0].folders[0]
+
+    article_id = max(server.nodes['articles'])
+    server.faults[('POST', '/api/v2/solutions/articles/{}/fr'.format(article_id))] = 500
+
+    ok, res = fd._create_article_translation(article_id=article_id, lang='fr', title='T', desc='<p>-</p>')
+    assert not ok
+    assert res == UbeeFreshAPIError.OTHER
+
+    # The translation that failed keeps no state, the next update sends it again
+    article = new_article(folder, 'New article')
+    server.faults[('POST', '/api/v2/solutions/articles/{}/fr'.format(server._next_id + 1))] = 500
+    fd.create_article(article, create_translations=True)
+
+    assert article.fd_id is not None
+    assert article.translations['fr'].fd_state is None
+    assert article.translations['de'].fd_state is not None
+    assert 'fr' not in server.translations.get(('articles', article.fd_id), {})
+
+
+def test_adopted_article_gets_missing_translations(server, fd):
+    server.generate(1, articles_per_folder=1, folders_per_category=1, translated=0.0)
+    folder = fd.read_portal('KB', verbosity=0).categories[0].folders[0]
+    remote = next(iter(server.nodes['articles'].values()))
+
+    # A push that stopped after the article and its German translation
+    assert fd._create_article_translation(article_id=remote['id'], lang='de', title='Alt', desc='<p>-</p>')[0]
+
+    article = new_article(uf.UbeeFreshFolder(name=folder.name, fd_id=folder.fd_id), remote['title'])
+    fd.create_article(article, create_translations=True)
+
+    assert article.fd_id == remote['id']
+    assert len(server.nodes['articles']) == 1
+    assert sorted(server.translations[('articles', remote['id'])]) == ['de', 'fr']
+    assert server.translations[('articles', remote['id'])]['de']['title'] == 'Alt'
+    assert article.translations['fr'].fd_state is not None
+    assert article.translations['de'].fd_state is None
+
+
+def test_adopted_category_and_folder_get_missing_translations(server, fd):
+    server.generate(1, articles_per_folder=1, folders_per_category=1, translated=0.0)
+    remote_category = next(iter(server.nodes['categories'].values()))
+    remote_folder = next(iter(server.nodes['folders'].values()))
+
+    category = uf.UbeeFreshCategory(name=remote_category['name'])
+    category.add_translation('fr', uf.UbeeFreshCategory(name='Catégorie', lang='fr'))
+    folder = uf.UbeeFreshFolder(name=remote_folder['name'])
+    folder.add_translation('fr', uf.UbeeFreshFolder(name='Dossier', lang='fr'))
+    category.add_folder(folder)
+
+    fd.create_category(category, create_translations=True, create_folders=False)
+    fd.create_folder(folder, create_translations=True)
+
+    assert (category.fd_id, folder.fd_id) == (remote_category['id'], remote_folder['id'])
+    assert len(server.nodes['categories']) == 1 and len(server.nodes['folders']) == 1
+    assert 'fr' in server.translations[('categories', category.fd_id)]
+    assert 'fr' in server.translations[('folders', folder.fd_id)]
+
+
+def test_failed_listing_is_not_cached(server, fd):
+    server.generate(1, articles_per_folder=1, folders_per_category=1, translated=0.0)
+    name = next(iter(server.nodes['categories'].values()))['name']
+
+    server.faults[('GET', '/api/v2/solutions/categories')] = 500
+    assert fd.find_existing('v2/solutions/categories', name) is None
+    del server.faults[('GET', '/api/v2/solutions/categories')]
+
+    assert fd.find_existing('v2/solutions/categories', name) is not None
@@ -0,0 +1,35 @@
+from ubeefresh.enums import UbeeFreshAPIError
+
+
+def test_failed_article_does_not_abort_teardown(server, fd):
+    server.generate(40, articles_per_folder=10, folders_per_category=4)
+    category_id = next(iter(server.nodes['categories']))
+    folder_ids = server.children['categories'][category_id]
+    bad_article = server.children['folders'][folder_ids[0]][3]
+    server.faults[('DELETE', '/api/v2/solutions/articles/{}'.format(bad_article))] = 500
+
+    results = fd.delete_subtree(category_id=category_id, verbosity=0)
+    by_id = {(r['type'], r['id']): r for r in results}
+
+    assert by_id[('article', bad_article)]['ok'] is False
+    assert by_id[('article', bad_article)]['error'] == UbeeFreshAPIError.OTHER
+    assert by_id[('folder', folder_ids[0])]['error'] == UbeeFreshAPIError.NOT_EMPTY
+    assert by_id[('category', category_id)]['error'] == UbeeFreshAPIError.NOT_EMPTY
+
+    # Everything else went
+    assert all(by_id[('folder', fid)]['ok'] for fid in folder_ids[1:])
+    assert list(server.nodes['articles']) == [bad_article]
+
+
+def test_method_not_allowed_is_not_gone(server, fd):
+    server.generate(10, articles_per_folder=5, folders_per_category=2)
+    portal = fd.read_portal('KB', verbosity=0)
+    category = portal.categories[0]
+    category_id = category.fd_id
+    server.faults[('DELETE', '/api/v2/solutions/categories/{}'.format(category_id))] = 405
+
+    results = fd.delete_subtree(node=category, verbosity=0)
+
+    assert [r['type'] for r in results].count('category') == 1
+    assert category.fd_id == category_id
+    assert all(folder.fd_id is None for folder in category.folders)
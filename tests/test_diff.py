@@ -0,0 +1,76 @@
+import copy
+
+from ubeefresh import cli
+from ubeefresh import ubeefresh as uf
+from ubeefresh.diff import MerkleTree, diff_portals, diff_backups
+from ubeefresh.store import BackupStore
+
+
+def test_identical_portals_are_skipped_at_the_root(server, fd):
+    server.generate(12, articles_per_folder=3, folders_per_category=2, translated=0.5)
+    portal = fd.read_portal('KB', verbosity=0)
+
+    report = diff_portals(portal, copy.deepcopy(portal))
+
+    assert (report['added'], report['removed'], report['changed']) == ([], [], [])
+    assert report['compared'] == 1
+
+
+def test_changes_are_reported(server, fd):
+    server.generate(12, articles_per_folder=3, folders_per_category=2, translated=1.0)
+    old = fd.read_portal('KB', verbosity=0)
+    new = copy.deepcopy(old)
+
+    category = new.categories[0]
+    changed = category.folders[0].articles[1]
+    changed.title = 'New title'
+    lang = sorted(changed.translations)[0]
+    changed.translations[lang].desc = '<p>Changed</p>'
+    removed = category.folders.pop()
+    category.folders[0].add_article(uf.UbeeFreshArticle(title='Added', desc='<p>-</p>'))
+
+    report = diff_portals(old, new)
+
+    assert [entry['fd_id'] for entry in report['changed']] == [changed.fd_id]
+    assert report['changed'][0]['fields'] == ['title']
+    assert report['changed'][0]['translations'] == {lang: ['desc']}
+    assert [entry['fd_id'] for entry in report['removed']] == [removed.fd_id]
+    assert [entry['path'][-1] for entry in report['added']] == ['Added']
+
+
+def test_digests_are_stable(server, fd):
+    server.generate(6, articles_per_folder=3, folders_per_category=2, translated=1.0)
+    portal = fd.read_portal('KB', verbosity=0)
+
+    digests = MerkleTree(portal).digests()
+    assert digests == MerkleTree(copy.deepcopy(portal)).digests()
+    assert all(len(digest) == 32 for digest in digests.values())
+
+    # None and an empty string are different values
+    a, b = uf.UbeeFreshFolder(name='F', desc=None), uf.UbeeFreshFolder(name='F', desc='')
+    assert MerkleTree(a).own(a) != MerkleTree(b).own(b)
+
+
+def test_unchanged_categories_of_a_store_are_not_read(server, fd, tmp_path, monkeypatch, capsys):
+    server.generate(12, articles_per_folder=3, folders_per_category=1, translated=0.0)
+    store = BackupStore(str(tmp_path / 'store'))
+    first = store.save(fd.iter_portal(), name='KB')
+
+    article = next(iter(server.nodes['articles'].values()))
+    article['title'] = 'Edited'
+    second = store.save(fd.iter_portal(), name='KB')
+
+    reads = []
+    get = store.get
+    monkeypatch.setattr(store, 'get', lambda digest: reads.append(digest) or get(digest))
+
+    report = diff_backups(store, first, second)
+
+    assert [entry['fd_id'] for entry in report['changed']] == [article['id']]
+    assert report['skipped'] == len(server.nodes['categories']) - 1
+    # The two versions of the edited category: its tree plus category, folder and 3 article records, each
+    assert len(reads) == 2 * (1 + 1 + 1 + 3)
+
+    store_dir = str(tmp_path / 'store')
+    assert cli.main(['diff', '--exit-code', '{}@{}'.format(store_dir, first), '{}@{}'.format(store_dir, second)]) == 1
+    assert 'changed: 1' in capsys.readouterr().out
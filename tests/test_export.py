@@ -0,0 +1,22 @@
+import pytest
+
+from ubeefresh import export, ubeefresh as uf
+
+
+def test_record_sink_is_abstract(tmp_path):
+    with pytest.raises(TypeError):
+        export.RecordSink(str(tmp_path / 'out'))
+
+
+def test_snapshot_round_trip(server, fd, tmp_path):
+    server.generate(30, articles_per_folder=10, folders_per_category=2)
+    file = str(tmp_path / 'kb.snap')
+
+    with export.SnapshotSink(file, name='KB') as sink:
+        n = export.export(fd.iter_portal(), sink)
+
+    portal = uf.UbeeFreshPortal.load(file)
+
+    assert n == sink.count
+    assert portal.name == 'KB'
+    assert sum(len(folder.articles) for category in portal.categories for folder in category.folders) == 30
@@ -0,0 +1,62 @@
+from ubeefresh.metrics import MetricsRegistry, endpoint_template
+
+
+def test_endpoint_template():
+    assert endpoint_template('v2/solutions/folders/123/articles') == 'v2/solutions/folders/{id}/articles'
+    assert endpoint_template('/v2/solutions/articles/42/fr/') == 'v2/solutions/articles/{id}/{lang}'
+    assert endpoint_template('v2/solutions/articles/42/pt-BR') == 'v2/solutions/articles/{id}/{lang}'
+    # Only right after an id, 'categories' is not a language
+    assert endpoint_template('v2/solutions/categories') == 'v2/solutions/categories'
+    assert endpoint_template('v2/settings/helpdesk') == 'v2/settings/helpdesk'
+
+
+def test_snapshot_and_reset():
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    registry.observe('get', 'v2/solutions/folders/1/articles', 200, 0.05, bytes_received=100)
+    registry.observe('GET', 'v2/solutions/folders/2/articles', 200, 0.5, bytes_received=50, retries=1)
+    registry.observe('GET', 'v2/solutions/folders/3/articles', 429, 3.0)
+    registry.observe('POST', 'v2/solutions/articles/4/de', 201, 0.2, bytes_sent=10)
+
+    snapshot = registry.snapshot()
+
+    assert sorted(snapshot) == ['GET v2/solutions/folders/{id}/articles', 'POST v2/solutions/articles/{id}/{lang}']
+    assert snapshot['GET v2/solutions/folders/{id}/articles'] == {
+        'calls': 3,
+        'statuses': {200: 2, 429: 1},
+        'bytes_sent': 0,
+        'bytes_received': 150,
+        'retries': 1,
+        'latency_sum': 3.55,
+        'latency_buckets': {'0.1': 1, '1.0': 1, '+Inf': 1}
+    }
+
+    # A copy, later calls do not change it
+    registry.observe('POST', 'v2/solutions/articles/5/de', 201, 0.2)
+    assert snapshot['POST v2/solutions/articles/{id}/{lang}']['calls'] == 1
+
+    registry.reset()
+    assert registry.snapshot() == {}
+
+
+def test_to_prometheus():
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    registry.observe('GET', 'v2/solutions/categories', 200, 0.05, bytes_received=100)
+    registry.observe('GET', 'v2/solutions/categories', 200, 0.5, bytes_received=20)
+    registry.observe('GET', 'v2/solutions/categories', 'error', 2.0, retries=1)
+
+    lines = registry.to_prometheus(prefix='kb').splitlines()
+    labels = 'method="GET",endpoint="v2/solutions/categories"'
+
+    assert '# TYPE kb_requests_total counter' in lines
+    assert '# TYPE kb_request_duration_seconds histogram' in lines
+    assert 'kb_requests_total{{{},status="200"}} 2'.format(labels) in lines
+    assert 'kb_requests_total{{{},status="error"}} 1'.format(labels) in lines
+    assert 'kb_transferred_bytes_total{{{},direction="received"}} 120'.format(labels) in lines
+    assert 'kb_retries_total{{{}}} 1'.format(labels) in lines
+    # Buckets are cumulative
+    assert [line.rsplit(' ', 1)[1] for line in lines if line.startswith('kb_request_duration_seconds_bucket')] == \
+        ['1', '2', '3']
+    assert 'kb_request_duration_seconds_sum{{{}}} 2.550000'.format(labels) in lines
+    assert 'kb_request_duration_seconds_count{{{}}} 3'.format(labels) in lines
+
+    assert MetricsRegistry().to_prometheus().count('# TYPE') == 4
@@ -0,0 +1,63 @@
+import pytest
+
+from benchmarks.fake_freshdesk import FakeFreshdesk
+from ubeefresh.api import UbeeFreshAPI, UbeeFreshCrawlError
+from ubeefresh.mirror import KBMirror
+
+
+def test_sync_prunes_deleted_nodes(server, fd, tmp_path):
+    server.generate(6, articles_per_folder=3, folders_per_category=2)
+
+    with KBMirror(str(tmp_path / 'kb.sqlite')) as mirror:
+        mirror.sync(fd.iter_portal())
+        assert mirror.count('articles') == 6
+
+        article_id = min(server.nodes['articles'])
+        assert fd.delete('v2/solutions/articles/{}'.format(article_id))[0]
+
+        mirror.sync(fd.iter_portal())
+        assert mirror.count('articles') == 5
+        assert mirror.article(article_id) is None
+
+
+def test_failed_crawl_does_not_prune(server, fd, tmp_path):
+    server.generate(6, articles_per_folder=3, folders_per_category=2, translated=1.0)
+
+    with KBMirror(str(tmp_path / 'kb.sqlite')) as mirror:
+        mirror.sync(fd.iter_portal())
+        counts = {table: mirror.count(table) for table in ('categories', 'folders', 'articles', 'translations')}
+
+        server.faults[('GET', '/api/v2/solutions/categories')] = 500
+        with pytest.raises(UbeeFreshCrawlError):
+            mirror.sync(fd.iter_portal())
+        del server.faults[('GET', '/api/v2/solutions/categories')]
+
+        # A page of articles missing half way through the crawl, get answers that one instead of raising
+        folder_id = max(server.nodes['folders'])
+        server.faults[('GET', '/api/v2/solutions/folders/{}/articles'.format(folder_id))] = 404
+        with pytest.raises(UbeeFreshCrawlError):
+            mirror.sync(fd.iter_portal())
+        del server.faults[('GET', '/api/v2/solutions/folders/{}/articles'.format(folder_id))]
+
+        mirror.sync(iter([]))
+
+        assert {table: mirror.count(table) for table in counts} == counts
+
+
+def test_large_folders_are_read_in_full(tmp_path):
+    # More articles than 21 pages of 100, the page cap of get_list
+    with FakeFreshdesk(langs=()) as server:
+        server.generate(2150, articles_per_folder=2150, folders_per_category=1, translated=0.0)
+        fd = UbeeFreshAPI(apikey='test', domain='test', base_url=server.base_url, metrics=None)
+
+        with KBMirror(str(tmp_path / 'kb.sqlite')) as mirror:
+            assert mirror.sync(fd.iter_portal()) == 2152
+            assert mirror.count('articles') == 2150
+
+        folder_id = next(iter(server.nodes['folders']))
+        endpoint = 'v2/solutions/folders/{}/articles'.format(folder_id)
+
+        assert len(list(fd.iter_list(endpoint, per_page=100, max_depth=20))) == 2100
+        with pytest.raises(UbeeFreshCrawlError):
+            list(fd.iter_list(endpoint, per_page=100, max_depth=20, strict=True))
+        assert len(list(fd.iter_list(endpoint, per_page=500, max_depth=None, strict=True))) == 2150
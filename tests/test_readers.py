@@ -0,0 +1,17 @@
+from ubeefresh import readers
+
+
+def test_csv_keyword_arguments(tmp_path):
+    path = tmp_path / 'export.csv'
+    path.write_text('a;b\nc;d\n', encoding='latin-1')
+
+    rows = list(readers.iter_rows(str(path), title='Sheet', delimiter=';', encoding='latin-1'))
+
+    assert rows == [('Sheet', ['a', 'b']), ('Sheet', ['c', 'd'])]
+
+
+def test_tsv_defaults_to_tabs(tmp_path):
+    path = tmp_path / 'export.tsv'
+    path.write_text('a\tb;c\n')
+
+    assert list(readers.iter_rows(str(path))) == [('export', ['a', 'b;c'])]
@@ -0,0 +1,79 @@
+from ubeefresh import ubeefresh as uf
+
+
+def titles(folder: uf.UbeeFreshFolder) -> list:
+    return [article.title for article in folder.articles]
+
+
+def test_refresh_category_by_id_and_by_name(server, fd):
+    server.generate(12, articles_per_folder=2, folders_per_category=2, translated=0.0)
+    portal = fd.read_portal('KB', verbosity=0)
+    first, second, third = portal.categories
+
+    server.nodes['categories'][second.fd_id]['name'] = 'Renamed'
+    server.add('articles', {'title': 'Added'}, parent_id=second.folders[0].fd_id)
+
+    refreshed = fd.refresh_category(portal, second.fd_id)
+
+    assert portal.categories == [first, refreshed, third]
+    assert refreshed.name == 'Renamed' and refreshed.parent is portal
+    assert titles(refreshed.folders[0])[-1] == 'Added'
+
+    # Renamed on the server only, the name is looked up there and the local category is still replaced
+    server.nodes['categories'][second.fd_id]['name'] = 'Renamed again'
+    again = fd.refresh_category(portal, 'renamed again')
+
+    assert portal.categories == [first, again, third]
+    assert again.fd_id == second.fd_id and again.name == 'Renamed again'
+
+    # By the local name
+    assert fd.refresh_category(portal, first.name.upper()) is portal.categories[0]
+    assert portal.categories[0] is not first and portal.categories[0].fd_id == first.fd_id
+    assert len(portal.categories) == 3
+
+
+def test_refresh_folder_keeps_its_position(server, fd):
+    server.generate(6, articles_per_folder=2, folders_per_category=3, translated=0.0)
+    portal = fd.read_portal('KB', verbosity=0)
+    category = portal.categories[0]
+    first, second, third = category.folders
+
+    article_id = second.articles[1].fd_id
+    server.nodes['articles'][article_id]['title'] = 'Edited'
+
+    refreshed = fd.refresh_folder(portal, second.name)
+
+    assert category.folders == [first, refreshed, third]
+    assert refreshed.parent is category
+    assert titles(refreshed)[1] == 'Edited'
+    assert fd.refresh_folder(portal, third.fd_id) is category.folders[2]
+
+
+def test_failed_crawl_leaves_the_portal_untouched(server, fd):
+    server.generate(6, articles_per_folder=2, folders_per_category=3, translated=0.0)
+    portal = fd.read_portal('KB', verbosity=0)
+    category = portal.categories[0]
+    folders = list(category.folders)
+
+    server.nodes['articles'][folders[2].articles[0].fd_id]['title'] = 'Edited'
+    server.faults[('GET', '/api/v2/solutions/folders/{}/articles'.format(folders[2].fd_id))] = 500
+
+    assert fd.refresh_category(portal, category.fd_id) is None
+    assert fd.refresh_folder(portal, folders[2].fd_id) is None
+
+    assert portal.categories == [category]
+    assert category.folders == folders
+    assert titles(folders[2]) == ['Article 4', 'Article 5']
+
+
+def test_refresh_saves_the_snapshot_back(server, fd, tmp_path):
+    server.generate(4, articles_per_folder=2, folders_per_category=2, translated=0.0)
+    snapshot = str(tmp_path / 'kb.pickle')
+    fd.read_portal('KB', verbosity=0).save(snapshot)
+
+    folder_id = min(server.nodes['folders'])
+    server.nodes['folders'][folder_id]['name'] = 'Renamed'
+
+    assert fd.refresh_folder(snapshot, folder_id).name == 'Renamed'
+    assert [folder.name for folder in uf.UbeeFreshPortal.load(snapshot).categories[0].folders] == \
+        ['Renamed', 'Folder 0.1']
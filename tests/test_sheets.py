@@ -0,0 +1,141 @@
+import pytest
+
+from ubeefresh.sheets import UbeeSheet, quote_title, col_to_index
+
+
+def sheet():
+    return UbeeSheet(name='S', data=[['a', 'b', 'c'], ['d', 'e'], ['g', 'h', 'i']])
+
+
+def test_cell_bounds():
+    s = sheet()
+
+    assert s.cell(1, 1) == 'e'
+    assert s.cell(2, 1) == ''
+    assert s.cell('C', 2) == 'i'
+    assert s.cell(3, 0) is None
+    assert s.cell(0, 3) is None
+
+    with pytest.raises(IndexError):
+        s.cell(-1, 0)
+    with pytest.raises(IndexError):
+        s.cell(0, -1)
+
+
+def test_ranges():
+    s = sheet()
+
+    assert s['B2'] == 'e'
+    assert s['A1:B2'].values() == [['a', 'b'], ['d', 'e']]
+    assert s['B2:Z99'].values() == [['e', ''], ['h', 'i']]
+    assert list(s[-1]) == ['g', 'h', 'i']
+
+    for ref in ('Z99', 'D1', 'A4'):
+        with pytest.raises(IndexError):
+            s[ref]
+    with pytest.raises(IndexError):
+        s[3]
+
+
+def test_data_is_built_from_the_cells():
+    s = sheet()
+
+    assert s.data[1] == ['d', 'e', '']
+    assert s.data is not s.data
+
+    # The rows are a copy, the sheet only changes through the setter
+    rows = s.data
+    rows[0][0] = 'z'
+    assert s.cell(0, 0) == 'a' and s.data[0][0] == 'a'
+
+    s.data = rows
+    assert s.cell(0, 0) == 'z' and s['A1:B1'].values() == [['z', 'b']]
+
+
+class FakeWorksheet:
+    def __init__(self, sheet_id, title, values):
+        self.id, self.title, self.values = sheet_id, title, values
+
+    def get_all_values(self):
+        return self.values
+
+
+class FakeSpreadsheet:
+    def __init__(self, worksheets):
+        self.title = 'Workbook'
+        self.worksheets_list = worksheets
+        self.batches = []
+
+    def worksheets(self):
+        return self.worksheets_list
+
+    def values_batch_get(self, ranges):
+        # 'Title'!1:20 row spans, 'Title'!A:C column spans or a whole 'Title', trimmed like the values API
+        self.batches.append(ranges)
+        value_ranges = []
+
+        for rng in ranges:
+            title, _, span = rng.partition('!')
+            values = next(ws.values for ws in self.worksheets_list if quote_title(ws.title) == title)
+
+            if span[:1].isdigit():
+                values = values[:int(span.split(':')[1])]
+            elif span != '':
+                c0, c1 = [col_to_index(col) for col in span.split(':')]
+                values = [row[c0:c1 + 1] for row in values]
+
+            values = [row[:max([i + 1 for i, cell in enumerate(row) if cell != ''] + [0])] for row in values]
+            value_ranges.append({'range': rng, 'values': values})
+
+        return {'valueRanges': value_ranges}
+
+
+def nodes(portal):
+    for category in portal.categories:
+        for node in [category] + [f for f in category.folders] + [a for f in category.folders for a in f.articles]:
+            for n in [node] + [node.translations[lang] for lang in sorted(node.translations)]:
+                yield type(n).__name__, n.lang, getattr(n, 'name', None), getattr(n, 'title', None), n.desc, \
+                    n.gs_sheet, n.gs_range
+
+
+def test_fetch_data_refreshes_loaded_workbook(monkeypatch):
+    from ubeefresh import sheets
+
+    spreadsheet = FakeSpreadsheet([FakeWorksheet(1, 'One', [['a']]), FakeWorksheet(2, 'Two', [['b']])])
+    client = type('Client', (), {'open_by_key': lambda self, key: spreadsheet})()
+    monkeypatch.setattr(sheets, 'authorize', lambda credentials_file=None: client)
+
+    workbook = sheets.UbeeSheetsWorkbook(gsid='gsid').fetch_data()
+    assert workbook['One'].data == [['a']]
+
+    spreadsheet.worksheets_list[0].values = [['changed']]
+    workbook.fetch_data()
+
+    assert len(workbook) == 2
+    assert [sheet.name for sheet in workbook.sheets] == ['One', 'Two']
+    assert workbook['One'].data == [['changed']]
+
+
+def test_fetch_columns_reads_what_fetch_data_reads(monkeypatch):
+    from benchmarks.synthetic import synthetic_grid
+    from ubeefresh import sheets
+    from ubeefresh.ubeefresh import UbeeFreshPortal
+
+    # Language row past the first 20 rows, that tab is read whole
+    late = synthetic_grid(4, rows_per_folder=2)
+    late[1:1] = [['Notes'] + [''] * (len(late[0]) - 1) for _ in range(22)]
+
+    spreadsheet = FakeSpreadsheet([FakeWorksheet(1, 'FAQ', synthetic_grid(8, rows_per_folder=3, extra_columns=4)),
+                                   FakeWorksheet(2, "Driver's FAQ", late)])
+    client = type('Client', (), {'open_by_key': lambda self, key: spreadsheet})()
+    monkeypatch.setattr(sheets, 'authorize', lambda credentials_file=None: client)
+
+    pruned = UbeeFreshPortal.from_gs('gsid', pruned=True)
+    full = UbeeFreshPortal.from_gs('gsid', pruned=False)
+
+    # en, fr and de of every category, folder and article
+    assert len(list(nodes(full))) == 3 * (1 + 3 + 8) + 3 * (1 + 2 + 4)
+    assert list(nodes(pruned)) == list(nodes(full))
+
+    # The four notes columns of FAQ are not read
+    assert spreadsheet.batches[:2] == [["'FAQ'!1:20", "'Driver''s FAQ'!1:20"], ["'FAQ'!A:I", "'Driver''s FAQ'"]]
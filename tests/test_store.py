@@ -0,0 +1,44 @@
+from ubeefresh.store import BackupStore
+
+
+def test_save_load_round_trip(server, fd, tmp_path):
+    server.generate(12, articles_per_folder=3, folders_per_category=2, translated=0.5)
+    store = BackupStore(str(tmp_path / 'store'))
+
+    backup_id = store.save(fd.iter_portal(), name='KB')
+    portal = store.load(backup_id)
+
+    assert portal.name == 'KB'
+    assert sorted(c.name for c in portal.categories) == sorted(c['name'] for c in server.nodes['categories'].values())
+    assert sum(len(f.articles) for c in portal.categories for f in c.folders) == 12
+    assert list(store.records(backup_id)) == list(store.records())
+
+
+def test_view_counters_do_not_make_new_objects(server, fd, tmp_path):
+    server.generate(6, articles_per_folder=3, folders_per_category=2)
+    store = BackupStore(str(tmp_path / 'store'))
+    store.save(fd.iter_portal())
+
+    for article in server.nodes['articles'].values():
+        article['hits'] = article.get('hits', 0) + 10
+        article['thumbs_up'] = article.get('thumbs_up', 0) + 1
+
+    stats = store.manifest(store.save(fd.iter_portal()))['stats']
+
+    assert stats['new_records'] == 0
+    assert stats['new_trees'] == 0
+
+
+def test_latest_is_the_last_created(server, fd, tmp_path):
+    server.generate(3, articles_per_folder=3, folders_per_category=1)
+    store = BackupStore(str(tmp_path / 'store'))
+
+    store.save(fd.iter_portal(), backup_id='nightly')
+    # More saves than fit in one second, the IDs get -2 ... -12 suffixes that do not sort by age
+    saved = [store.save(fd.iter_portal(), backup_id='manual') for _ in range(12)]
+
+    assert store.backups() == ['nightly'] + saved
+    assert store.manifest()['id'] == saved[-1]
+
+    store.save(fd.iter_portal(), backup_id='nightly')
+    assert store.manifest()['id'] == 'nightly-2'
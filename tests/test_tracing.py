@@ -0,0 +1,64 @@
+import json
+import threading
+
+import pytest
+
+from ubeefresh import tracing
+
+
+def test_nested_spans_link_to_their_parent():
+    tracer = tracing.Tracer()
+    finished = []
+    tracer.add_hook(finished.append)
+
+    with tracer.span('portal', tracing.CRAWL) as portal:
+        with tracer.span('category', tracing.CRAWL, id=1) as category:
+            with tracer.span('GET', tracing.HTTP) as get:
+                pass
+        with tracer.span('category', tracing.CRAWL, id=2) as sibling:
+            # Spans of other threads start their own tree
+            others = []
+            thread = threading.Thread(target=lambda: others.append(tracer.span('other').__enter__()))
+            thread.start()
+            thread.join()
+
+    other = others[0]
+    assert (portal.parent, category.parent, get.parent, sibling.parent) == (None, portal, category, portal)
+    assert (portal.depth, category.depth, get.depth, sibling.depth) == (0, 1, 2, 1)
+    assert other.parent is None and other.depth == 0 and other.thread_id != portal.thread_id
+
+    # Hooks get children before their parents, each one once it is closed
+    assert finished == [get, category, sibling, portal]
+    assert portal.start_ns <= category.start_ns <= get.start_ns <= get.end_ns <= category.end_ns <= portal.end_ns
+
+    with pytest.raises(KeyError):
+        with tracer.span('failing') as failing:
+            raise KeyError('x')
+    assert failing.attrs['error'] == 'KeyError' and tracer._stack() == []
+
+    tracer.remove_hook(finished.append)
+    assert not tracer.active
+    assert not isinstance(tracer.span('off'), tracing.Span)
+
+
+def test_chrome_trace_export(tmp_path):
+    file = str(tmp_path / 'trace.json')
+
+    with tracing.ChromeTraceExporter(file):
+        with tracing.span('read_portal', tracing.CRAWL, portal='KB'):
+            with tracing.span('GET v2/solutions/categories', tracing.HTTP, status=200, cached=None):
+                pass
+
+    assert not tracing.TRACER.active
+
+    with open(file) as f:
+        trace = json.load(f)
+
+    assert trace['displayTimeUnit'] == 'ms'
+    outer, inner = trace['traceEvents']
+    assert sorted(outer) == ['args', 'cat', 'dur', 'name', 'ph', 'pid', 'tid', 'ts']
+    assert (outer['name'], outer['cat'], outer['ph'], outer['args']) == ('read_portal', 'crawl', 'X', {'portal': 'KB'})
+    assert (inner['cat'], inner['args']) == ('http', {'status': 200, 'cached': None})
+    assert outer['pid'] == inner['pid'] and outer['tid'] == inner['tid'] == threading.get_ident()
+    # Microseconds, the inner event lies within the outer one
+    assert outer['ts'] <= inner['ts'] and inner['ts'] + inner['dur'] <= outer['ts'] + outer['dur']
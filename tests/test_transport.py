@@ -0,0 +1,69 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ubeefresh import api as ufdapi
+from ubeefresh.transport import SingleFlight, hedged
+
+
+def test_hedge_after_delay():
+    calls = []
+
+    def func():
+        calls.append(None)
+        time.sleep(0.5 if len(calls) == 1 else 0.0)
+        return len(calls)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        result, duplicated = hedged(func, 0.05, pool)
+
+    assert duplicated
+    assert result == 2
+
+
+def test_no_hedge_from_a_saturated_pool():
+    calls = []
+    release = threading.Event()
+
+    def func():
+        calls.append(None)
+        return 'ok'
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pool.submit(release.wait, 1.0)
+        threading.Timer(0.2, release.set).start()
+
+        result, duplicated = hedged(func, 0.05, pool)
+
+    assert (result, duplicated) == ('ok', False)
+    assert len(calls) == 1
+
+
+def test_single_flight_shares_one_call():
+    flight = SingleFlight()
+    calls = []
+    gate = threading.Event()
+
+    def func():
+        calls.append(None)
+        gate.wait(1.0)
+        return 'value'
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(flight.do, 'key', func) for _ in range(4)]
+        time.sleep(0.1)
+        gate.set()
+        results = [future.result() for future in futures]
+
+    assert results == ['value'] * 4
+    assert len(calls) == 1
+
+
+def test_api_close_stops_hedge_pool(server):
+    with ufdapi.UbeeFreshAPI(apikey='test', domain='test', base_url=server.base_url, metrics=None,
+                             hedge=True) as fd:
+        pool = fd._hedge_pool
+        assert fd.get_categories() == []
+
+    assert fd._hedge_pool is None
+    assert pool._shutdown
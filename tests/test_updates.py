@@ -0,0 +1,95 @@
+import pytest
+
+from ubeefresh.enums import FreshArticleType, FreshStatus, FreshVisibility
+from ubeefresh.mirror import KBMirror
+from ubeefresh.store import BackupStore
+
+
+@pytest.fixture
+def puts(fd):
+    sent = []
+    put = fd.put
+
+    def recording_put(endpoint: str, data: dict = None):
+        sent.append((endpoint, data))
+        return put(endpoint, data)
+
+    fd.put = recording_put
+
+    return sent
+
+
+def test_unchanged_draft_read_back_sends_nothing(server, fd, puts):
+    server.generate(4, articles_per_folder=4, folders_per_category=1, translated=1.0)
+    article_id = server.children['folders'][next(iter(server.children['folders']))][0]
+    server.nodes['articles'][article_id].update(status=1, type=2)
+
+    portal = fd.read_portal('KB', verbosity=0)
+    article = next(a for a in portal.categories[0].folders[0].articles if a.fd_id == article_id)
+
+    assert article.fd_status == FreshStatus.DRAFT
+    assert article.fd_type == FreshArticleType.WORKAROUND
+
+    requests = server.requests
+    assert fd.update_category(portal.categories[0], update_translations=False, update_folders=True)
+
+    assert puts == []
+    assert server.requests == requests
+    assert server.nodes['articles'][article_id]['status'] == 1
+
+
+def test_changes_are_sent_alone(server, fd, puts):
+    server.generate(2, articles_per_folder=2, folders_per_category=1, translated=0.0)
+    portal = fd.read_portal('KB', verbosity=0)
+    article = portal.categories[0].folders[0].articles[1]
+
+    article.title = 'New title'
+    fd.update_article(article)
+
+    assert puts == [('v2/solutions/articles/{}'.format(article.fd_id), {'title': 'New title'})]
+
+    fd.update_article(article)
+    assert len(puts) == 1
+
+
+def test_sheet_nodes_take_state_from_listing(server, fd, puts):
+    server.generate(6, articles_per_folder=3, folders_per_category=2, translated=0.0)
+    portal = fd.read_portal('KB', verbosity=0)
+    category = portal.categories[0]
+
+    # As parsed from a sheet: IDs written back, no remote state, real visibility values
+    nodes = [category] + category.folders + [a for folder in category.folders for a in folder.articles]
+    for node in nodes:
+        node.fd_state = None
+    for folder in category.folders:
+        folder.fd_visible = FreshVisibility.ALL_USERS
+    category.folders[1].articles[2].desc = '<p>Edited</p>'
+
+    assert fd.update_category(category, update_translations=False, update_folders=True)
+
+    assert puts == [('v2/solutions/articles/{}'.format(category.folders[1].articles[2].fd_id),
+                     {'description': '<p>Edited</p>'})]
+
+
+@pytest.mark.parametrize('kind', ['store', 'mirror'])
+def test_records_read_back_send_nothing(server, fd, puts, tmp_path, kind):
+    server.generate(6, articles_per_folder=3, folders_per_category=2, translated=1.0)
+    article_id = min(server.nodes['articles'])
+    server.nodes['articles'][article_id].update(status=1, type=2)
+    # Translations follow the article's status
+    for translation in server.translations.get(('articles', article_id), {}).values():
+        translation['status'] = 1
+
+    if kind == 'store':
+        store = BackupStore(str(tmp_path / 'store'))
+        portal = store.load(store.save(fd.iter_portal(), name='KB'))
+    else:
+        with KBMirror(str(tmp_path / 'kb.sqlite')) as mirror:
+            mirror.sync(fd.iter_portal(), name='KB')
+            portal = mirror.portal()
+
+    for category in portal.categories:
+        assert fd.update_category(category, update_translations=True, update_folders=True)
+
+    assert puts == []
+    assert server.nodes['articles'][article_id]['status'] == 1
@@ -0,0 +1,126 @@
+import time
+
+from benchmarks.synthetic import synthetic_grid
+from ubeefresh.watch import SheetWatcher
+
+
+class FakeWorksheet:
+    def __init__(self, ws_id: int, title: str, values: list):
+        self.id = ws_id
+        self.title = title
+        self.values = values
+
+    def get_all_values(self) -> list:
+        return self.values
+
+
+class FakeSpreadsheet:
+    def __init__(self, title: str, worksheets: list, revision: str = 'r1'):
+        self.title = title
+        self._worksheets = worksheets
+        self.revision = revision
+
+    def get_lastUpdateTime(self) -> str:
+        return self.revision
+
+    def worksheets(self) -> list:
+        return self._worksheets
+
+    def values_batch_get(self, ranges: list) -> dict:
+        return {'valueRanges': [{'range': r, 'values': ws.values} for r, ws in zip(ranges, self._worksheets)]}
+
+
+class FakeClient:
+    def __init__(self, spreadsheet: FakeSpreadsheet):
+        self.spreadsheet = spreadsheet
+
+    def open_by_key(self, gsid: str) -> FakeSpreadsheet:
+        return self.spreadsheet
+
+
+def make_watcher(fd, cache_dir, client) -> SheetWatcher:
+    return SheetWatcher('gsid', fd, cache_dir=str(cache_dir), interval=0, debounce=0, client=client)
+
+
+def test_failed_push_is_retried(server, fd, tmp_path):
+    client = FakeClient(FakeSpreadsheet('KB', [FakeWorksheet(0, 'FAQ', synthetic_grid(6, rows_per_folder=3))]))
+    watcher = make_watcher(fd, tmp_path, client)
+
+    server.faults[('POST', '/api/v2/solutions/categories')] = 400
+
+    assert watcher.due()
+    assert watcher.sync() == []
+    assert watcher.failed == ['FAQ']
+    assert len(server.nodes['categories']) == 0
+
+    # Nothing changed in the sheet, the failed tab alone makes the next poll sync
+    del server.faults[('POST', '/api/v2/solutions/categories')]
+
+    assert watcher.due()
+    assert watcher.sync() == ['FAQ']
+    assert watcher.failed == []
+    assert len(server.nodes['categories']) == 1
+    assert len(server.nodes['articles']) == 6
+
+    assert not watcher.due()
+
+
+def test_failed_push_is_not_recorded_in_the_cache(server, fd, tmp_path):
+    client = FakeClient(FakeSpreadsheet('KB', [FakeWorksheet(0, 'FAQ', synthetic_grid(6, rows_per_folder=3))]))
+
+    server.faults[('POST', '/api/v2/solutions/categories')] = 400
+    assert make_watcher(fd, tmp_path, client).sync() == []
+    del server.faults[('POST', '/api/v2/solutions/categories')]
+
+    # A restarted watcher still sees the tab as changed
+    assert make_watcher(fd, tmp_path, client).sync() == ['FAQ']
+    assert make_watcher(fd, tmp_path, client).sync() == []
+    assert len(server.nodes['categories']) == 1
+
+
+def test_renamed_article_keeps_its_id(server, fd, tmp_path):
+    grid = synthetic_grid(6, rows_per_folder=3)
+    spreadsheet = FakeSpreadsheet('KB', [FakeWorksheet(0, 'FAQ', grid)])
+    watcher = make_watcher(fd, tmp_path, FakeClient(spreadsheet))
+
+    assert watcher.sync() == ['FAQ']
+    ids = {a['title']: a['id'] for a in server.nodes['articles'].values()}
+    renamed = grid[5][1]
+
+    # Retitled in place, and a new row inserted further down
+    grid[5][1] = 'Renamed article'
+    width = len(grid[0])
+    grid.insert(7, [''] * width)
+    for i in range(0, width, 3):
+        grid[7][i + 1] = 'Inserted article {}'.format(i)
+        grid[7][i + 2] = 'Body'
+    spreadsheet.revision = 'r2'
+
+    assert watcher.due()
+    assert watcher.sync() == ['FAQ']
+
+    titles = {a['id']: a['title'] for a in server.nodes['articles'].values()}
+    assert len(titles) == 7
+    assert titles[ids[renamed]] == 'Renamed article'
+    # The rows below the inserted one kept their own articles
+    assert all(titles[article_id] == title for title, article_id in ids.items() if title != renamed)
+
+    assert isinstance(watcher.known['FAQ'], dict)
+
+
+def test_failed_tabs_back_off(server, fd, tmp_path):
+    client = FakeClient(FakeSpreadsheet('KB', [FakeWorksheet(0, 'FAQ', synthetic_grid(3, rows_per_folder=3))]))
+    watcher = SheetWatcher('gsid', fd, cache_dir=str(tmp_path), interval=10, debounce=0, client=client)
+
+    server.faults[('POST', '/api/v2/solutions/categories')] = 400
+
+    now = time.monotonic()
+    assert watcher.due(now=now)
+    watcher.sync()
+    assert not watcher.due(now=now + 1)
+    assert watcher.due(now=now + 11)
+
+    watcher.sync()
+    assert watcher.retries == 2
+    assert not watcher.due(now=now + 15)
+    assert watcher.due(now=now + 21)
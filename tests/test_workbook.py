@@ -0,0 +1,20 @@
+import concurrent.futures
+
+from benchmarks.synthetic import synthetic_grid
+from ubeefresh import ubeefresh as uf
+from ubeefresh.sheets import UbeeSheet, UbeeSheetsWorkbook
+
+
+def test_from_workbook_is_sequential_by_default(monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError('a process pool was started')
+
+    monkeypatch.setattr(concurrent.futures, 'ProcessPoolExecutor', no_pool)
+
+    workbook = UbeeSheetsWorkbook(gsid='gsid')
+    workbook.add_sheet(UbeeSheet(name='Sheet', data=synthetic_grid(20), sheet_id=0))
+
+    portal = uf.UbeeFreshPortal.from_workbook(workbook, name='KB')
+
+    assert len(portal.categories) == 1
+    assert sum(len(folder.articles) for folder in portal.categories[0].folders) > 0
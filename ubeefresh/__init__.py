@@ -1,3 +1,12 @@
-from . import sheets, ubeefresh, api
+import importlib
 
-__all__ = ['ubeefresh', 'sheets', 'api']
\ No newline at end of file
+# Submodules are imported on first attribute access, so e.g. "import ubeefresh.api" does not pull in
+# the Sheets and markdown stacks
+__all__ = ['ubeefresh', 'sheets', 'api']
+
+
+def __getattr__(name: str):
+    if name in __all__:
+        return importlib.import_module('.{}'.format(name), __name__)
+
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
@@ -1,12 +1,27 @@
 import json
+import time
+import threading
 import requests
 from requests.auth import HTTPBasicAuth
 from requests.adapters import HTTPAdapter
-from requests.exceptions import ConnectionError
+from requests.exceptions import ConnectionError, Timeout
 
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from . import tracing
 from . import ubeefresh as uf
 from .enums import FreshArticleType, FreshStatus, FreshVisibility, UbeeFreshAPIError
-from typing import Tuple
+from .metrics import MetricsRegistry, REGISTRY, endpoint_template
+from .transport import RateLimiter, SingleFlight, LatencyTracker, hedged, json_loads, json_dumps
+from typing import Tuple, Union
+
+
+class UbeeFreshCrawlError(Exception):
+    # A listing or page that could not be read during a crawl, the records so far do not cover the KB
+    def __init__(self, endpoint: str, error):
+        super().__init__('Cannot list {}: {}'.format(endpoint, error))
+        self.endpoint = endpoint
+        self.error = error
 
 
 class UbeeFreshAPI:
@@ -16,21 +31,53 @@ class UbeeFreshAPI:
     def __init__(self,
                  apikey: str = None,
                  domain: str = None,
-                 portals: list = None):
+                 portals: list = None,
+                 rate_limit: float = None,
+                 throttle_retries: int = 3,
+                 metrics: MetricsRegistry = REGISTRY,
+                 base_url: str = None,
+                 coalesce: bool = True,
+                 adaptive_timeouts: bool = True,
+                 hedge: bool = False,
+                 hedge_workers: int = 8):
 
         self.apikey = apikey if apikey is not None else self.__API_KEY
         self.domain = domain if domain is not None else self.__DOMAIN
         self.portals = portals
 
+        # Overrides https://{domain}.freshdesk.com/api/, e.g. to talk to a local stand-in server
+        self.base_url = base_url.rstrip('/') + '/' if base_url is not None else None
+
+        # Calls per minute, Freshdesk plans are limited per minute as well
+        self.rate_limiter = RateLimiter(rate=rate_limit) if rate_limit is not None else None
+        self.throttle_retries = throttle_retries
+
+        # Pass metrics=None to switch instrumentation off
+        self.metrics = metrics
+
+        # Identical GETs in flight from several threads are served by one HTTP call
+        self.single_flight = SingleFlight() if coalesce else None
+
+        # Per-endpoint latencies drive the timeouts and, with hedge=True, when a GET is duplicated (at p95)
+        self.latency = LatencyTracker() if adaptive_timeouts or hedge else None
+        self.adaptive_timeouts = adaptive_timeouts
+        self.hedge = hedge
+        self.hedges = 0
+        self._hedge_pool = ThreadPoolExecutor(max_workers=hedge_workers) if hedge else None
+
         self.supported_langs = None
         self.primary_lang = 'en'
 
+        # Listings by endpoint for adopting existing nodes, shared by the threads of parallel pushes
+        self._existing = dict()
+        self._existing_lock = threading.Lock()
+
         fresh_adapter = HTTPAdapter(max_retries=5)
 
         self._session = requests.Session()
         self._session.auth = HTTPBasicAuth(self.apikey, 'gimmeaccess')
 
-        self._session.mount('https://{domain}.freshdesk.com'.format(domain=self.domain), fresh_adapter)
+        self._session.mount(self._url(''), fresh_adapter)
 
         ok, settings = self.get_settings()
         if ok:
@@ -85,9 +132,10 @@ class UbeeFreshAPI:
                              max_depth=max_depth)
 
     def get_article_translations(self,
-                                 article_id: int):
+                                 article_id: int,
+                                 strict: bool = False):
 
-        return self._get_translations('v2/solutions/articles/{}'.format(article_id))
+        return self._get_translations('v2/solutions/articles/{}'.format(article_id), strict=strict)
 
     def _create_article(self,
                         folder_id: int,
@@ -120,18 +168,24 @@ class UbeeFreshAPI:
         if len(seo_data) > 0:
             data['seo_data'] = seo_data
 
-        ok, res = self.post(
-            endpoint='v2/solutions/folders/{fid}/articles'.format(fid=folder_id),
-            data=data)
+        try:
+            ok, res = self.post(
+                endpoint='v2/solutions/folders/{fid}/articles'.format(fid=folder_id),
+                data=data)
+        except requests.exceptions.RequestException as e:
+            print('Call to Freshdesk API failed: {}'.format(e))
+            return False, UbeeFreshAPIError.OTHER
 
         if not ok:
             if res.get('code') == 409:
-                if res.get('response').get('errors', []).get('code') == 'duplicate_value':
+                if res.get('response', {}).get('errors', [{}])[0].get('code') == 'duplicate_value':
                     return False, UbeeFreshAPIError.EXISTS
 
             if res.get('code') == 404:
                 return False, UbeeFreshAPIError.NOT_FOUND
 
+            return False, UbeeFreshAPIError.OTHER
+
         return True, res.get('id')
 
     def _create_article_translation(self,
@@ -164,25 +218,35 @@ class UbeeFreshAPI:
         if len(seo_data) > 0:
             data['seo_data'] = seo_data
 
-        ok, res = self.post(
-            endpoint='v2/solutions/articles/{aid}/{lang}'.format(aid=article_id, lang=lang),
-            data=data)
+        try:
+            ok, res = self.post(
+                endpoint='v2/solutions/articles/{aid}/{lang}'.format(aid=article_id, lang=lang),
+                data=data)
+        except requests.exceptions.RequestException as e:
+            print('Call to Freshdesk API failed: {}'.format(e))
+            return False, UbeeFreshAPIError.OTHER
 
         if not ok:
             if res.get('code') == 409:
-                if res.get('response').get('errors', []).get('code') == 'duplicate_value':
+                if res.get('response', {}).get('errors', [{}])[0].get('code') == 'duplicate_value':
                     return False, UbeeFreshAPIError.EXISTS
 
             if res.get('code') == 404:
                 return False, UbeeFreshAPIError.NOT_FOUND
 
+            return False, UbeeFreshAPIError.OTHER
+
+        return True, res.get('id')
+
+    @tracing.traced(tracing.UPLOAD)
     def create_article(self,
                        article: uf.UbeeFreshArticle,
                        folder_id: int = None,
                        create_translations: bool = True,
                        create_parent: bool = False,
                        typ: int = None,
-                       status: int = None):
+                       status: int = None,
+                       adopt_existing: bool = True):
 
         if article.fd_id is not None:
             print('Article {} already exists. Try using update...'.format(article.title))
@@ -197,7 +261,8 @@ class UbeeFreshAPI:
                         folder=article.parent,
                         create_translations=create_translations,
                         create_parent=create_parent,
-                        create_articles=False)
+                        create_articles=False,
+                        adopt_existing=adopt_existing)
 
                     if article.parent.fd_id is None:
                         print(' - failed to create parent. Can''t continue...')
@@ -222,28 +287,47 @@ class UbeeFreshAPI:
             else:
                 status = FreshStatus.PUBLISHED
 
-        ok, data = self._create_article(
-            folder_id=folder_id,
-            title=article.title,
-            desc=article.desc,
-            typ=typ,
-            status=status)
+        articles_endpoint = 'v2/solutions/folders/{}/articles'.format(folder_id)
 
-        if not ok:
-            print(' - creation failed')
-            return None
+        existing = None
+        if adopt_existing and folder_id is not None:
+            existing = self.find_existing(articles_endpoint, article.title, key='title')
 
-        article.fd_id = data
+        if existing is not None:
+            print(' - adopting existing article #{}'.format(existing.get('id')))
+            article.fd_id = existing.get('id')
+            article.fd_state = self._known_state(existing, self.article_fields(article))
 
+        else:
+            ok, data = self._create_article(
+                folder_id=folder_id,
+                title=article.title,
+                desc=article.desc,
+                typ=typ,
+                status=status)
+
+            if not ok:
+                print(' - creation failed')
+                return None
+
+            article.fd_id = data
+            article.fd_state = self.article_fields(article, typ=typ, status=status)
+            self._add_existing(articles_endpoint, article.title, dict(article.fd_state, id=data), key='title')
+
+        # An adopted article may come from a push that stopped half way, its missing translations are created too
+        # (the ones already there answer 409 and keep no state, the next update sends them once)
         if create_translations and len(article.translations) > 0:
             for lang, translation in article.translations.items():
-                self._create_article_translation(
+                ok, _ = self._create_article_translation(
                     article_id=article.fd_id,
                     lang=lang,
                     title=translation.title,
                     desc=translation.desc,
                     status=status)
 
+                if ok:
+                    translation.fd_state = self.article_fields(translation, status=status, translation=True)
+
     def _delete_article(self,
                         article_id: int):
 
@@ -253,6 +337,7 @@ class UbeeFreshAPI:
         ok, res = self.delete(endpoint='v2/solutions/articles/{aid}'.format(aid=article_id))
 
         if ok:
+            self._forget_existing(article_id)
             return True, None
 
         if res.get('code') == 404:
@@ -304,18 +389,24 @@ class UbeeFreshAPI:
         if desc is not None:
             data['description'] = desc
 
-        ok, res = self.post(
-            endpoint='v2/solutions/categories/{cid}/folders'.format(cid=category_id),
-            data=data)
+        try:
+            ok, res = self.post(
+                endpoint='v2/solutions/categories/{cid}/folders'.format(cid=category_id),
+                data=data)
+        except requests.exceptions.RequestException as e:
+            print('Call to Freshdesk API failed: {}'.format(e))
+            return False, UbeeFreshAPIError.OTHER
 
         if not ok:
             if res.get('code') == 409:
-                if res.get('response').get('errors', []).get('code') == 'duplicate_value':
+                if res.get('response', {}).get('errors', [{}])[0].get('code') == 'duplicate_value':
                     return False, UbeeFreshAPIError.EXISTS
 
             if res.get('code') == 404:
                 return False, UbeeFreshAPIError.NOT_FOUND
 
+            return False, UbeeFreshAPIError.OTHER
+
         return True, res.get('id')
 
     def _create_folder_translation(self,
@@ -334,25 +425,35 @@ class UbeeFreshAPI:
         if desc is not None:
             data['description'] = desc
 
-        ok, res = self.post(
-            endpoint='v2/solutions/folders/{fid}/{lang}'.format(fid=folder_id, lang=lang),
-            data=data)
+        try:
+            ok, res = self.post(
+                endpoint='v2/solutions/folders/{fid}/{lang}'.format(fid=folder_id, lang=lang),
+                data=data)
+        except requests.exceptions.RequestException as e:
+            print('Call to Freshdesk API failed: {}'.format(e))
+            return False, UbeeFreshAPIError.OTHER
 
         if not ok:
             if res.get('code') == 409:
-                if res.get('response').get('errors', []).get('code') == 'duplicate_value':
+                if res.get('response', {}).get('errors', [{}])[0].get('code') == 'duplicate_value':
                     return False, UbeeFreshAPIError.EXISTS
 
             if res.get('code') == 404:
                 return False, UbeeFreshAPIError.NOT_FOUND
 
+            return False, UbeeFreshAPIError.OTHER
+
+        return True, res.get('id')
+
+    @tracing.traced(tracing.UPLOAD)
     def create_folder(self,
                       folder: uf.UbeeFreshFolder,
                       category_id: int = None,
                       create_translations: bool = True,
                       create_parent: bool = False,
                       create_articles: bool = False,
-                      visibility: int = FreshVisibility.ALL_USERS):
+                      visibility: int = FreshVisibility.ALL_USERS,
+                      adopt_existing: bool = True):
 
         if folder.fd_id is not None:
             print('Folder {} already exists. Try using update...'.format(folder.name))
@@ -366,7 +467,8 @@ class UbeeFreshAPI:
                     self.create_category(
                         category=folder.parent,
                         create_translations=create_translations,
-                        create_folders=False)
+                        create_folders=False,
+                        adopt_existing=adopt_existing)
 
                     if folder.parent.fd_id is None:
                         print(' - failed to create parent. Can''t continue...')
@@ -381,37 +483,60 @@ class UbeeFreshAPI:
         if visibility is None:
             visibility = folder.fd_visible
 
-        ok, data = self._create_folder(
-            category_id=category_id,
-            name=folder.name,
-            desc=folder.desc,
-            visibility=visibility)
+        folders_endpoint = 'v2/solutions/categories/{}/folders'.format(category_id)
 
-        if not ok:
-            print(' - creation failed')
-            return None
+        existing = None
+        if adopt_existing and category_id is not None:
+            existing = self.find_existing(folders_endpoint, folder.name)
+
+        if existing is not None:
+            print(' - adopting existing folder #{}'.format(existing.get('id')))
+            folder.fd_id = existing.get('id')
+            folder.fd_state = self._known_state(existing, self.folder_fields(folder))
+
+        else:
+            ok, data = self._create_folder(
+                category_id=category_id,
+                name=folder.name,
+                desc=folder.desc,
+                visibility=visibility)
 
-        folder.fd_id = data
+            if not ok:
+                print(' - creation failed')
+                return None
+
+            folder.fd_id = data
+            folder.fd_state = self.folder_fields(folder, visibility=visibility)
+            self._add_existing(folders_endpoint, folder.name, dict(folder.fd_state, id=data))
+
+            # A freshly created folder has no articles, no need to list them
+            self._set_existing('v2/solutions/folders/{}/articles'.format(data), dict())
 
+        # As for articles, an adopted folder gets the translations it is missing
         if create_translations and len(folder.translations) > 0:
             for lang, translation in folder.translations.items():
-                self._create_folder_translation(
+                ok, _ = self._create_folder_translation(
                     folder_id=folder.fd_id,
                     lang=lang,
                     name=translation.name,
                     desc=translation.desc)
 
+                if ok:
+                    translation.fd_state = self.folder_fields(translation, translation=True)
+
         if create_articles and len(folder.articles) > 0:
             for article in folder.articles:
                 self.create_article(
                     article=article,
                     create_translations=create_translations,
-                    create_parent=False)
+                    create_parent=False,
+                    adopt_existing=adopt_existing)
 
     def get_folder_translations(self,
-                                folder_id: int):
+                                folder_id: int,
+                                strict: bool = False):
 
-        return self._get_translations('v2/solutions/folders/{}'.format(folder_id))
+        return self._get_translations('v2/solutions/folders/{}'.format(folder_id), strict=strict)
 
     def _delete_folder(self,
                        folder_id: int):
@@ -422,6 +547,7 @@ class UbeeFreshAPI:
         ok, res = self.delete(endpoint='v2/solutions/folders/{fid}'.format(fid=folder_id))
 
         if ok:
+            self._forget_existing(folder_id)
             return True, None
 
         if res.get('code') == 404:
@@ -472,9 +598,13 @@ class UbeeFreshAPI:
         elif self.portals is not None:
             data['visible_in_portals'] = self.portals
 
-        ok, res = self.post(endpoint='v2/solutions/categories', data=data)
+        try:
+            ok, res = self.post(endpoint='v2/solutions/categories', data=data)
+        except requests.exceptions.RequestException as e:
+            print('Call to Freshdesk API failed: {}'.format(e))
+            return False, UbeeFreshAPIError.OTHER
 
-        if res.get('code') != 201:
+        if not ok:
             if res.get('code') == 409:
                 if res.get('response', {}).get('errors', [{}])[0].get('code') == 'duplicate_value':
                     return False, UbeeFreshAPIError.EXISTS
@@ -482,6 +612,8 @@ class UbeeFreshAPI:
             if res.get('code') == 404:
                 return False, UbeeFreshAPIError.NOT_FOUND
 
+            return False, UbeeFreshAPIError.OTHER
+
         return True, res.get('id')
 
     def _create_category_translation(self,
@@ -500,9 +632,13 @@ class UbeeFreshAPI:
         if desc is not None:
             data['description'] = desc
 
-        ok, res = self.post(
-            endpoint='v2/solutions/categories/{cid}/{lang}'.format(cid=category_id, lang=lang),
-            data=data)
+        try:
+            ok, res = self.post(
+                endpoint='v2/solutions/categories/{cid}/{lang}'.format(cid=category_id, lang=lang),
+                data=data)
+        except requests.exceptions.RequestException as e:
+            print('Call to Freshdesk API failed: {}'.format(e))
+            return False, UbeeFreshAPIError.OTHER
 
         if not ok:
             print(ok, res)
@@ -513,14 +649,18 @@ class UbeeFreshAPI:
             if res.get('code') == 404:
                 return False, UbeeFreshAPIError.NOT_FOUND
 
+            return False, UbeeFreshAPIError.OTHER
+
         return True, res.get('id')
 
+    @tracing.traced(tracing.UPLOAD)
     def create_category(self,
                         category: uf.UbeeFreshCategory,
                         create_translations: bool = True,
                         create_folders: bool = False,
                         portals: list = None,
-                        suffix: str = ''):
+                        suffix: str = '',
+                        adopt_existing: bool = True):
 
         if category.fd_id is not None:
             print('Category {} already exists. Try using update...'.format(category.name))
@@ -536,43 +676,342 @@ class UbeeFreshAPI:
             print('Category {} has lang={}, which seems to be a translation...'.format(
                 category.name, category.lang))
 
-        if suffix != '':
-            suffix = ' || {}'.format(category.fd_suffix)
-        elif category.fd_suffix is not None:
-            suffix = ' || {}'.format(category.fd_suffix)
-        elif category.parent is not None and category.parent.fd_suffix is not None:
-            suffix = ' || {}'.format(category.parent.fd_suffix)
+        suffix = self._category_suffix(category, suffix)
 
-        ok, data = self._create_category(
-            name=category.name + suffix,
-            desc=category.desc,
-            portals=portals)
+        existing = None
+        if adopt_existing:
+            existing = self.find_existing('v2/solutions/categories', category.name + suffix)
 
-        if not ok:
-            if data == UbeeFreshAPIError.EXISTS:
-                print(' - already exists')
-            else:
-                print(' - creation failed')
+        if existing is not None:
+            print(' - adopting existing category #{}'.format(existing.get('id')))
+            category.fd_id = existing.get('id')
+            category.fd_state = self._known_state(existing, self.category_fields(category, suffix))
 
-            return None
+        else:
+            ok, data = self._create_category(
+                name=category.name + suffix,
+                desc=category.desc,
+                portals=portals)
+
+            if not ok:
+                if data == UbeeFreshAPIError.EXISTS:
+                    print(' - already exists')
+                else:
+                    print(' - creation failed')
 
-        category.fd_id = data
+                return None
 
+            category.fd_id = data
+            category.fd_state = self.category_fields(category, suffix)
+            self._add_existing('v2/solutions/categories', category.name + suffix, dict(category.fd_state, id=data))
+
+            # A freshly created category has no folders, no need to list them
+            self._set_existing('v2/solutions/categories/{}/folders'.format(data), dict())
+
+        # As for articles, an adopted category gets the translations it is missing
         if create_translations and len(category.translations) > 0:
             for lang, translation in category.translations.items():
-                self._create_category_translation(
+                ok, _ = self._create_category_translation(
                     category_id=category.fd_id,
                     lang=lang,
                     name=translation.name + suffix,
                     desc=translation.desc)
 
+                if ok:
+                    translation.fd_state = self.category_fields(translation, suffix)
+
         if create_folders and len(category.folders) > 0:
             for folder in category.folders:
                 self.create_folder(
                     folder=folder,
                     create_translations=create_translations,
                     create_parent=False,
-                    create_articles=True)
+                    create_articles=True,
+                    adopt_existing=adopt_existing)
+
+    @staticmethod
+    def _category_suffix(category: uf.UbeeFreshCategory, suffix: str = '') -> str:
+        if suffix != '':
+            suffix = ' || {}'.format(category.fd_suffix)
+        elif category.fd_suffix is not None:
+            suffix = ' || {}'.format(category.fd_suffix)
+        elif category.parent is not None and category.parent.fd_suffix is not None:
+            suffix = ' || {}'.format(category.parent.fd_suffix)
+
+        return suffix
+
+    # -------------------------------------------------------
+    # Updates
+
+    @staticmethod
+    def article_fields(article: uf.UbeeFreshArticle,
+                       typ: FreshArticleType = None,
+                       status: FreshStatus = None,
+                       translation: bool = False) -> dict:
+
+        typ = typ if typ is not None else article.fd_type if article.fd_type is not None else FreshArticleType.PERMANENT
+        status = status if status is not None else \
+            article.fd_status if article.fd_status is not None else FreshStatus.PUBLISHED
+
+        data = {
+            'title': article.title,
+            'description': article.desc,
+            'status': status.value if hasattr(status, 'value') else status
+        }
+
+        if not translation:
+            data['type'] = typ.value if hasattr(typ, 'value') else typ
+
+        return data
+
+    @staticmethod
+    def folder_fields(folder: uf.UbeeFreshFolder,
+                      visibility: FreshVisibility = None,
+                      translation: bool = False) -> dict:
+
+        data = {'name': folder.name}
+
+        if folder.desc is not None:
+            data['description'] = folder.desc
+
+        # fd_visible is a plain flag on folders read back from Freshdesk, only send real visibility values
+        visibility = visibility if visibility is not None else folder.fd_visible
+        if not translation and isinstance(visibility, FreshVisibility):
+            data['visibility'] = visibility.value
+
+        return data
+
+    @staticmethod
+    def category_fields(category: uf.UbeeFreshCategory, suffix: str = '') -> dict:
+        data = {'name': category.name + suffix}
+
+        if category.desc is not None:
+            data['description'] = category.desc
+
+        return data
+
+    @staticmethod
+    def _known_state(item: dict, fields: dict) -> dict:
+        # Remote values of an index entry, fields it does not carry count as unknown and will be sent
+        return {key: item.get(key) for key in fields if key in item}
+
+    def _listed_state(self,
+                      endpoint: str,
+                      node_id: int,
+                      fields: dict,
+                      key: str = 'name') -> dict:
+
+        # Remote state of a node from its parent's listing (the cached existing index), None when not listed
+        index = self.get_existing(endpoint=endpoint, key=key)
+
+        with self._existing_lock:
+            items = list(index.values())
+
+        for item in items:
+            if item.get('id') == node_id:
+                return self._known_state(item, fields)
+
+        return None
+
+    def _update(self,
+                node: Union[uf.UbeeFreshArticle, uf.UbeeFreshFolder, uf.UbeeFreshCategory],
+                endpoint: str,
+                data: dict,
+                force: bool = False) -> Tuple[bool, dict]:
+
+        # Snapshots from before fd_state existed have no remote state, everything is sent once
+        state = getattr(node, 'fd_state', None)
+
+        if force or state is None:
+            changes = data
+        else:
+            changes = {key: value for key, value in data.items() if key not in state or state[key] != value}
+
+        if len(changes) == 0:
+            return True, {}
+
+        ok, res = self.put(endpoint=endpoint, data=changes)
+
+        if not ok:
+            if res.get('code') == 404:
+                return False, UbeeFreshAPIError.NOT_FOUND
+
+            print(' - update of {} failed: {}'.format(endpoint, res))
+            return False, None
+
+        node.fd_state = dict(state if state is not None else {}, **changes)
+
+        return True, changes
+
+    @tracing.traced(tracing.UPLOAD)
+    def update_article(self,
+                       article: uf.UbeeFreshArticle,
+                       update_translations: bool = True,
+                       force: bool = False) -> bool:
+
+        if article.fd_id is None:
+            print('Article {} does not exist yet. Try using create...'.format(article.title))
+            return False
+
+        data = self.article_fields(article)
+
+        # Nodes from a sheet carry no remote state, take it from the folder listing instead of sending everything
+        if getattr(article, 'fd_state', None) is None and not force and isinstance(article.parent, uf.UbeeFreshFolder) \
+                and article.parent.fd_id is not None:
+            article.fd_state = self._listed_state('v2/solutions/folders/{}/articles'.format(article.parent.fd_id),
+                                                  article.fd_id, data, key='title')
+
+        ok, res = self._update(article, 'v2/solutions/articles/{}'.format(article.fd_id), data, force=force)
+
+        if ok and len(res) > 0:
+            print(' - updated article #{}: {}'.format(article.fd_id, ', '.join(res.keys())))
+
+        if update_translations:
+            for lang in article.translations.keys():
+                ok = self.update_article_translation(article, lang, force=force) and ok
+
+        return ok
+
+    def update_article_translation(self,
+                                   article: uf.UbeeFreshArticle,
+                                   lang: str,
+                                   force: bool = False) -> bool:
+
+        translation = article.translations.get(lang)
+
+        if translation is None or article.fd_id is None:
+            return False
+
+        # Translations follow the status of the article, as on creation
+        data = self.article_fields(translation, status=article.fd_status, translation=True)
+
+        ok, res = self._update(translation, 'v2/solutions/articles/{}/{}'.format(article.fd_id, lang), data,
+                               force=force)
+
+        if not ok and res == UbeeFreshAPIError.NOT_FOUND:
+            ok, _ = self._create_article_translation(article_id=article.fd_id, lang=lang, title=translation.title,
+                                                     desc=translation.desc, status=article.fd_status)
+            if ok:
+                translation.fd_state = data
+
+        return ok
+
+    @tracing.traced(tracing.UPLOAD)
+    def update_folder(self,
+                      folder: uf.UbeeFreshFolder,
+                      update_translations: bool = True,
+                      update_articles: bool = False,
+                      force: bool = False) -> bool:
+
+        if folder.fd_id is None:
+            print('Folder {} does not exist yet. Try using create...'.format(folder.name))
+            return False
+
+        data = self.folder_fields(folder)
+
+        if getattr(folder, 'fd_state', None) is None and not force and isinstance(folder.parent, uf.UbeeFreshCategory) \
+                and folder.parent.fd_id is not None:
+            folder.fd_state = self._listed_state('v2/solutions/categories/{}/folders'.format(folder.parent.fd_id),
+                                                 folder.fd_id, data)
+
+        ok, res = self._update(folder, 'v2/solutions/folders/{}'.format(folder.fd_id), data, force=force)
+
+        if ok and len(res) > 0:
+            print(' - updated folder #{}: {}'.format(folder.fd_id, ', '.join(res.keys())))
+
+        if update_translations:
+            for lang in folder.translations.keys():
+                ok = self.update_folder_translation(folder, lang, force=force) and ok
+
+        if update_articles:
+            for article in folder.articles:
+                if article.fd_id is not None:
+                    ok = self.update_article(article, update_translations=update_translations, force=force) and ok
+
+        return ok
+
+    def update_folder_translation(self,
+                                  folder: uf.UbeeFreshFolder,
+                                  lang: str,
+                                  force: bool = False) -> bool:
+
+        translation = folder.translations.get(lang)
+
+        if translation is None or folder.fd_id is None:
+            return False
+
+        data = self.folder_fields(translation, translation=True)
+
+        ok, res = self._update(translation, 'v2/solutions/folders/{}/{}'.format(folder.fd_id, lang), data,
+                               force=force)
+
+        if not ok and res == UbeeFreshAPIError.NOT_FOUND:
+            ok, _ = self._create_folder_translation(folder_id=folder.fd_id, lang=lang, name=translation.name,
+                                                    desc=translation.desc)
+            if ok:
+                translation.fd_state = data
+
+        return ok
+
+    @tracing.traced(tracing.UPLOAD)
+    def update_category(self,
+                        category: uf.UbeeFreshCategory,
+                        update_translations: bool = True,
+                        update_folders: bool = False,
+                        suffix: str = '',
+                        force: bool = False) -> bool:
+
+        if category.fd_id is None:
+            print('Category {} does not exist yet. Try using create...'.format(category.name))
+            return False
+
+        suffix = self._category_suffix(category, suffix)
+
+        data = self.category_fields(category, suffix)
+
+        if getattr(category, 'fd_state', None) is None and not force:
+            category.fd_state = self._listed_state('v2/solutions/categories', category.fd_id, data)
+
+        ok, res = self._update(category, 'v2/solutions/categories/{}'.format(category.fd_id), data, force=force)
+
+        if ok and len(res) > 0:
+            print(' - updated category #{}: {}'.format(category.fd_id, ', '.join(res.keys())))
+
+        if update_translations:
+            for lang in category.translations.keys():
+                ok = self.update_category_translation(category, lang, suffix=suffix, force=force) and ok
+
+        if update_folders:
+            for folder in category.folders:
+                if folder.fd_id is not None:
+                    ok = self.update_folder(folder, update_translations=update_translations, update_articles=True,
+                                            force=force) and ok
+
+        return ok
+
+    def update_category_translation(self,
+                                    category: uf.UbeeFreshCategory,
+                                    lang: str,
+                                    suffix: str = '',
+                                    force: bool = False) -> bool:
+
+        translation = category.translations.get(lang)
+
+        if translation is None or category.fd_id is None:
+            return False
+
+        data = self.category_fields(translation, suffix)
+
+        ok, res = self._update(translation, 'v2/solutions/categories/{}/{}'.format(category.fd_id, lang), data,
+                               force=force)
+
+        if not ok and res == UbeeFreshAPIError.NOT_FOUND:
+            ok, _ = self._create_category_translation(category_id=category.fd_id, lang=lang,
+                                                      name=translation.name + suffix, desc=translation.desc)
+            if ok:
+                translation.fd_state = data
+
+        return ok
 
     def _delete_category(self,
                          category_id: int):
@@ -583,6 +1022,7 @@ class UbeeFreshAPI:
         ok, res = self.delete(endpoint='v2/solutions/categories/{cid}'.format(cid=category_id))
 
         if ok:
+            self._forget_existing(category_id)
             return True, None
 
         if res.get('code') == 405:
@@ -609,24 +1049,253 @@ class UbeeFreshAPI:
 
         print(' - deletion failed')
 
+    def delete_subtree(self,
+                       node: Union[uf.UbeeFreshCategory, uf.UbeeFreshFolder] = None,
+                       category_id: int = None,
+                       folder_id: int = None,
+                       max_workers: int = 8,
+                       verbosity: int = 1) -> list:
+
+        if isinstance(node, uf.UbeeFreshCategory):
+            category_id = node.fd_id
+        elif isinstance(node, uf.UbeeFreshFolder):
+            folder_id = node.fd_id
+
+        if category_id is None and folder_id is None:
+            print('Need a category or folder FD ID to delete a subtree.')
+            return []
+
+        # Local nodes get their FD IDs cleared once deleted remotely
+        local = dict()
+        if node is not None:
+            local[node.fd_id] = node
+            for folder in node.folders if isinstance(node, uf.UbeeFreshCategory) else [node]:
+                local[folder.fd_id] = folder
+                for article in folder.articles:
+                    local[article.fd_id] = article
+
+        if category_id is not None:
+            folders = self.get_folders(category_id)
+            if folders is None:
+                print('Category #{} not found.'.format(category_id))
+                return []
+        else:
+            folders = [{'id': folder_id, 'name': node.name if node is not None else None}]
+
+        results = []
+        deleters = {
+            'article': self._delete_article,
+            'folder': self._delete_folder,
+            'category': self._delete_category
+        }
+
+        def run(typ: str, item_id: int, name: str, parent_id: int) -> dict:
+            # A failed call (403, 5xx...) is this node's failure, the rest of the teardown goes on
+            try:
+                ok, err = deleters[typ](item_id)
+            except requests.exceptions.RequestException as e:
+                print('Cannot delete {} #{}: {}'.format(typ, item_id, e))
+                ok, err = False, UbeeFreshAPIError.OTHER
+
+            if verbosity > 1:
+                print('- {} {} #{}: {}'.format(typ, name, item_id, 'deleted' if ok else err))
+
+            return {'type': typ, 'id': item_id, 'name': name, 'parent_id': parent_id,
+                    'ok': ok, 'error': err}
+
+        def gone(result: dict) -> bool:
+            # A 405 on a category is reported as ok by _delete_category, but the category is still there
+            return (result['ok'] and result['error'] is None) or result['error'] == UbeeFreshAPIError.NOT_FOUND
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            listings = {f.get('id'): pool.submit(self.get_articles, f.get('id')) for f in folders}
+
+            pending = set()
+            remaining = dict()
+            failed = set()
+            folders_left = len(folders)
+
+            for fd_folder in folders:
+                fid = fd_folder.get('id')
+
+                try:
+                    articles = listings[fid].result()
+                except requests.exceptions.RequestException as e:
+                    print('Cannot list articles of folder #{}: {}'.format(fid, e))
+                    results.append({'type': 'folder', 'id': fid, 'name': fd_folder.get('name'),
+                                    'parent_id': category_id, 'ok': False, 'error': UbeeFreshAPIError.OTHER})
+                    failed.add(category_id)
+                    folders_left -= 1
+                    continue
+
+                if articles is None:
+                    articles = []
+
+                remaining[fid] = len(articles)
+
+                for fd_article in articles:
+                    pending.add(pool.submit(run, 'article', fd_article.get('id'), fd_article.get('title'), fid))
+
+                if len(articles) == 0:
+                    pending.add(pool.submit(run, 'folder', fid, fd_folder.get('name'), category_id))
+
+            names = {f.get('id'): f.get('name') for f in folders}
+            names[category_id] = node.name if isinstance(node, uf.UbeeFreshCategory) else None
+
+            if folders_left == 0 and category_id is not None:
+                if category_id in failed:
+                    results.append({'type': 'category', 'id': category_id, 'name': names[category_id],
+                                    'parent_id': None, 'ok': False, 'error': UbeeFreshAPIError.NOT_EMPTY})
+                else:
+                    pending.add(pool.submit(run, 'category', category_id, names[category_id], None))
+                folders_left = -1
+
+            while len(pending) > 0:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    result = future.result()
+                    results.append(result)
+
+                    if result['type'] == 'article':
+                        fid = result['parent_id']
+                        remaining[fid] -= 1
+                        if not gone(result):
+                            failed.add(fid)
+
+                        if remaining[fid] > 0:
+                            continue
+
+                        if fid in failed:
+                            results.append({'type': 'folder', 'id': fid, 'name': names[fid], 'parent_id': category_id,
+                                            'ok': False, 'error': UbeeFreshAPIError.NOT_EMPTY})
+                            failed.add(category_id)
+                            folders_left -= 1
+                        else:
+                            pending.add(pool.submit(run, 'folder', fid, names[fid], category_id))
+
+                    elif result['type'] == 'folder':
+                        folders_left -= 1
+                        if not gone(result):
+                            failed.add(category_id)
+
+                    if result['type'] != 'category' and folders_left == 0 and category_id is not None:
+                        if category_id in failed:
+                            results.append({'type': 'category', 'id': category_id, 'name': names[category_id],
+                                            'parent_id': None, 'ok': False, 'error': UbeeFreshAPIError.NOT_EMPTY})
+                        else:
+                            pending.add(pool.submit(run, 'category', category_id, names[category_id], None))
+                        folders_left = -1
+
+        for result in results:
+            if gone(result) and result['id'] in local:
+                local[result['id']].fd_id = None
+
+        if verbosity > 0:
+            n_ok = len([result for result in results if gone(result)])
+            print('Deleted {} of {} nodes.'.format(n_ok, len(results)))
+
+        return results
+
     def get_category_translations(self,
-                                  category_id: int):
+                                  category_id: int,
+                                  strict: bool = False):
 
-        return self._get_translations('v2/solutions/categories/{}'.format(category_id))
+        return self._get_translations('v2/solutions/categories/{}'.format(category_id), strict=strict)
 
     def _get_translations(self,
-                          entity: str):
+                          entity: str,
+                          strict: bool = False):
 
+        # A missing translation is a 404, with strict any other failure raises UbeeFreshCrawlError
         translations = {}
 
         for lang in self.supported_langs:
-            ok, data = self.get('{}/{}'.format(entity, lang))
+            endpoint = '{}/{}'.format(entity, lang)
+
+            with tracing.span('translation', tracing.CRAWL, entity=entity, lang=lang):
+                ok, data = self._crawl_get(endpoint) if strict else self.get(endpoint)
 
             if ok:
                 translations[lang] = data
+            elif strict and data.get('code') != 404:
+                raise UbeeFreshCrawlError(endpoint, data)
 
         return translations
 
+    def get_existing(self,
+                     endpoint: str,
+                     key: str = 'name',
+                     refresh: bool = False) -> dict:
+
+        with self._existing_lock:
+            index = self._existing.get(endpoint) if not refresh else None
+
+        if index is not None:
+            return index
+
+        # Listed outside the lock, concurrent identical listings are coalesced by get anyway. A listing that
+        # fails (or stops half way) is not cached, the next lookup lists again
+        try:
+            items = list(self.iter_list(endpoint=endpoint, max_depth=None, strict=True))
+        except UbeeFreshCrawlError as e:
+            print(' - {}'.format(e))
+            return dict()
+
+        index = dict()
+        for item in items:
+            if item.get(key) is not None:
+                index[item.get(key).strip().lower()] = item
+
+        with self._existing_lock:
+            # Keep the index another thread stored meanwhile, it may already hold nodes it created
+            if refresh or endpoint not in self._existing:
+                self._existing[endpoint] = index
+
+            return self._existing[endpoint]
+
+    def find_existing(self,
+                      endpoint: str,
+                      name: str,
+                      key: str = 'name') -> dict:
+
+        if name is None:
+            return None
+
+        index = self.get_existing(endpoint=endpoint, key=key)
+
+        with self._existing_lock:
+            return index.get(name.strip().lower())
+
+    def _set_existing(self,
+                      endpoint: str,
+                      index: dict):
+
+        with self._existing_lock:
+            self._existing[endpoint] = index
+
+    def _add_existing(self,
+                      endpoint: str,
+                      name: str,
+                      item: dict,
+                      key: str = 'name'):
+
+        with self._existing_lock:
+            if endpoint in self._existing and name is not None:
+                self._existing[endpoint][name.strip().lower()] = item
+
+    def _forget_existing(self,
+                         item_id: int):
+
+        with self._existing_lock:
+            for index in self._existing.values():
+                for name in [name for name, item in index.items() if item.get('id') == item_id]:
+                    del index[name]
+
+    def clear_existing(self):
+        with self._existing_lock:
+            self._existing = dict()
+
     def get_list(self,
                  endpoint: str,
                  page: int = None,
@@ -658,16 +1327,164 @@ class UbeeFreshAPI:
 
         return None
 
+    def iter_list(self,
+                  endpoint: str,
+                  per_page: int = 100,
+                  max_depth: int = 20,
+                  strict: bool = False):
+
+        # Same paging as get_list, but hands out one page at a time. A failed page ends the list, so does a full
+        # page past max_depth (None for no limit). With strict both raise UbeeFreshCrawlError instead, a list cut
+        # short must not pass for the whole list.
+        get = self._crawl_get if strict else self.get
+        # get asks for 100 at most, a larger per_page would make the first page look like the last
+        per_page = min(per_page, 100)
+        page = 0
+
+        while True:
+            page += 1
+            ok, data = get(endpoint=endpoint,
+                           page=page,
+                           per_page=per_page)
+
+            if not ok or data is None:
+                if strict:
+                    raise UbeeFreshCrawlError('{} (page {})'.format(endpoint, page), data)
+                return
+
+            yield from data
+
+            if len(data) < per_page:
+                return
+
+            if max_depth is not None and page > max_depth:
+                if strict:
+                    raise UbeeFreshCrawlError(endpoint, 'more than {} pages'.format(page))
+                return
+
+    def _crawl_get(self, endpoint: str, page: int = None, per_page: int = None) -> Tuple[bool, dict]:
+        # get, with the errors it raises turned into UbeeFreshCrawlError
+        try:
+            return self.get(endpoint=endpoint, page=page, per_page=per_page)
+        except requests.exceptions.RequestException as e:
+            raise UbeeFreshCrawlError(endpoint if page is None else '{} (page {})'.format(endpoint, page), e)
+
     def get_settings(self):
         return self.get(endpoint='v2/settings/helpdesk')
 
-    def get(self, endpoint: str, page: int = None, per_page: int = None) -> Tuple[bool, dict]:
+    def _url(self, endpoint: str) -> str:
+        if self.base_url is not None:
+            return self.base_url + endpoint
+
         url_tpl = 'https://{domain}.freshdesk.com/api/{endpoint}'
 
-        url = url_tpl.format(
+        return url_tpl.format(
             domain=self.domain,
             endpoint=endpoint)
 
+    def _timeout(self, method: str, endpoint: str, default: float) -> float:
+        if self.latency is None or not self.adaptive_timeouts:
+            return default
+
+        # Only idempotent GETs may fail faster than before, they are retried on timeout
+        return self.latency.timeout((method, endpoint_template(endpoint)), default, shrink=method == 'GET')
+
+    def _send(self, method: str, endpoint: str, **kwargs) -> requests.Response:
+        url = self._url(endpoint)
+        attempt = 0
+
+        if 'timeout' in kwargs:
+            kwargs['timeout'] = self._timeout(method, endpoint, kwargs['timeout'])
+
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+
+            start = time.perf_counter()
+
+            try:
+                with tracing.span('{} {}'.format(method, endpoint), tracing.HTTP):
+                    res = self._session.request(method=method, url=url, **kwargs)
+            except (ConnectionError, Timeout) as e:
+                if self.metrics is not None:
+                    self.metrics.observe(method, endpoint, 'error', time.perf_counter() - start, retries=attempt)
+
+                # A GET cut short by an adaptive timeout gets one more try with the full ceiling
+                if method == 'GET' and isinstance(e, Timeout) and attempt == 0 and self.latency is not None:
+                    attempt += 1
+                    kwargs['timeout'] = max(kwargs.get('timeout') or 0, self.latency.ceiling)
+                    continue
+
+                raise
+
+            if self.latency is not None and res.status_code < 500 and res.status_code != 429:
+                self.latency.observe((method, endpoint_template(endpoint)), time.perf_counter() - start)
+
+            if self.metrics is not None:
+                body = res.request.body if res.request is not None else None
+
+                # urllib3 only retries failed connections (max_retries without a status_forcelist), a 429
+                # reaches us and is retried by the loop below
+                history = getattr(getattr(res.raw, 'retries', None), 'history', None)
+                retries = (len(history) if history is not None else 0) + (1 if attempt > 0 else 0)
+
+                self.metrics.observe(
+                    method,
+                    endpoint,
+                    res.status_code,
+                    time.perf_counter() - start,
+                    bytes_sent=len(body) if body is not None else 0,
+                    bytes_received=len(res.content),
+                    retries=retries)
+
+            if res.status_code != 429 or attempt >= self.throttle_retries:
+                return res
+
+            attempt += 1
+
+            try:
+                retry_after = float(res.headers.get('Retry-After', 2 ** attempt))
+            except ValueError:
+                retry_after = 2 ** attempt
+
+            print('Throttled by Freshdesk API, retrying in {:.0f}s...'.format(retry_after))
+
+            if self.rate_limiter is not None:
+                self.rate_limiter.hold(retry_after)
+            else:
+                time.sleep(retry_after)
+
+    def close(self):
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=True)
+            self._hedge_pool = None
+
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+        return False
+
+    def _hedged(self, send, endpoint: str):
+        def run() -> requests.Response:
+            delay = self.latency.percentile(('GET', endpoint_template(endpoint)), 0.95)
+
+            if delay is None or self._hedge_pool is None:
+                return send()
+
+            res, duplicated = hedged(send, delay, self._hedge_pool)
+            if duplicated:
+                self.hedges += 1
+
+            return res
+
+        return run
+
+    def get(self, endpoint: str, page: int = None, per_page: int = None) -> Tuple[bool, dict]:
         params = {}
 
         if page is not None:
@@ -675,20 +1492,31 @@ class UbeeFreshAPI:
         if per_page is not None:
             params['per_page'] = min(per_page, 100)
 
-        try:
-            res = self._session.get(
-                url=url,
+        def send() -> requests.Response:
+            return self._send(
+                'GET',
+                endpoint=endpoint,
                 params=params,
                 timeout=10.0)
+
+        if self.hedge:
+            send = self._hedged(send, endpoint)
+
+        # Waiters get the same response object, each of them decodes its own copy of the body below
+        try:
+            if self.single_flight is not None:
+                res = self.single_flight.do((endpoint, params.get('page'), params.get('per_page')), send)
+            else:
+                res = send()
         except ConnectionError as ce:
             return False, {'code': -1, 'response': {}}
 
         if res.status_code == 200:
-            return True, res.json()
+            return True, json_loads(res.content)
 
         if res.status_code == 404:
             try:
-                res_json = res.json()
+                res_json = json_loads(res.content)
             except json.JSONDecodeError:
                 res_json = {}
 
@@ -698,39 +1526,50 @@ class UbeeFreshAPI:
         res.raise_for_status()
 
     def post(self, endpoint: str, data: dict = None) -> Tuple[bool, dict]:
-        url_tpl = 'https://{domain}.freshdesk.com/api/{endpoint}'
-
-        url = url_tpl.format(
-            domain=self.domain,
-            endpoint=endpoint)
-
         try:
-            res = self._session.post(
-                url=url,
-                json=data,
+            res = self._send(
+                'POST',
+                endpoint=endpoint,
+                data=json_dumps(data) if data is not None else None,
+                headers={'Content-Type': 'application/json'},
                 timeout=5.0)
         except ConnectionError as ce:
             return False, {'code': -1, 'response': {}}
 
         if res.status_code == 201:
-            return True, res.json()
+            return True, json_loads(res.content)
 
         if res.status_code in (404, 409):
-            return False, {'code': res.status_code, 'response': res.json()}
+            return False, {'code': res.status_code, 'response': json_loads(res.content)}
 
         print('Call to Freshdesk API failed:')
         res.raise_for_status()
 
-    def delete(self, endpoint: str) -> Tuple[bool, dict]:
-        url_tpl = 'https://{domain}.freshdesk.com/api/{endpoint}'
+    def put(self, endpoint: str, data: dict = None) -> Tuple[bool, dict]:
+        try:
+            res = self._send(
+                'PUT',
+                endpoint=endpoint,
+                data=json_dumps(data) if data is not None else None,
+                headers={'Content-Type': 'application/json'},
+                timeout=5.0)
+        except ConnectionError as ce:
+            return False, {'code': -1, 'response': {}}
 
-        url = url_tpl.format(
-            domain=self.domain,
-            endpoint=endpoint)
+        if res.status_code == 200:
+            return True, json_loads(res.content)
+
+        if res.status_code in (400, 404, 409):
+            return False, {'code': res.status_code, 'response': json_loads(res.content)}
+
+        print('Call to Freshdesk API failed:')
+        res.raise_for_status()
 
+    def delete(self, endpoint: str) -> Tuple[bool, dict]:
         try:
-            res = self._session.delete(
-                url=url,
+            res = self._send(
+                'DELETE',
+                endpoint=endpoint,
                 timeout=5.0)
         except ConnectionError as ce:
             return False, {'code': -1, 'response': {}}
@@ -739,7 +1578,7 @@ class UbeeFreshAPI:
             return True, {}
 
         if res.status_code in (404, 405, 409):
-            return False, {'code': res.status_code, 'reply': res.json()}
+            return False, {'code': res.status_code, 'reply': json_loads(res.content)}
 
         print('Call to Freshdesk API failed:')
         res.raise_for_status()
@@ -749,9 +1588,151 @@ class UbeeFreshAPI:
                     verbosity: int = 1,
                     category_subset: list = None):
 
-        portal = uf.UbeeFreshPortal(name=name)
+        with tracing.span('read_portal', tracing.CRAWL, portal=name):
+            portal = uf.UbeeFreshPortal.from_records(
+                self.iter_portal(verbosity=verbosity, category_subset=category_subset), name=name)
+
+        return portal
+
+    def refresh_category(self,
+                         portal: Union[uf.UbeeFreshPortal, str],
+                         category: Union[int, str],
+                         verbosity: int = 0) -> uf.UbeeFreshCategory:
+
+        # Re-reads one category subtree into a loaded portal (or a snapshot file, which is saved back).
+        # category is an fd_id or a name, only the category itself and its children are requested.
+        snapshot = portal if isinstance(portal, str) else None
+        if snapshot is not None:
+            portal = uf.UbeeFreshPortal.load(snapshot)
+            if portal is None:
+                return None
+
+        current = self._find_local(portal.categories, category)
+        category_id = self._resolve_id(current, category, 'v2/solutions/categories')
+
+        if category_id is None:
+            print('Category {} not found...'.format(category))
+            return None
+
+        # A name that changed on the server is resolved by the listing, the local node is then known by its id
+        if current is None:
+            current = self._find_local(portal.categories, category_id)
 
-        fd_categories = self.get_categories()
+        with tracing.span('refresh_category', tracing.CRAWL, id=category_id):
+            ok, fd_category = self.get('v2/solutions/categories/{}'.format(category_id))
+
+            if not ok:
+                print('Failed to fetch category #{}: {}'.format(category_id, fd_category))
+                return None
+
+            # Read in full before touching the portal, a failed listing leaves the old subtree in place
+            try:
+                records = list(self._iter_category(fd_category=fd_category, verbosity=verbosity))
+            except UbeeFreshCrawlError as e:
+                print('Failed to fetch category #{}: {}'.format(category_id, e))
+                return None
+
+            position = len(portal.categories)
+            if current is not None:
+                position = portal.categories.index(current)
+                portal.categories.remove(current)
+
+            uf.UbeeFreshPortal.from_records(records, portal=portal)
+
+            refreshed = portal.categories.pop()
+            portal.categories.insert(position, refreshed)
+
+        if snapshot is not None:
+            portal.save(snapshot)
+
+        return refreshed
+
+    def refresh_folder(self,
+                       portal: Union[uf.UbeeFreshPortal, str],
+                       folder: Union[int, str],
+                       verbosity: int = 0) -> uf.UbeeFreshFolder:
+
+        snapshot = portal if isinstance(portal, str) else None
+        if snapshot is not None:
+            portal = uf.UbeeFreshPortal.load(snapshot)
+            if portal is None:
+                return None
+
+        current = self._find_local([f for c in portal.categories for f in c.folders], folder)
+        folder_id = current.fd_id if current is not None else folder if isinstance(folder, int) else None
+
+        if folder_id is None:
+            print('Folder {} not found in the portal...'.format(folder))
+            return None
+
+        with tracing.span('refresh_folder', tracing.CRAWL, id=folder_id):
+            ok, fd_folder = self.get('v2/solutions/folders/{}'.format(folder_id))
+
+            if not ok:
+                print('Failed to fetch folder #{}: {}'.format(folder_id, fd_folder))
+                return None
+
+            category_id = fd_folder.get('category_id', current.parent.fd_id if current is not None else None)
+            category = self._find_local(portal.categories, category_id)
+
+            if category is None:
+                print('Category #{} of folder #{} is not in the portal, refresh the category instead...'.format(
+                    category_id, folder_id))
+                return None
+
+            try:
+                records = list(self._iter_folder(fd_folder=fd_folder, category_id=category.fd_id, verbosity=verbosity))
+            except UbeeFreshCrawlError as e:
+                print('Failed to fetch folder #{}: {}'.format(folder_id, e))
+                return None
+
+            position = len(category.folders)
+            if current is not None:
+                parent = current.parent
+                if parent is category:
+                    position = category.folders.index(current)
+                parent.folders.remove(current)
+
+            uf.UbeeFreshPortal.from_records(records, portal=portal)
+
+            refreshed = category.folders.pop()
+            category.folders.insert(position, refreshed)
+
+        if snapshot is not None:
+            portal.save(snapshot)
+
+        return refreshed
+
+    @staticmethod
+    def _find_local(nodes: list, key: Union[int, str]):
+        for node in nodes:
+            if isinstance(key, int) and node.fd_id == key:
+                return node
+            if isinstance(key, str) and node.name is not None and node.name.strip().lower() == key.strip().lower():
+                return node
+
+        return None
+
+    def _resolve_id(self, node, key: Union[int, str], endpoint: str) -> int:
+        if node is not None and node.fd_id is not None:
+            return node.fd_id
+
+        if isinstance(key, int):
+            return key
+
+        # Not in the portal yet, one listing call to look the name up
+        existing = self.find_existing(endpoint, key)
+
+        return existing.get('id') if existing is not None else None
+
+    def iter_portal(self,
+                    verbosity: int = 0,
+                    category_subset: list = None):
+
+        # Yields node records (see node_record) parent first, each followed by its translations, while the
+        # KB is being crawled. Only the current category's folder list and one page of articles are held.
+        # Raises UbeeFreshCrawlError when a listing fails, a partial crawl must not pass for the whole KB.
+        fd_categories = list(self.iter_list(endpoint='v2/solutions/categories', max_depth=None, strict=True))
 
         if verbosity > 0:
             print('Found {} categories:'.format(len(fd_categories)))
@@ -760,130 +1741,86 @@ class UbeeFreshAPI:
             if category_subset is not None and ic not in category_subset:
                 continue
 
-            if verbosity > 0:
-                print('- {}'.format(fd_category.get('name', 'Unknown')))
+            yield from self._iter_category(fd_category=fd_category, verbosity=verbosity)
 
-            category = uf.UbeeFreshCategory(
-                name=fd_category.get('name'),
-                desc=fd_category.get('description'),
-                parent=portal,
-                fd_id=fd_category.get('id'),
-                fd_portals=fd_category.get('visible_in_portals')
-            )
+    def _iter_category(self,
+                       fd_category: dict,
+                       verbosity: int = 0):
 
-            portal.add_category(category)
+        with tracing.span('category', tracing.CRAWL, id=fd_category.get('id'), title=fd_category.get('name')):
+            if verbosity > 0:
+                print('- {}'.format(fd_category.get('name', 'Unknown')))
 
-            category_translations = self.get_category_translations(category.fd_id)
+            category_translations = self.get_category_translations(fd_category.get('id'), strict=True)
 
             if len(category_translations) > 0 and verbosity > 1:
                 print('  - trans: {}'.format(', '.join(category_translations.keys())))
 
-            for lang, translation in category_translations.items():
-                category.add_translation(
-                    lang=lang,
-                    translation=uf.UbeeFreshCategory(
-                        name=translation.get('name'),
-                        desc=translation.get('description'),
-                        parent=category,
-                        fd_id=translation.get('id'),
-                        fd_portals=translation.get('visible_in_portals')
-                    )
-                )
-
-            # -------------------------------------------------------
-            # Folders
-
-            fd_folders = self.get_folders(category.fd_id)
-
-            if len(fd_folders) > 0 and verbosity > 0:
-                print('  - fetching {} folders'.format(len(fd_folders)))
-
-            for fd_folder in fd_folders:
-                if verbosity > 0:
-                    print('    - {}'.format(fd_folder.get('name', 'Unknown')))
-
-                folder = uf.UbeeFreshFolder(
-                    name=fd_folder.get('name'),
-                    desc=fd_folder.get('description'),
-                    parent=category,
-                    fd_id=fd_folder.get('id'),
-                    fd_visible=fd_folder.get('visible') == 1
-                )
-
-                category.add_folder(folder)
-
-                folder_translations = self.get_folder_translations(folder.fd_id)
-
-                if len(folder_translations) > 0 and verbosity > 1:
-                    print('      - trans: {}'.format(', '.join(folder_translations.keys())))
-
-                for lang, translation in folder_translations.items():
-                    folder.add_translation(
-                        lang=lang,
-                        translation=uf.UbeeFreshFolder(
-                            name=translation.get('name'),
-                            desc=translation.get('description'),
-                            parent=folder,
-                            fd_id=translation.get('id'),
-                            fd_visible=translation.get('visible') == 1
-                        )
-                    )
-
-                # -------------------------------------------------------
-                # Articles
-
-                fd_articles = self.get_articles(folder.fd_id)
-
-                if len(fd_articles) > 0 and verbosity > 1:
-                    print('      - fetching {} articles'.format(len(fd_articles)))
-
-                for fd_article in fd_articles:
-                    if verbosity > 2:
-                        print('        - {}'.format(fd_article.get('title', 'Unknown')))
-
-                    status = FreshStatus.PUBLISHED
-                    if fd_article.get('status') == FreshStatus.DRAFT:
-                        status = FreshStatus.DRAFT
-
-                    typ = FreshArticleType.PERMANENT
-                    if fd_article.get('type') == FreshArticleType.WORKAROUND:
-                        typ = FreshArticleType.WORKAROUND
-
-                    article = uf.UbeeFreshArticle(
-                        title=fd_article.get('title'),
-                        desc=fd_article.get('description'),
-                        parent=folder,
-                        fd_id=fd_article.get('id'),
-                        fd_status=status,
-                        fd_type=typ
-                    )
-
-                    folder.add_article(article)
-
-                    article_translations = self.get_article_translations(article.fd_id)
-
-                    if len(article_translations) > 0 and verbosity > 3:
-                        print('          - trans: {}'.format(', '.join(folder_translations.keys())))
-
-                    for lang, translation in article_translations.items():
-                        status = FreshStatus.PUBLISHED
-                        if translation.get('status') == FreshStatus.DRAFT:
-                            status = FreshStatus.DRAFT
-
-                        typ = FreshArticleType.PERMANENT
-                        if translation.get('type') == FreshArticleType.WORKAROUND:
-                            typ = FreshArticleType.WORKAROUND
-
-                        article.add_translation(
-                            lang=lang,
-                            translation=uf.UbeeFreshArticle(
-                                title=translation.get('title'),
-                                desc=translation.get('description'),
-                                parent=article,
-                                fd_id=translation.get('id'),
-                                fd_status=status,
-                                fd_type=typ
-                            )
-                        )
+        yield node_record('category', fd_category)
 
-        return portal
+        for lang, translation in category_translations.items():
+            yield node_record('category', translation, lang=lang, node_id=fd_category.get('id'))
+
+        fd_folders = list(self.iter_list(endpoint='v2/solutions/categories/{}/folders'.format(fd_category.get('id')),
+                                         max_depth=None, strict=True))
+
+        if len(fd_folders) > 0 and verbosity > 0:
+            print('  - fetching {} folders'.format(len(fd_folders)))
+
+        for fd_folder in fd_folders:
+            yield from self._iter_folder(fd_folder=fd_folder, category_id=fd_category.get('id'), verbosity=verbosity)
+
+    def _iter_folder(self,
+                     fd_folder: dict,
+                     category_id: int,
+                     verbosity: int = 0):
+
+        with tracing.span('folder', tracing.CRAWL, id=fd_folder.get('id'), title=fd_folder.get('name')):
+            if verbosity > 0:
+                print('    - {}'.format(fd_folder.get('name', 'Unknown')))
+
+            folder_translations = self.get_folder_translations(fd_folder.get('id'), strict=True)
+
+            if len(folder_translations) > 0 and verbosity > 1:
+                print('      - trans: {}'.format(', '.join(folder_translations.keys())))
+
+        yield node_record('folder', fd_folder, parent_id=category_id)
+
+        for lang, translation in folder_translations.items():
+            yield node_record('folder', translation, parent_id=category_id, lang=lang, node_id=fd_folder.get('id'))
+
+        # Page by page, article bodies are the bulk of a KB
+        for fd_article in self.iter_list(endpoint='v2/solutions/folders/{}/articles'.format(fd_folder.get('id')),
+                                         max_depth=None, strict=True):
+            yield from self._iter_article(fd_article=fd_article, folder_id=fd_folder.get('id'), verbosity=verbosity)
+
+    def _iter_article(self,
+                      fd_article: dict,
+                      folder_id: int,
+                      verbosity: int = 0):
+
+        with tracing.span('article', tracing.CRAWL, id=fd_article.get('id')):
+            if verbosity > 2:
+                print('        - {}'.format(fd_article.get('title', 'Unknown')))
+
+            article_translations = self.get_article_translations(fd_article.get('id'), strict=True)
+
+            if len(article_translations) > 0 and verbosity > 3:
+                print('          - trans: {}'.format(', '.join(article_translations.keys())))
+
+        yield node_record('article', fd_article, parent_id=folder_id)
+
+        for lang, translation in article_translations.items():
+            yield node_record('article', translation, parent_id=folder_id, lang=lang, node_id=fd_article.get('id'))
+
+
+def node_record(typ: str, data: dict, parent_id: int = None, lang: str = None, node_id: int = None) -> dict:
+    # Flat, JSON-serialisable form of a crawled node, translations share the id of the node they translate
+    return {
+        'type': typ,
+        'id': node_id if node_id is not None else data.get('id'),
+        'parent_id': parent_id,
+        'lang': lang,
+        'updated_at': data.get('updated_at'),
+        'data': data
+    }
@@ -0,0 +1,287 @@
+import os
+import json
+import hashlib
+import tempfile
+import mimetypes
+import threading
+from collections import deque
+from html.parser import HTMLParser
+from urllib.parse import urlsplit, urljoin, parse_qsl, urlencode
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Tag attributes that point at embedded files, links only count when they look like attachments
+ASSET_ATTRIBUTES = {'img': ('src',), 'source': ('src',), 'video': ('src', 'poster'), 'a': ('href',)}
+ATTACHMENT_HINTS = ('/attachments/', 'attachment', '/inline/', '.cdn.', 's3.amazonaws.com')
+# Query parameters of signed CDN links, they change on every read without changing the file
+SIGNATURE_PARAMS = ('expires', 'signature', 'token')
+SIGNATURE_PREFIXES = ('x-amz-',)
+
+
+class AssetParser(HTMLParser):
+    def __init__(self, base_url: str = None):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.urls = []
+
+    def handle_starttag(self, tag, attrs):
+        for name, value in attrs:
+            if value is None or name not in ASSET_ATTRIBUTES.get(tag, ()):
+                continue
+
+            url = urljoin(self.base_url, value.strip()) if self.base_url is not None else value.strip()
+
+            if urlsplit(url).scheme not in ('http', 'https'):
+                continue
+
+            if tag == 'a' and not any(hint in url for hint in ATTACHMENT_HINTS):
+                continue
+
+            self.urls.append(url)
+
+
+def asset_urls(html: str, base_url: str = None) -> list:
+    if html is None or html == '':
+        return []
+
+    parser = AssetParser(base_url=base_url)
+    parser.feed(html)
+    parser.close()
+
+    # Keep the order, drop repeats
+    return list(dict.fromkeys(parser.urls))
+
+
+def record_asset_urls(record: dict) -> list:
+    # Embedded files from the description plus the article's attachment list
+    data = record.get('data') or {}
+    urls = asset_urls(data.get('description'))
+
+    for attachment in data.get('attachments') or []:
+        url = attachment.get('attachment_url') if isinstance(attachment, dict) else None
+        if url is not None and url not in urls:
+            urls.append(url)
+
+    return urls
+
+
+def url_key(url: str) -> str:
+    # The URL without its signature, other parameters may well pick the file (e.g. ?id=...) and are kept
+    parts = urlsplit(url)
+    query = [(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+             if name.lower() not in SIGNATURE_PARAMS and not name.lower().startswith(SIGNATURE_PREFIXES)]
+
+    return '{}://{}{}{}'.format(parts.scheme, parts.netloc, parts.path, '?' + urlencode(query) if query else '')
+
+
+class AssetMirror:
+    # Downloads the files referenced by node records into root/objects, content-addressed so the same image used
+    # by several languages or seen in earlier backups is stored (and, by URL, fetched) once.
+    def __init__(self,
+                 root: str,
+                 max_workers: int = 8,
+                 timeout: float = 30.0,
+                 session: requests.Session = None,
+                 link_prefix: str = None,
+                 chunk_size: int = 1 << 16):
+
+        self.root = os.path.expanduser(root)
+        self.max_workers = max_workers
+        self.timeout = timeout
+        # Plain session on purpose, the Freshdesk API credentials must not go to the CDN
+        self.session = session if session is not None else requests.Session()
+        self.link_prefix = link_prefix if link_prefix is not None else self.root
+        self.chunk_size = chunk_size
+
+        self.index = self._read_index()
+        self.stats = {'urls': 0, 'downloaded': 0, 'known': 0, 'failed': 0, 'bytes': 0}
+
+        self._lock = threading.Lock()
+        self._pending = dict()
+        self._pool = None
+
+    def __repr__(self):
+        return '<AssetMirror @ {} [{} assets]>'.format(self.root, len(self.index))
+
+    def _index_file(self) -> str:
+        return os.path.join(self.root, 'index.json')
+
+    def _read_index(self) -> dict:
+        try:
+            with open(self._index_file()) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return dict()
+
+    def save_index(self):
+        os.makedirs(self.root, exist_ok=True)
+
+        with self._lock:
+            data = json.dumps(self.index, indent=1, sort_keys=True)
+
+        with open(self._index_file() + '.tmp', 'w') as of:
+            of.write(data)
+
+        os.replace(self._index_file() + '.tmp', self._index_file())
+
+    def path(self, url: str) -> str:
+        # Local file of a mirrored URL relative to root, None if it has not been downloaded
+        entry = self.index.get(url_key(url))
+
+        return entry['file'] if entry is not None else None
+
+    def download(self, url: str) -> dict:
+        key = url_key(url)
+
+        objects_dir = os.path.join(self.root, 'objects')
+        os.makedirs(objects_dir, exist_ok=True)
+
+        # Streamed to a temporary file while hashing, videos and large attachments never sit in memory
+        fd, tmp_file = tempfile.mkstemp(dir=objects_dir, suffix='.tmp')
+        sha1 = hashlib.sha1()
+        size = 0
+        complete = False
+
+        try:
+            with os.fdopen(fd, 'wb') as of:
+                with self.session.get(url, timeout=self.timeout, stream=True) as res:
+                    if res.status_code != 200:
+                        print('Cannot download {}: {}'.format(url, res.status_code))
+                        return None
+
+                    content_type = res.headers.get('Content-Type', '').split(';')[0].strip()
+
+                    for chunk in res.iter_content(chunk_size=self.chunk_size):
+                        sha1.update(chunk)
+                        of.write(chunk)
+                        size += len(chunk)
+
+            complete = True
+        except requests.exceptions.RequestException as e:
+            print('Cannot download {}: {}'.format(url, e))
+            return None
+        finally:
+            if not complete:
+                os.remove(tmp_file)
+
+        digest = sha1.hexdigest()
+
+        ext = os.path.splitext(urlsplit(url).path)[1].lower()
+        if ext == '' or len(ext) > 6:
+            ext = mimetypes.guess_extension(content_type) or ''
+
+        file = os.path.join('objects', digest[:2], digest[2:] + ext)
+        full_path = os.path.join(self.root, file)
+
+        if os.path.exists(full_path):
+            os.remove(tmp_file)
+        else:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            os.replace(tmp_file, full_path)
+
+        entry = {'digest': digest, 'file': file, 'content_type': content_type, 'size': size}
+
+        with self._lock:
+            self.index[key] = entry
+            self.stats['bytes'] += size
+
+        return entry
+
+    def fetch(self, urls: list) -> list:
+        # Futures for the given URLs, each URL is downloaded at most once per mirror and never again once indexed
+        futures = []
+
+        for url in urls:
+            key = url_key(url)
+
+            with self._lock:
+                self.stats['urls'] += 1
+
+                if key in self.index:
+                    self.stats['known'] += 1
+                    continue
+
+                future = self._pending.get(key)
+                if future is None:
+                    future = self._pending[key] = self._pool.submit(self._download, url)
+
+            futures.append(future)
+
+        return futures
+
+    def _download(self, url: str) -> dict:
+        entry = self.download(url)
+
+        with self._lock:
+            self.stats['downloaded' if entry is not None else 'failed'] += 1
+
+        return entry
+
+    def localize(self, html: str) -> str:
+        # Points mirrored URLs at the local copies
+        if html is None:
+            return html
+
+        for url in asset_urls(html):
+            file = self.path(url)
+
+            if file is not None:
+                local = os.path.join(self.link_prefix, file).replace(os.sep, '/')
+                # The markup may still carry the query string's ampersands escaped
+                html = html.replace(url, local).replace(url.replace('&', '&amp;'), local)
+
+        return html
+
+    def localize_record(self, record: dict) -> dict:
+        data = record.get('data') or {}
+
+        if data.get('description') is None:
+            return record
+
+        return dict(record, data=dict(data, description=self.localize(data['description'])))
+
+    def mirror(self, records, rewrite: bool = False, window: int = None):
+        # Backup stage: passes records through while their assets download in the background. With rewrite, a
+        # record is held until its own assets are in, at most window records are waiting at a time.
+        window = window if window is not None else self.max_workers * 4
+        waiting = deque()
+
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers)
+
+        try:
+            for record in records:
+                futures = self.fetch(record_asset_urls(record)) if record.get('type') == 'article' else []
+
+                if not rewrite:
+                    yield record
+                    continue
+
+                waiting.append((record, futures))
+
+                while len(waiting) > window:
+                    yield self._ready(*waiting.popleft())
+
+            while len(waiting) > 0:
+                yield self._ready(*waiting.popleft())
+        finally:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+            self._pending = dict()
+            self.save_index()
+
+    def _ready(self, record: dict, futures: list) -> dict:
+        for future in futures:
+            future.result()
+
+        return self.localize_record(record)
+
+    def localize_portal(self, portal):
+        # Rewrites the descriptions of a loaded portal (articles and translations) in place
+        for category in portal.categories:
+            for folder in category.folders:
+                for article in folder.articles:
+                    for node in [article] + list(article.translations.values()):
+                        node.desc = self.localize(node.desc)
+
+        return portal
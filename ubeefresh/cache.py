@@ -0,0 +1,170 @@
+import os
+import json
+import hashlib
+
+from . import sheets as ufsheets
+
+
+def spreadsheet_revision(spreadsheet) -> str:
+    # Drive modifiedTime on recent gspread, older releases expose it as an attribute or not at all
+    for getter in ('get_lastUpdateTime', 'lastUpdateTime', 'updated'):
+        value = getattr(spreadsheet, getter, None)
+
+        if callable(value):
+            try:
+                value = value()
+            except Exception:
+                value = None
+
+        if value is not None:
+            return str(value)
+
+    return None
+
+
+def values_hash(values: list) -> str:
+    return hashlib.sha1(json.dumps(values, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+class SheetsCache:
+    def __init__(self, cache_dir: str = None):
+        self.cache_dir = os.path.expanduser(cache_dir if cache_dir is not None else '~/.cache/ubeefresh/sheets')
+        self._staged = dict()
+
+    def __repr__(self):
+        return '<SheetsCache @ {}>'.format(self.cache_dir)
+
+    def _dir(self, gsid: str) -> str:
+        return os.path.join(self.cache_dir, gsid)
+
+    def _manifest_file(self, gsid: str) -> str:
+        return os.path.join(self._dir(gsid), 'manifest.json')
+
+    def _sheet_file(self, gsid: str, sheet_id) -> str:
+        return os.path.join(self._dir(gsid), 'sheet-{}.json'.format(sheet_id))
+
+    def manifest(self, gsid: str) -> dict:
+        try:
+            with open(self._manifest_file(gsid)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_json(self, file: str, data):
+        # Write-then-rename so an interrupted run never leaves a truncated cache file behind
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+
+        with open(file + '.tmp', 'w') as of:
+            json.dump(data, of, separators=(',', ':'))
+
+        os.replace(file + '.tmp', file)
+
+    def _read_sheet(self, gsid: str, sheet_id):
+        def loader() -> list:
+            with open(self._sheet_file(gsid, sheet_id)) as f:
+                return json.load(f)
+
+        return loader
+
+    def invalidate(self, gsid: str):
+        manifest = self.manifest(gsid)
+
+        if manifest is None:
+            return
+
+        for sheet in manifest.get('sheets', []):
+            try:
+                os.remove(self._sheet_file(gsid, sheet['id']))
+            except FileNotFoundError:
+                pass
+
+        os.remove(self._manifest_file(gsid))
+
+    def fetch(self,
+              gsid: str,
+              credentials_file: str = None,
+              client=None,
+              force: bool = False,
+              commit: bool = True) -> tuple:
+
+        # With commit=False the new manifest is only staged, commit() records it once the changes were handled,
+        # until then the same tabs are reported as changed again
+
+        if client is None:
+            client = ufsheets.authorize(credentials_file)
+
+        spreadsheet = client.open_by_key(gsid)
+        revision = spreadsheet_revision(spreadsheet)
+        manifest = self.manifest(gsid)
+
+        if not force and manifest is not None and revision is not None and manifest.get('revision') == revision:
+            return self._workbook(gsid, manifest), []
+
+        worksheets = spreadsheet.worksheets()
+        ranges = [ufsheets.quote_title(ws.title) for ws in worksheets]
+
+        # One batched download for every tab instead of a get_all_values per sheet
+        try:
+            value_ranges = spreadsheet.values_batch_get(ranges).get('valueRanges', [])
+            all_values = [ufsheets.pad_rows(value_range.get('values', [])) for value_range in value_ranges]
+        except AttributeError:
+            all_values = [ws.get_all_values() for ws in worksheets]
+
+        known = {sheet['id']: sheet for sheet in manifest.get('sheets', [])} if manifest is not None else dict()
+
+        changed = []
+        new_manifest = {'gsid': gsid, 'title': spreadsheet.title, 'revision': revision, 'sheets': []}
+
+        for ws, values in zip(worksheets, all_values):
+            digest = values_hash(values)
+
+            if known.get(ws.id, {}).get('hash') != digest:
+                changed.append(ws.title)
+                self._write_json(self._sheet_file(gsid, ws.id), values)
+
+            new_manifest['sheets'].append({'id': ws.id, 'title': ws.title, 'hash': digest})
+
+        current = {ws.id for ws in worksheets}
+        for sheet_id, sheet in known.items():
+            if sheet_id not in current:
+                changed.append(sheet['title'])
+                try:
+                    os.remove(self._sheet_file(gsid, sheet_id))
+                except FileNotFoundError:
+                    pass
+
+        if commit:
+            self._write_json(self._manifest_file(gsid), new_manifest)
+        else:
+            self._staged[gsid] = (new_manifest, known)
+
+        return self._workbook(gsid, new_manifest), changed
+
+    def commit(self, gsid: str, skip: list = None):
+        # Records a staged fetch, tabs in skip keep their previous hash (and the revision is left unset) so the
+        # next fetch downloads the values again and reports them as changed
+        if gsid not in self._staged:
+            return
+
+        manifest, known = self._staged.pop(gsid)
+        skip = set(skip) if skip is not None else set()
+
+        if len(skip) > 0:
+            manifest = dict(manifest, revision=None, sheets=[
+                dict(sheet, hash=known.get(sheet['id'], {}).get('hash')) if sheet['title'] in skip else sheet
+                for sheet in manifest['sheets']])
+
+        self._write_json(self._manifest_file(gsid), manifest)
+
+    def _workbook(self, gsid: str, manifest: dict) -> ufsheets.UbeeSheetsWorkbook:
+        workbook = ufsheets.UbeeSheetsWorkbook(gsid=gsid)
+        workbook.title = manifest.get('title')
+
+        for sheet in manifest.get('sheets', []):
+            workbook.add_sheet(ufsheets.UbeeSheet(
+                name=sheet['title'],
+                sheet_id=sheet['id'],
+                loader=self._read_sheet(gsid, sheet['id'])
+            ))
+
+        return workbook
@@ -0,0 +1,346 @@
+import os
+import sys
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from . import export
+from . import ubeefresh as uf
+
+SNAPSHOT_EXTENSIONS = ('.p', '.pickle', '.pkl', '.snap')
+WORKBOOK_EXTENSIONS = ('.xlsx', '.xlsm', '.ods', '.csv', '.tsv')
+MIRROR_EXTENSIONS = ('.sqlite', '.sqlite3', '.db')
+
+# Reads from the live KB instead of a file or a sheet
+FRESHDESK_SOURCE = 'freshdesk'
+
+
+def make_api(args):
+    from . import api as ufdapi
+
+    return ufdapi.UbeeFreshAPI(
+        apikey=args.api_key,
+        domain=args.domain,
+        portals=args.portals,
+        rate_limit=args.rate_limit,
+        base_url=args.base_url)
+
+
+def load_portal(source: str, args, name: str = None) -> uf.UbeeFreshPortal:
+    # A snapshot, an NDJSON export, a workbook export, a backup store (store_dir[@backup_id], latest by default),
+    # a SQLite mirror, "freshdesk" for the live KB, or a Google Sheet ID
+    ext = os.path.splitext(source)[1].lower()
+    store = store_source(source)
+
+    if source == FRESHDESK_SOURCE:
+        return make_api(args).read_portal(name if name is not None else args.domain, verbosity=args.verbose)
+
+    if store is not None:
+        from .store import BackupStore
+
+        return BackupStore(store[0]).load(store[1])
+
+    if os.path.isfile(source) and ext in SNAPSHOT_EXTENSIONS:
+        return uf.UbeeFreshPortal.load(source)
+
+    if os.path.isfile(source) and ext in MIRROR_EXTENSIONS:
+        from .mirror import KBMirror
+
+        with KBMirror(source) as mirror:
+            return mirror.portal(name=name)
+
+    if os.path.isfile(source) and ext == '.ndjson':
+        return uf.UbeeFreshPortal.from_records(export.read_ndjson(source), name=name)
+
+    if os.path.isdir(source) or (os.path.isfile(source) and ext in WORKBOOK_EXTENSIONS):
+        return uf.UbeeFreshPortal.from_file(source, name=name)
+
+    return uf.UbeeFreshPortal.from_gs(source, name=name, cache_dir=args.cache_dir, max_workers=args.jobs)
+
+
+def cmd_backup(args) -> int:
+    fd = make_api(args)
+    name = args.name if args.name is not None else fd.domain
+    records = fd.iter_portal(verbosity=args.verbose)
+    mirror = None
+
+    if args.assets is not None:
+        from .assets import AssetMirror
+
+        # Images and attachments download alongside the crawl
+        mirror = AssetMirror(args.assets, max_workers=args.jobs if args.jobs is not None else 8)
+        records = mirror.mirror(records, rewrite=args.localize_assets)
+
+    if args.store:
+        from .store import BackupStore
+
+        store = BackupStore(args.output)
+        backup_id = store.save(records, name=name)
+        stats = store.manifest(backup_id)['stats']
+
+        print('Saved backup {} of {} to {}: {} records, {} new'.format(
+            backup_id, name, args.output, stats['records'], stats['new_records']))
+    else:
+        if args.output.endswith('.ndjson'):
+            sink = export.NDJSONSink(args.output)
+        else:
+            sink = export.SnapshotSink(args.output, name=name)
+
+        with sink:
+            n = export.export(records, sink)
+
+        print('Saved {} records of {} to {}'.format(n, name, args.output))
+
+    if mirror is not None:
+        print('Assets in {}: {} downloaded ({} bytes), {} already mirrored, {} failed'.format(
+            args.assets, mirror.stats['downloaded'], mirror.stats['bytes'], mirror.stats['known'],
+            mirror.stats['failed']))
+
+    return 0 if mirror is None or mirror.stats['failed'] == 0 else 1
+
+
+def cmd_push(args) -> int:
+    portal = load_portal(args.source, args, name=args.name)
+
+    if portal is None:
+        return 1
+
+    if args.suffix is not None:
+        portal.fd_suffix = args.suffix
+
+    categories = [c for c in portal.categories if args.sheets is None or c.gs_sheet in args.sheets]
+
+    fd = make_api(args)
+
+    def push(category: uf.UbeeFreshCategory) -> bool:
+        if category.fd_id is not None and args.update:
+            return fd.update_category(category, update_translations=True, update_folders=True)
+
+        fd.create_category(category=category, create_folders=True, create_translations=True)
+
+        if category.fd_id is None:
+            return False
+
+        if args.write_back:
+            category.update_in_gs()
+
+        return True
+
+    # Categories are independent subtrees, push several at once
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs if args.jobs is not None else 1)) as pool:
+        results = list(pool.map(push, categories))
+
+    for category, ok in zip(categories, results):
+        print('{} {} #{}'.format('ok    ' if ok else 'FAILED', category.name, category.fd_id))
+
+    if args.save is not None:
+        portal.save(args.save)
+
+    return 0 if all(results) else 1
+
+
+def cmd_preview(args) -> int:
+    portal = load_portal(args.source, args, name=args.name)
+
+    if portal is None:
+        return 1
+
+    portal.render_preview(args.output)
+
+    return 0
+
+
+def store_source(source: str) -> tuple:
+    # (store_dir, backup_id) for a store_dir[@backup_id] source, None for anything else
+    store_dir, _, backup_id = source.partition('@')
+
+    if not os.path.isdir(store_dir):
+        return None
+
+    from .store import BackupStore
+
+    if not BackupStore.is_store(store_dir):
+        return None
+
+    return os.path.realpath(store_dir), backup_id if backup_id != '' else None
+
+
+def cmd_diff(args) -> int:
+    from .diff import diff_portals, diff_backups
+
+    old_store, new_store = store_source(args.old), store_source(args.new)
+
+    if old_store is not None and new_store is not None and old_store[0] == new_store[0]:
+        from .store import BackupStore
+
+        # Two backups of one store, unchanged categories are skipped by their tree hash
+        report = diff_backups(BackupStore(old_store[0]), old_store[1], new_store[1])
+    else:
+        old = load_portal(args.old, args)
+        new = load_portal(args.new, args)
+        report = diff_portals(old, new) if old is not None and new is not None else None
+
+    if report is None:
+        return 1
+
+    changes = ('added', 'removed', 'changed')
+
+    if report.get('skipped', 0) > 0 and args.verbose > 0:
+        print('{} unchanged categories skipped'.format(report['skipped']))
+
+    for change in changes:
+        print('{}: {}'.format(change, len(report[change])))
+        if args.verbose > 0:
+            for entry in report[change]:
+                if entry['fd_id'] is not None:
+                    key = '#{}'.format(entry['fd_id'])
+                elif entry['gs_range'] is not None:
+                    key = '{}!{}'.format(entry['gs_sheet'], entry['gs_range'])
+                else:
+                    key = '-'
+                print('  {} {} {}'.format(entry['type'], key, ' / '.join(str(p) for p in entry['path'])))
+                if change == 'changed':
+                    for lang, fields in entry['translations'].items():
+                        print('      {}: {}'.format(lang, fields if isinstance(fields, str) else ', '.join(fields)))
+                    if len(entry['fields']) > 0:
+                        print('      fields: {}'.format(', '.join(entry['fields'])))
+
+    return 1 if args.exit_code and any(len(report[change]) > 0 for change in changes) else 0
+
+
+def cmd_mirror(args) -> int:
+    from .mirror import KBMirror
+
+    fd = make_api(args)
+
+    with KBMirror(args.output) as mirror:
+        n = mirror.sync(fd.iter_portal(verbosity=args.verbose), name=args.name if args.name is not None else fd.domain)
+        print('Synced {} records into {}'.format(n, mirror))
+
+    return 0
+
+
+def cmd_watch(args) -> int:
+    from .watch import SheetWatcher
+
+    watcher = SheetWatcher(
+        args.gsid,
+        make_api(args),
+        cache_dir=args.cache_dir,
+        interval=args.interval,
+        debounce=args.debounce,
+        max_delay=args.max_delay,
+        max_workers=args.jobs if args.jobs is not None else 4,
+        suffix=args.suffix,
+        credentials_file=args.credentials)
+
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='ubeefresh', description='Freshdesk knowledge base and Google Sheets tools.')
+
+    parser.add_argument('--api-key', default=os.environ.get('UBEEFRESH_API_KEY'),
+                        help='Freshdesk API key (default: $UBEEFRESH_API_KEY)')
+    parser.add_argument('--domain', default=os.environ.get('UBEEFRESH_DOMAIN'),
+                        help='Freshdesk domain, the part before .freshdesk.com (default: $UBEEFRESH_DOMAIN)')
+    parser.add_argument('--base-url', default=os.environ.get('UBEEFRESH_BASE_URL'), help=argparse.SUPPRESS)
+    parser.add_argument('--portals', type=int, nargs='+', default=None, help='portal IDs new categories are visible in')
+    parser.add_argument('--credentials', default=os.environ.get('UBEEFRESH_CREDENTIALS'),
+                        help='Google service account JSON (default: $UBEEFRESH_CREDENTIALS)')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='parallel workers for sheet parsing and uploads (default: 1)')
+    parser.add_argument('--rate-limit', type=float, default=None, help='Freshdesk calls per minute')
+    parser.add_argument('--cache-dir', default=None, help='cache Google Sheets values here between runs')
+    parser.add_argument('-v', '--verbose', action='count', default=0)
+
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    backup = commands.add_parser('backup', help='save the live knowledge base to a snapshot (or .ndjson)')
+    backup.add_argument('output')
+    backup.add_argument('--name', default=None, help='portal name stored in the snapshot')
+    backup.add_argument('--store', action='store_true',
+                        help='output is a deduplicating backup store directory, only changed records are written')
+    backup.add_argument('--assets', default=None, help='mirror embedded images and attachments into this directory')
+    backup.add_argument('--localize-assets', action='store_true',
+                        help='point the saved descriptions at the mirrored copies')
+    backup.set_defaults(func=cmd_backup)
+
+    push = commands.add_parser('push', help='create (or update) categories from a sheet, export or snapshot')
+    push.add_argument('source', help='Google Sheet ID, XLSX/ODS/CSV export or snapshot')
+    push.add_argument('--name', default=None)
+    push.add_argument('--sheets', nargs='+', default=None, help='only push these sheets')
+    push.add_argument('--suffix', default=None, help='category name suffix, e.g. the country')
+    push.add_argument('--update', action='store_true', help='update categories that already have a Freshdesk ID')
+    push.add_argument('--write-back', action='store_true', help='write new category IDs back into the sheet')
+    push.add_argument('--save', default=None, help='save the pushed portal (with IDs) to this snapshot')
+    push.set_defaults(func=cmd_push)
+
+    preview = commands.add_parser('preview', help='render an HTML preview')
+    preview.add_argument('source', help='Google Sheet ID, XLSX/ODS/CSV export, snapshot, backup store or "freshdesk"')
+    preview.add_argument('-o', '--output', default='preview.html')
+    preview.add_argument('--name', default=None)
+    preview.set_defaults(func=cmd_preview)
+
+    diff = commands.add_parser('diff', help='compare two portals')
+    diff.add_argument('old', help='snapshot, export, backup store[@id], Google Sheet ID or "freshdesk"')
+    diff.add_argument('new', help='snapshot, export, backup store[@id], Google Sheet ID or "freshdesk"')
+    diff.add_argument('--exit-code', action='store_true', help='exit with 1 when there are differences')
+    diff.set_defaults(func=cmd_diff)
+
+    mirror = commands.add_parser('mirror', help='sync the live knowledge base into a local SQLite mirror')
+    mirror.add_argument('output', help='SQLite file, created when missing')
+    mirror.add_argument('--name', default=None, help='portal name stored in the mirror')
+    mirror.set_defaults(func=cmd_mirror)
+
+    watch = commands.add_parser('watch', help='keep Freshdesk in sync with a Google Sheet')
+    watch.add_argument('gsid')
+    watch.add_argument('--interval', type=float, default=15.0, help='seconds between revision checks')
+    watch.add_argument('--debounce', type=float, default=20.0, help='sync once the sheet is quiet this long')
+    watch.add_argument('--max-delay', type=float, default=60.0, help='sync at the latest this long after an edit')
+    watch.add_argument('--suffix', default=None, help='category name suffix, e.g. the country')
+    watch.set_defaults(func=cmd_watch)
+
+    return parser
+
+
+def needs_api(args) -> bool:
+    if args.command in ('backup', 'push', 'mirror', 'watch'):
+        return True
+
+    return FRESHDESK_SOURCE in (getattr(args, 'source', None), getattr(args, 'old', None), getattr(args, 'new', None))
+
+
+def main(argv: list = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    # The API falls back to placeholder credentials, fail here instead of with an HTTP error later
+    if needs_api(args):
+        if args.api_key is None:
+            parser.error('{} needs a Freshdesk API key, use --api-key or set UBEEFRESH_API_KEY'.format(args.command))
+        if args.domain is None and args.base_url is None:
+            parser.error('{} needs a Freshdesk domain, use --domain or set UBEEFRESH_DOMAIN'.format(args.command))
+
+    if args.credentials is not None:
+        uf.CREDENTIALS_FILE = args.credentials
+
+    if not needs_api(args):
+        return args.func(args)
+
+    from .api import UbeeFreshCrawlError
+
+    try:
+        return args.func(args)
+    except UbeeFreshCrawlError as e:
+        # Nothing is pruned or reported as deleted on the strength of a partial crawl
+        print('{} stopped, the KB could not be read in full: {}'.format(args.command, e))
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
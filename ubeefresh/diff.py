@@ -0,0 +1,244 @@
+from enum import Enum
+from functools import lru_cache
+from hashlib import blake2b
+
+from . import ubeefresh as uf
+
+FIELDS = {
+    'category': ('name', 'desc'),
+    'folder': ('name', 'desc'),
+    'article': ('title', 'desc', 'fd_status', 'fd_type')
+}
+
+_TYPE_TAGS = {
+    uf.UbeeFreshCategory: b'category',
+    uf.UbeeFreshFolder: b'folder',
+    uf.UbeeFreshArticle: b'article'
+}
+
+_FIELDS_BY_CLASS = {
+    uf.UbeeFreshCategory: FIELDS['category'],
+    uf.UbeeFreshFolder: FIELDS['folder'],
+    uf.UbeeFreshArticle: FIELDS['article']
+}
+
+
+def node_type(node) -> str:
+    if isinstance(node, uf.UbeeFreshArticle):
+        return 'article'
+    if isinstance(node, uf.UbeeFreshFolder):
+        return 'folder'
+    if isinstance(node, uf.UbeeFreshCategory):
+        return 'category'
+
+    return 'portal'
+
+
+def children(node) -> list:
+    if isinstance(node, uf.UbeeFreshPortal):
+        return node.categories
+    if isinstance(node, uf.UbeeFreshCategory):
+        return node.folders
+    if isinstance(node, uf.UbeeFreshFolder):
+        return node.articles
+
+    return []
+
+
+def node_key(node) -> tuple:
+    # Freshdesk ID when known, else where the node comes from in the sheet
+    if node.fd_id is not None:
+        return 'fd', node.fd_id
+
+    if node.gs_range is not None:
+        return 'gs', node.gs_sheet, node.gs_range
+
+    return 'name', node_name(node)
+
+
+def node_name(node) -> str:
+    return node.title if isinstance(node, uf.UbeeFreshArticle) else node.name
+
+
+@lru_cache(maxsize=256, typed=True)
+def _encode(value) -> bytes:
+    # Type-tagged so that None, '' and 0 never encode alike. Strings take a shortcut in own(), what comes here
+    # is None, enums and numbers, few enough to memoise
+    if value is None:
+        return b'n'
+    if isinstance(value, Enum):
+        value = value.value
+    if isinstance(value, str):
+        return b's' + value.encode('utf-8', 'surrogatepass')
+
+    return b'r' + repr(value).encode('utf-8')
+
+
+class MerkleTree:
+    # Digests per node: own = fields and translations, subtree = own plus the children's subtree digests.
+    # 128 bit BLAKE2b over length-prefixed fields, stable across processes so digests() can be kept next to a
+    # snapshot. Memoised by object id for the lifetime of the tree, nodes must not change meanwhile.
+    def __init__(self, root):
+        self.root = root
+        self._own = dict()
+        self._subtree = dict()
+
+    def own(self, node) -> bytes:
+        digest = self._own.get(id(node))
+
+        if digest is None:
+            parts = [_TYPE_TAGS.get(type(node), b'?')]
+
+            for field in _FIELDS_BY_CLASS.get(type(node), ()):
+                value = getattr(node, field, None)
+                data = b's' + value.encode('utf-8', 'surrogatepass') if type(value) is str else _encode(value)
+                parts.append(b'%d:' % len(data))
+                parts.append(data)
+
+            translations = getattr(node, 'translations', None)
+            for lang in sorted(translations) if translations else ():
+                parts.append(b't' + lang.encode('utf-8') + b'\0')
+                parts.append(self.own(translations[lang]))
+
+            digest = self._own[id(node)] = blake2b(b''.join(parts), digest_size=16).digest()
+
+        return digest
+
+    def subtree(self, node) -> bytes:
+        digest = self._subtree.get(id(node))
+
+        if digest is None:
+            own = self.own(node) if not isinstance(node, uf.UbeeFreshPortal) else b'portal'
+            digest = self._subtree[id(node)] = blake2b(
+                b''.join([own] + [self.subtree(child) for child in children(node)]), digest_size=16).digest()
+
+        return digest
+
+    def digests(self) -> dict:
+        # Subtree digest (hex) per category, folder and article key, e.g. to store with a snapshot
+        found = dict()
+
+        def walk(node):
+            for child in children(node):
+                found['{}:{}'.format(node_type(child), ':'.join(str(k) for k in node_key(child)))] = \
+                    self.subtree(child).hex()
+                walk(child)
+
+        walk(self.root)
+
+        return found
+
+
+def _entry(node, path: tuple, **extra) -> dict:
+    entry = {
+        'type': node_type(node),
+        'fd_id': node.fd_id,
+        'gs_sheet': node.gs_sheet,
+        'gs_range': node.gs_range,
+        'path': list(path) + [node_name(node)]
+    }
+    entry.update(extra)
+
+    return entry
+
+
+def _changes(old, new) -> dict:
+    fields = [field for field in FIELDS[node_type(new)] if getattr(old, field, None) != getattr(new, field, None)]
+
+    langs = sorted(set(old.translations) | set(new.translations))
+    translations = {}
+    for lang in langs:
+        if lang not in old.translations:
+            translations[lang] = 'added'
+        elif lang not in new.translations:
+            translations[lang] = 'removed'
+        else:
+            changed = [field for field in FIELDS[node_type(new)]
+                       if getattr(old.translations[lang], field, None) != getattr(new.translations[lang], field, None)]
+            if len(changed) > 0:
+                translations[lang] = changed
+
+    return {'fields': fields, 'translations': translations}
+
+
+def _match(old_children: list, new_children: list) -> tuple:
+    # By key first (fd_id / sheet range), what is left over by name, so a sheet import lines up with a backup
+    old_by_key = dict()
+    for node in old_children:
+        old_by_key.setdefault(node_key(node), node)
+
+    pairs = []
+    unmatched_new = []
+    used = set()
+
+    for node in new_children:
+        other = old_by_key.get(node_key(node))
+        if other is not None and id(other) not in used:
+            pairs.append((other, node))
+            used.add(id(other))
+        else:
+            unmatched_new.append(node)
+
+    old_by_name = dict()
+    for node in old_children:
+        if id(node) not in used:
+            old_by_name.setdefault(node_name(node), node)
+
+    added = []
+    for node in unmatched_new:
+        other = old_by_name.pop(node_name(node), None)
+        if other is not None:
+            pairs.append((other, node))
+            used.add(id(other))
+        else:
+            added.append(node)
+
+    removed = [node for node in old_children if id(node) not in used]
+
+    return pairs, added, removed
+
+
+def diff_portals(old: uf.UbeeFreshPortal, new: uf.UbeeFreshPortal) -> dict:
+    old_tree = MerkleTree(old)
+    new_tree = MerkleTree(new)
+
+    report = {'added': [], 'removed': [], 'changed': [], 'compared': 0}
+
+    def compare(a, b, path: tuple):
+        report['compared'] += 1
+
+        # Identical subtrees are skipped whole
+        if old_tree.subtree(a) == new_tree.subtree(b):
+            return
+
+        if not isinstance(b, uf.UbeeFreshPortal):
+            if old_tree.own(a) != new_tree.own(b):
+                report['changed'].append(_entry(b, path, **_changes(a, b)))
+            path = path + (node_name(b),)
+
+        pairs, added, removed = _match(children(a), children(b))
+
+        for node in added:
+            report['added'].append(_entry(node, path))
+        for node in removed:
+            report['removed'].append(_entry(node, path))
+        for a_child, b_child in pairs:
+            compare(a_child, b_child, path)
+
+    compare(old, new, ())
+
+    return report
+
+
+def diff_backups(store, old_id: str = None, new_id: str = None) -> dict:
+    # Two backups of the same BackupStore: categories whose tree object is the same in both are identical and
+    # never read, the rest goes through diff_portals
+    old, new, skipped = store.load_changed(old_id, new_id)
+
+    if old is None or new is None:
+        return None
+
+    report = diff_portals(old, new)
+    report['skipped'] = skipped
+
+    return report
@@ -21,5 +21,6 @@ class FreshVisibility(Enum):
 class UbeeFreshAPIError(Enum):
     NOT_FOUND = 1
     EXISTS = 2
+    NOT_EMPTY = 3
     METHOD_NOT_ALLOWED = 5
     OTHER = 10
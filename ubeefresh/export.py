@@ -0,0 +1,93 @@
+import json
+import pickle
+from abc import ABC, abstractmethod
+
+SNAPSHOT_FORMAT = 'ubeefresh-records'
+SNAPSHOT_VERSION = 1
+
+
+class RecordSink(ABC):
+    # Base for incremental writers of node records (see api.node_record), usable as a context manager
+    def __init__(self, file, mode: str = 'w'):
+        self._own = isinstance(file, str)
+        self.file = open(file, mode) if self._own else file
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+        return False
+
+    @abstractmethod
+    def write(self, record: dict):
+        pass
+
+    def close(self):
+        self.file.flush()
+
+        if self._own:
+            self.file.close()
+
+
+class NDJSONSink(RecordSink):
+    def __init__(self, file, ensure_ascii: bool = False):
+        super().__init__(file, 'w')
+        self.ensure_ascii = ensure_ascii
+
+    def __repr__(self):
+        return '<NDJSONSink [{} records]>'.format(self.count)
+
+    def write(self, record: dict):
+        self.file.write(json.dumps(record, ensure_ascii=self.ensure_ascii, default=str))
+        self.file.write('\n')
+        self.count += 1
+
+
+class SnapshotSink(RecordSink):
+    # A header followed by one pickle per record, UbeeFreshPortal.load rebuilds the portal from it
+    def __init__(self, file, name: str = None):
+        super().__init__(file, 'wb')
+        self.name = name
+
+        pickle.dump({'format': SNAPSHOT_FORMAT, 'version': SNAPSHOT_VERSION, 'name': name}, self.file,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+
+    def __repr__(self):
+        return '<SnapshotSink "{}" [{} records]>'.format(self.name, self.count)
+
+    def write(self, record: dict):
+        pickle.dump(record, self.file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.count += 1
+
+
+def is_snapshot_header(data) -> bool:
+    return isinstance(data, dict) and data.get('format') == SNAPSHOT_FORMAT
+
+
+def read_snapshot_records(in_file):
+    # Continues after the header has been read from in_file
+    while True:
+        try:
+            yield pickle.load(in_file)
+        except EOFError:
+            return
+
+
+def read_ndjson(file: str):
+    with open(file) as f:
+        for line in f:
+            if line.strip() != '':
+                yield json.loads(line)
+
+
+def export(records, *sinks) -> int:
+    n = 0
+    for record in records:
+        for sink in sinks:
+            sink.write(record)
+        n += 1
+
+    return n
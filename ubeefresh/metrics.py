@@ -0,0 +1,142 @@
+import re
+import threading
+
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_LANG_RE = re.compile(r'^[a-z]{2}(-[a-zA-Z]{2})?$')
+
+
+def endpoint_template(endpoint: str) -> str:
+    parts = []
+
+    for part in endpoint.strip('/').split('/'):
+        if part.isdigit():
+            parts.append('{id}')
+        elif len(parts) > 0 and parts[-1] == '{id}' and _LANG_RE.match(part):
+            parts.append('{lang}')
+        else:
+            parts.append(part)
+
+    return '/'.join(parts)
+
+
+class EndpointStats:
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.calls = 0
+        self.statuses = dict()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.retries = 0
+        self.latency_sum = 0.0
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+
+    def observe(self, status, latency: float, bytes_sent: int, bytes_received: int, retries: int):
+        self.calls += 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.bytes_sent += bytes_sent
+        self.bytes_received += bytes_received
+        self.retries += retries
+        self.latency_sum += latency
+
+        for i, bound in enumerate(self.buckets):
+            if latency <= bound:
+                self.bucket_counts[i] += 1
+                break
+        else:
+            self.bucket_counts[-1] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            'calls': self.calls,
+            'statuses': dict(self.statuses),
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'retries': self.retries,
+            'latency_sum': self.latency_sum,
+            'latency_buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'], self.bucket_counts))
+        }
+
+
+class MetricsRegistry:
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._stats = dict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<MetricsRegistry[{} endpoints]>'.format(len(self._stats))
+
+    def observe(self,
+                method: str,
+                endpoint: str,
+                status,
+                latency: float,
+                bytes_sent: int = 0,
+                bytes_received: int = 0,
+                retries: int = 0):
+
+        key = (method.upper(), endpoint_template(endpoint))
+
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = EndpointStats(buckets=self.buckets)
+
+            stats.observe(status, latency, bytes_sent, bytes_received, retries)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {'{} {}'.format(method, template): stats.to_dict()
+                    for (method, template), stats in self._stats.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stats = dict()
+
+    def to_prometheus(self, prefix: str = 'ubeefresh') -> str:
+        def esc(value) -> str:
+            return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+        calls, transferred, retries, latency = [], [], [], []
+
+        with self._lock:
+            for (method, template), stats in sorted(self._stats.items()):
+                labels = 'method="{}",endpoint="{}"'.format(esc(method), esc(template))
+
+                for status, n in sorted(stats.statuses.items(), key=lambda item: str(item[0])):
+                    calls.append('{}_requests_total{{{},status="{}"}} {}'.format(prefix, labels, esc(status), n))
+
+                transferred.append('{}_transferred_bytes_total{{{},direction="sent"}} {}'.format(
+                    prefix, labels, stats.bytes_sent))
+                transferred.append('{}_transferred_bytes_total{{{},direction="received"}} {}'.format(
+                    prefix, labels, stats.bytes_received))
+
+                retries.append('{}_retries_total{{{}}} {}'.format(prefix, labels, stats.retries))
+
+                cumulative = 0
+                for bound, n in zip([str(b) for b in stats.buckets] + ['+Inf'], stats.bucket_counts):
+                    cumulative += n
+                    latency.append('{}_request_duration_seconds_bucket{{{},le="{}"}} {}'.format(
+                        prefix, labels, bound, cumulative))
+                latency.append('{}_request_duration_seconds_sum{{{}}} {:.6f}'.format(prefix, labels, stats.latency_sum))
+                latency.append('{}_request_duration_seconds_count{{{}}} {}'.format(prefix, labels, stats.calls))
+
+        lines = [
+            '# HELP {}_requests_total Freshdesk API calls by endpoint and status.'.format(prefix),
+            '# TYPE {}_requests_total counter'.format(prefix)] + calls + [
+            '# HELP {}_transferred_bytes_total Request and response body bytes.'.format(prefix),
+            '# TYPE {}_transferred_bytes_total counter'.format(prefix)] + transferred + [
+            '# HELP {}_retries_total Calls retried after throttling.'.format(prefix),
+            '# TYPE {}_retries_total counter'.format(prefix)] + retries + [
+            '# HELP {}_request_duration_seconds Freshdesk API call latency.'.format(prefix),
+            '# TYPE {}_request_duration_seconds histogram'.format(prefix)] + latency
+
+        return '\n'.join(lines) + '\n'
+
+    def dump_prometheus(self, file: str, prefix: str = 'ubeefresh'):
+        with open(file, 'w') as of:
+            of.write(self.to_prometheus(prefix=prefix))
+
+
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,313 @@
+import os
+import time
+import sqlite3
+
+from . import ubeefresh as uf
+from .transport import json_loads, json_dumps
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY, position INTEGER, name TEXT, updated_at TEXT, sync INTEGER, data BLOB);
+CREATE TABLE IF NOT EXISTS folders (
+    id INTEGER PRIMARY KEY, category_id INTEGER, position INTEGER, name TEXT, visibility INTEGER, updated_at TEXT,
+    sync INTEGER, data BLOB);
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY, folder_id INTEGER, position INTEGER, title TEXT, status INTEGER, type INTEGER,
+    updated_at TEXT, sync INTEGER, data BLOB);
+CREATE TABLE IF NOT EXISTS translations (
+    kind TEXT, id INTEGER, lang TEXT, position INTEGER, title TEXT, status INTEGER, updated_at TEXT, sync INTEGER,
+    data BLOB, PRIMARY KEY (kind, id, lang));
+CREATE INDEX IF NOT EXISTS folders_category ON folders (category_id, position);
+CREATE INDEX IF NOT EXISTS articles_folder ON articles (folder_id, position);
+CREATE INDEX IF NOT EXISTS articles_status ON articles (status);
+CREATE INDEX IF NOT EXISTS articles_updated ON articles (updated_at);
+CREATE INDEX IF NOT EXISTS translations_lang ON translations (lang, kind);
+CREATE INDEX IF NOT EXISTS translations_updated ON translations (updated_at);
+'''
+
+TABLES = {'category': 'categories', 'folder': 'folders', 'article': 'articles'}
+
+
+class KBMirror:
+    # Node records (see api.node_record) kept in SQLite, one row per node and one per translation. Can be fed
+    # with sync(records) or used as a sink for export.export, and turns query results back into portal subtrees.
+    def __init__(self, file: str, batch: int = 1000):
+        self.file = os.path.expanduser(file)
+        self.batch = batch
+
+        self.db = sqlite3.connect(self.file)
+        self.db.executescript(SCHEMA)
+
+        self._rows = {table: [] for table in list(TABLES.values()) + ['translations']}
+        self._sync = None
+        self._position = 0
+
+    def __repr__(self):
+        return '<KBMirror @ {} [{} articles, synced {}]>'.format(
+            self.file, self.count('articles'), self.meta('synced_at'))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+        return False
+
+    def meta(self, key: str) -> str:
+        row = self.db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+
+        return row[0] if row is not None else None
+
+    def count(self, table: str) -> int:
+        return self.db.execute('SELECT COUNT(*) FROM {}'.format(table)).fetchone()[0]
+
+    # Writing
+
+    def begin(self, name: str = None):
+        self._sync = int(self.meta('sync') or 0) + 1
+        self._position = 0
+
+        if name is not None:
+            with self.db:
+                self.db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('name', name))
+
+    def write(self, record: dict):
+        if self._sync is None:
+            self.begin()
+
+        data = record['data']
+        kind = record['type']
+        title = data.get('title') if kind == 'article' else data.get('name')
+        self._position += 1
+
+        if record['lang'] is not None:
+            row = (kind, record['id'], record['lang'], self._position, title, data.get('status'),
+                   record['updated_at'], self._sync, json_dumps(data))
+            self._rows['translations'].append(row)
+        elif kind == 'category':
+            self._rows['categories'].append(
+                (record['id'], self._position, title, record['updated_at'], self._sync, json_dumps(data)))
+        elif kind == 'folder':
+            self._rows['folders'].append(
+                (record['id'], record['parent_id'], self._position, title, data.get('visibility'),
+                 record['updated_at'], self._sync, json_dumps(data)))
+        elif kind == 'article':
+            self._rows['articles'].append(
+                (record['id'], record['parent_id'], self._position, title, data.get('status'), data.get('type'),
+                 record['updated_at'], self._sync, json_dumps(data)))
+
+        if sum(len(rows) for rows in self._rows.values()) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        with self.db:
+            for table, rows in self._rows.items():
+                if len(rows) > 0:
+                    self.db.executemany('INSERT OR REPLACE INTO {} VALUES ({})'.format(
+                        table, ', '.join('?' * len(rows[0]))), rows)
+                    rows.clear()
+
+    def commit(self, prune: bool = True) -> int:
+        # Ends a sync. With prune, rows the sync did not see are dropped, so only prune after a full crawl.
+        self.flush()
+        removed = 0
+
+        with self.db:
+            if prune and self._sync is not None:
+                for table in list(TABLES.values()) + ['translations']:
+                    removed += self.db.execute('DELETE FROM {} WHERE sync < ?'.format(table), (self._sync,)).rowcount
+
+            if self._sync is not None:
+                self.db.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)', [
+                    ('sync', str(self._sync)),
+                    ('synced_at', time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()))])
+
+        self._sync = None
+
+        return removed
+
+    def sync(self, records, name: str = None, prune: bool = True) -> int:
+        # A crawl that fails keeps what it wrote but prunes nothing, neither does one that found no records
+        self.begin(name=name)
+
+        n = 0
+        try:
+            for record in records:
+                self.write(record)
+                n += 1
+        except Exception:
+            self.commit(prune=False)
+            raise
+
+        self.commit(prune=prune and n > 0)
+
+        return n
+
+    def close(self):
+        if self._sync is not None:
+            self.commit(prune=False)
+
+        self.db.close()
+
+    # Reading
+
+    def find_articles(self,
+                      status: int = None,
+                      lang: str = None,
+                      folder_id: int = None,
+                      updated_since: str = None,
+                      title_like: str = None) -> list:
+
+        # Matching article rows as dicts (no bodies), with lang the translations in that language are searched
+        table = 'translations' if lang is not None else 'articles'
+        where = ["kind = 'article'", 'lang = ?'] if lang is not None else []
+        params = [lang] if lang is not None else []
+
+        for column, op, value in (('status', '=', status),
+                                  ('updated_at', '>=', updated_since),
+                                  ('title', 'LIKE', title_like)):
+            if value is not None:
+                where.append('{} {} ?'.format(column, op))
+                params.append(value)
+
+        if folder_id is not None:
+            where.append('id IN (SELECT id FROM articles WHERE folder_id = ?)' if lang is not None else 'folder_id = ?')
+            params.append(folder_id)
+
+        columns = 'id, lang, title, status, updated_at' if lang is not None else \
+            'id, folder_id, title, status, updated_at'
+        cursor = self.db.execute('SELECT {} FROM {}{} ORDER BY position'.format(
+            columns, table, ' WHERE ' + ' AND '.join(where) if len(where) > 0 else ''), params)
+        names = [d[0] for d in cursor.description]
+
+        return [dict(zip(names, row)) for row in cursor]
+
+    def _translations(self, kind: str, ids: list) -> dict:
+        found = dict()
+
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            query = 'SELECT id, lang, updated_at, data FROM translations WHERE kind = ? AND id IN ({}) ' \
+                    'ORDER BY position'.format(', '.join('?' * len(chunk)))
+
+            for node_id, lang, updated_at, data in self.db.execute(query, [kind] + chunk):
+                found.setdefault(node_id, []).append((lang, updated_at, data))
+
+        return found
+
+    def _rows_by_id(self, query: str, ids: list) -> list:
+        rows = []
+
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            rows += self.db.execute(query.format(', '.join('?' * len(chunk))), chunk).fetchall()
+
+        return rows
+
+    def records(self,
+                category_ids: list = None,
+                folder_ids: list = None,
+                article_ids: list = None):
+
+        # Node records in crawl order for the selected nodes plus their ancestors (and descendants of the selected
+        # categories / folders), ready for UbeeFreshPortal.from_records
+        def record(kind, node_id, parent_id, lang, updated_at, data):
+            return {'type': kind, 'id': node_id, 'parent_id': parent_id, 'lang': lang, 'updated_at': updated_at,
+                    'data': json_loads(data)}
+
+        if article_ids is not None:
+            articles = self._rows_by_id(
+                'SELECT id, folder_id, updated_at, data FROM articles WHERE id IN ({}) ORDER BY position', article_ids)
+        elif folder_ids is not None:
+            articles = self._rows_by_id(
+                'SELECT id, folder_id, updated_at, data FROM articles WHERE folder_id IN ({}) ORDER BY position',
+                folder_ids)
+        elif category_ids is not None:
+            articles = self._rows_by_id(
+                'SELECT a.id, a.folder_id, a.updated_at, a.data FROM articles a JOIN folders f ON a.folder_id = f.id '
+                'WHERE f.category_id IN ({}) ORDER BY a.position', category_ids)
+        else:
+            articles = self.db.execute(
+                'SELECT id, folder_id, updated_at, data FROM articles ORDER BY position').fetchall()
+
+        wanted_folders = set(folder_ids or []) | {row[1] for row in articles}
+        if category_ids is not None and folder_ids is None and article_ids is None:
+            folders = self._rows_by_id(
+                'SELECT id, category_id, updated_at, data FROM folders WHERE category_id IN ({}) ORDER BY position',
+                category_ids)
+        elif folder_ids is None and article_ids is None:
+            folders = self.db.execute(
+                'SELECT id, category_id, updated_at, data FROM folders ORDER BY position').fetchall()
+        else:
+            folders = self._rows_by_id(
+                'SELECT id, category_id, updated_at, data FROM folders WHERE id IN ({}) ORDER BY position',
+                list(wanted_folders))
+
+        wanted_categories = set(category_ids or []) | {row[1] for row in folders}
+        if category_ids is None and folder_ids is None and article_ids is None:
+            categories = self.db.execute('SELECT id, updated_at, data FROM categories ORDER BY position').fetchall()
+        else:
+            categories = self._rows_by_id(
+                'SELECT id, updated_at, data FROM categories WHERE id IN ({}) ORDER BY position',
+                list(wanted_categories))
+
+        translations = {
+            'category': self._translations('category', [row[0] for row in categories]),
+            'folder': self._translations('folder', [row[0] for row in folders]),
+            'article': self._translations('article', [row[0] for row in articles])
+        }
+
+        folders_by_category = dict()
+        for row in folders:
+            folders_by_category.setdefault(row[1], []).append(row)
+
+        articles_by_folder = dict()
+        for row in articles:
+            articles_by_folder.setdefault(row[1], []).append(row)
+
+        def with_translations(kind, node_id, parent_id, updated_at, data):
+            yield record(kind, node_id, parent_id, None, updated_at, data)
+            for lang, translation_updated_at, translation in translations[kind].get(node_id, []):
+                yield record(kind, node_id, None, lang, translation_updated_at, translation)
+
+        for category_id, updated_at, data in categories:
+            yield from with_translations('category', category_id, None, updated_at, data)
+
+            for folder_id, _, updated_at, data in folders_by_category.get(category_id, []):
+                yield from with_translations('folder', folder_id, category_id, updated_at, data)
+
+                for article_id, _, updated_at, data in articles_by_folder.get(folder_id, []):
+                    yield from with_translations('article', article_id, folder_id, updated_at, data)
+
+    def portal(self, name: str = None, **selection) -> uf.UbeeFreshPortal:
+        # The whole KB, or the subtree picked by category_ids / folder_ids / article_ids
+        name = name if name is not None else self.meta('name')
+
+        return uf.UbeeFreshPortal.from_records(self.records(**selection), name=name)
+
+    def category(self, category_id: int) -> uf.UbeeFreshCategory:
+        portal = self.portal(category_ids=[category_id])
+
+        return portal.categories[0] if len(portal.categories) > 0 else None
+
+    def folder(self, folder_id: int) -> uf.UbeeFreshFolder:
+        # Comes with its category (holding only this folder) as parent
+        portal = self.portal(folder_ids=[folder_id])
+
+        for category in portal.categories:
+            for folder in category.folders:
+                return folder
+
+        return None
+
+    def article(self, article_id: int) -> uf.UbeeFreshArticle:
+        portal = self.portal(article_ids=[article_id])
+
+        for category in portal.categories:
+            for folder in category.folders:
+                for article in folder.articles:
+                    return article
+
+        return None
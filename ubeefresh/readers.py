@@ -0,0 +1,182 @@
+import os
+import csv
+import zipfile
+import datetime
+import itertools
+from xml.etree import ElementTree
+
+_ODS_NS = {
+    'table': 'urn:oasis:names:tc:opendocument:xmlns:table:1.0',
+    'text': 'urn:oasis:names:tc:opendocument:xmlns:text:1.0',
+}
+
+_TABLE = '{%s}table' % _ODS_NS['table']
+_ROW = '{%s}table-row' % _ODS_NS['table']
+_CELL = '{%s}table-cell' % _ODS_NS['table']
+_COVERED = '{%s}covered-table-cell' % _ODS_NS['table']
+_NAME = '{%s}name' % _ODS_NS['table']
+_ROWS_REPEATED = '{%s}number-rows-repeated' % _ODS_NS['table']
+_COLS_REPEATED = '{%s}number-columns-repeated' % _ODS_NS['table']
+_P = '{%s}p' % _ODS_NS['text']
+_S = '{%s}s' % _ODS_NS['text']
+_C = '{%s}c' % _ODS_NS['text']
+_TAB = '{%s}tab' % _ODS_NS['text']
+_LINE_BREAK = '{%s}line-break' % _ODS_NS['text']
+
+
+def cell_text(value) -> str:
+    # Render typed spreadsheet values the way get_all_values shows them
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+
+    return str(value)
+
+
+def _trim(row: list) -> list:
+    end = len(row)
+    while end > 0 and row[end - 1] == '':
+        end -= 1
+
+    return row[:end]
+
+
+def iter_csv(path: str, title: str = None, delimiter: str = None, encoding: str = 'utf-8-sig'):
+    title = title if title is not None else os.path.splitext(os.path.basename(path))[0]
+
+    with open(path, newline='', encoding=encoding) as f:
+        if delimiter is None:
+            try:
+                delimiter = csv.Sniffer().sniff(f.read(64 * 1024), delimiters=',;\t').delimiter
+            except csv.Error:
+                delimiter = ','
+            f.seek(0)
+
+        for row in csv.reader(f, delimiter=delimiter):
+            yield title, row
+
+
+def iter_xlsx(path: str):
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportError('Reading XLSX files requires openpyxl (pip install openpyxl)')
+
+    # read_only streams rows from the zipped XML instead of building the whole workbook
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+
+    try:
+        for ws in wb.worksheets:
+            for row in ws.iter_rows(values_only=True):
+                yield ws.title, _trim([cell_text(value) for value in row])
+    finally:
+        wb.close()
+
+
+def _ods_cell_text(cell: ElementTree.Element) -> str:
+    def walk(element: ElementTree.Element) -> str:
+        parts = [element.text or '']
+
+        for child in element:
+            if child.tag == _S:
+                parts.append(' ' * int(child.get(_C, '1')))
+            elif child.tag == _TAB:
+                parts.append('\t')
+            elif child.tag == _LINE_BREAK:
+                parts.append('\n')
+            else:
+                parts.append(walk(child))
+
+            parts.append(child.tail or '')
+
+        return ''.join(parts)
+
+    # Direct paragraphs only, annotations (comments) carry their own text:p
+    return '\n'.join(walk(p) for p in cell if p.tag == _P)
+
+
+def iter_ods(path: str):
+    with zipfile.ZipFile(path) as zf, zf.open('content.xml') as content:
+        title = None
+        row = []
+        stack = []
+        pending_cells = 0
+        pending_rows = 0
+
+        for event, element in ElementTree.iterparse(content, events=('start', 'end')):
+            if event == 'start':
+                stack.append(element)
+
+                if element.tag == _TABLE:
+                    title = element.get(_NAME)
+                    pending_rows = 0
+                continue
+
+            stack.pop()
+
+            if element.tag in (_CELL, _COVERED):
+                text = _ods_cell_text(element)
+                repeat = int(element.get(_COLS_REPEATED, '1'))
+
+                # Empty cells are often repeated up to the sheet width, only expand them when content follows
+                if text == '':
+                    pending_cells += repeat
+                else:
+                    row.extend([''] * pending_cells)
+                    row.extend([text] * repeat)
+                    pending_cells = 0
+
+            elif element.tag == _ROW:
+                repeat = int(element.get(_ROWS_REPEATED, '1'))
+
+                # Same for the empty rows padding a sheet to 1M rows
+                if len(row) == 0:
+                    pending_rows += repeat
+                else:
+                    for _ in range(pending_rows):
+                        yield title, []
+                    pending_rows = 0
+
+                    for _ in range(repeat):
+                        yield title, list(row)
+
+                row = []
+                pending_cells = 0
+
+                # Drop the finished row from the tree to keep memory constant
+                if len(stack) > 0:
+                    stack[-1].remove(element)
+
+            elif element.tag == _TABLE and len(stack) > 0:
+                stack[-1].remove(element)
+
+
+def iter_rows(path: str, **kwargs):
+    ext = os.path.splitext(path)[1].lower()
+
+    if os.path.isdir(path):
+        return itertools.chain.from_iterable(
+            iter_csv(os.path.join(path, name), **kwargs)
+            for name in sorted(os.listdir(path)) if os.path.splitext(name)[1].lower() in ('.csv', '.tsv'))
+
+    if ext in ('.xlsx', '.xlsm'):
+        return iter_xlsx(path)
+    if ext == '.ods':
+        return iter_ods(path)
+    if ext in ('.csv', '.tsv'):
+        if ext == '.tsv':
+            kwargs.setdefault('delimiter', '\t')
+        return iter_csv(path, **kwargs)
+
+    raise ValueError('Unsupported workbook format "{}"'.format(ext))
+
+
+def iter_sheets(path: str, **kwargs):
+    # Yields (title, rows) pairs, rows is a lazy iterator that is only valid until the next sheet is requested
+    for title, group in itertools.groupby(iter_rows(path, **kwargs), key=lambda item: item[0]):
+        yield title, (row for _, row in group)
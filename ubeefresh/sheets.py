@@ -1,61 +1,359 @@
-import string
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+import re
+import threading
+from typing import Union, Callable
+from concurrent.futures import ThreadPoolExecutor
 
 SCOPES = ['https://spreadsheets.google.com/feeds',
           'https://www.googleapis.com/auth/drive']
 
 CREDENTIALS_FILE = 'path/to/gapps_credentials.json'
 
+
+def authorize(credentials_file: str = None) -> 'gspread.Client':
+    # gspread and oauth2client are slow to import, only load them when Sheets are actually used
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+
+    credentials = ServiceAccountCredentials.from_json_keyfile_name(
+        credentials_file if credentials_file is not None else CREDENTIALS_FILE, SCOPES)
+
+    return gspread.authorize(credentials)
+
+
+def pad_rows(rows: list) -> list:
+    # The values API trims trailing empty cells, get_all_values returns a rectangle
+    w = max([len(r) for r in rows]) if len(rows) > 0 else 0
+    return [r + [''] * (w - len(r)) if len(r) < w else r for r in rows]
+
+
+def quote_title(title: str) -> str:
+    return "'{}'".format(title.replace("'", "''"))
+
+
+def column_blocks(blocks: list) -> list:
+    # Sort and merge overlapping/adjacent (c0, c1) spans so each column is requested once
+    merged = []
+    for c0, c1 in sorted(blocks):
+        if len(merged) > 0 and c0 <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], c1))
+        else:
+            merged.append((c0, c1))
+
+    return merged
+
+
+def assemble_columns(blocks: list, block_values: list) -> list:
+    # Put column blocks back at their original positions, everything else stays ''
+    h = max([len(values) for values in block_values]) if len(block_values) > 0 else 0
+    w = max([c1 for _, c1 in blocks]) if len(blocks) > 0 else 0
+    rows = [[''] * w for _ in range(h)]
+
+    for (c0, c1), values in zip(blocks, block_values):
+        for row, block_row in zip(rows, values):
+            row[c0:c0 + len(block_row)] = block_row[:c1 - c0]
+
+    return rows
+
+
+_A1_RE = re.compile(r'^\$?([A-Za-z]*)\$?(\d*)$')
+_R1C1_RE = re.compile(r'^[Rr](\d*)[Cc](\d*)$')
+
+
+def col_to_index(col: str) -> int:
+    # 'A' -> 0, 'Z' -> 25, 'AA' -> 26
+    index = 0
+    for c in col.upper():
+        if not 'A' <= c <= 'Z':
+            raise ValueError('Invalid column "{}"'.format(col))
+        index = index * 26 + ord(c) - ord('A') + 1
+
+    return index - 1
+
+
+def index_to_col(index: int) -> str:
+    col = ''
+    index += 1
+    while index > 0:
+        index, rem = divmod(index - 1, 26)
+        col = chr(ord('A') + rem) + col
+
+    return col
+
+
+def rowcol_to_a1(row: int, col: int) -> str:
+    # 1-based, same as gspread.utils.rowcol_to_a1
+    return '{}{}'.format(index_to_col(col - 1), row)
+
+
+def a1_to_rowcol(label: str) -> tuple:
+    row, col = _parse_ref(label)
+    if row is None or col is None:
+        raise ValueError('"{}" is not a single cell reference'.format(label))
+
+    return row + 1, col + 1
+
+
+def _parse_ref(ref: str) -> tuple:
+    # Returns 0-based (row, col), either may be None for whole rows/columns
+    match = _R1C1_RE.match(ref)
+    if match is not None:
+        row, col = match.groups()
+        return int(row) - 1 if row != '' else None, int(col) - 1 if col != '' else None
+
+    match = _A1_RE.match(ref)
+    if match is None or ref in ('', '$'):
+        raise ValueError('Invalid cell reference "{}"'.format(ref))
+
+    col, row = match.groups()
+    return int(row) - 1 if row != '' else None, col_to_index(col) if col != '' else None
+
+
+def parse_range(rng: str, h: int = None, w: int = None) -> tuple:
+    # A1 ('B2', 'A1:C10', 'A:C', '2:5', 'Sheet!A1:B2') or R1C1 ('R2C1:R10C3') notation
+    # to 0-based half-open (r0, c0, r1, c1), open ends are bounded by h and w
+    if '!' in rng:
+        rng = rng.rsplit('!', 1)[1]
+
+    refs = rng.strip().split(':')
+    if len(refs) > 2:
+        raise ValueError('Invalid range "{}"'.format(rng))
+
+    r0, c0 = _parse_ref(refs[0])
+    r1, c1 = _parse_ref(refs[-1])
+
+    if len(refs) == 1 and (r0 is None or c0 is None):
+        raise ValueError('Invalid range "{}"'.format(rng))
+
+    r0 = r0 if r0 is not None else 0
+    c0 = c0 if c0 is not None else 0
+    r1 = r1 + 1 if r1 is not None else h
+    c1 = c1 + 1 if c1 is not None else w
+
+    if r1 is None or c1 is None:
+        raise ValueError('Open range "{}" needs sheet dimensions'.format(rng))
+
+    return min(r0, r1 - 1), min(c0, c1 - 1), max(r0 + 1, r1), max(c0 + 1, c1)
+
+
+class SheetView:
+    def __init__(self,
+                 sheet: 'UbeeSheet',
+                 r0: int, c0: int, r1: int, c1: int):
+
+        self.sheet = sheet
+        self.r0, self.c0 = max(0, r0), max(0, c0)
+        self.r1, self.c1 = min(r1, sheet.h), min(c1, sheet.w)
+
+    def __repr__(self):
+        return '<SheetView {}:{} ({}x{})>'.format(
+            rowcol_to_a1(self.r0 + 1, self.c0 + 1), rowcol_to_a1(self.r1, self.c1), self.w, self.h)
+
+    @property
+    def h(self) -> int:
+        return max(0, self.r1 - self.r0)
+
+    @property
+    def w(self) -> int:
+        return max(0, self.c1 - self.c0)
+
+    @property
+    def is_vector(self) -> bool:
+        return self.h == 1 or self.w == 1
+
+    def __len__(self):
+        if self.h == 1:
+            return self.w
+
+        return self.h
+
+    def __getitem__(self, k):
+        if isinstance(k, tuple):
+            j, i = k
+            if not (0 <= j < self.h and 0 <= i < self.w):
+                raise IndexError('View index out of range')
+            return self.sheet._cells[(self.r0 + j) * self.sheet.w + self.c0 + i]
+
+        if isinstance(k, slice):
+            return [self[i] for i in range(*k.indices(len(self)))]
+
+        if k < 0:
+            k += len(self)
+
+        if not 0 <= k < len(self):
+            raise IndexError('View index out of range')
+
+        # Single row: cells, single column: cells, 2D: row views
+        if self.h == 1:
+            return self.sheet._cells[self.r0 * self.sheet.w + self.c0 + k]
+        if self.w == 1:
+            return self.sheet._cells[(self.r0 + k) * self.sheet.w + self.c0]
+
+        return SheetView(self.sheet, self.r0 + k, self.c0, self.r0 + k + 1, self.c1)
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
+
+    def values(self) -> list:
+        cells, w = self.sheet._cells, self.sheet.w
+        return [cells[r * w + self.c0:r * w + self.c1] for r in range(self.r0, self.r1)]
+
+
 class UbeeSheet:
 
     def __init__(self,
                  name: str = None,
                  data: list = None,
-                 parent: 'UbeeSheetsWorkbook' = None):
+                 parent: 'UbeeSheetsWorkbook' = None,
+                 sheet_id: int = None,
+                 loader: Callable[[], list] = None):
 
         self.name = name
+        self.parent = parent
+        self.sheet_id = sheet_id
+
+        self._cells = None
+        self._w = 0
+        self._h = 0
+
+        # Called on first access when the sheet was registered without data
+        self._loader = loader
+        self._load_lock = threading.Lock()
+
         if isinstance(data, list):
             self.data = data
 
-        self.parent = parent
-
     def __str__(self):
         desc = 'UbeeSheet "{}"'.format(self.name)
-        desc += '\n dims: ' + '{}, {}'.format(self.w, self.h) if self.data is not None else 'empty'
+        if self._cells is not None:
+            desc += '\n dims: {}, {}'.format(self._w, self._h)
+        else:
+            desc += '\n not loaded' if self._loader is not None else '\n empty'
         desc += '\n parent gsid: {}'.format(self.parent.gsid) if self.parent is not None else ''
 
         return desc
 
     def __repr__(self):
         desc = '<UbeeSheet "{}"'.format(self.name)
-        desc += ' ({}x{})'.format(self.w, self.h) if self.data is not None else' empty'
+        if self._cells is not None:
+            desc += ' ({}x{})'.format(self._w, self._h)
+        else:
+            desc += ' not loaded' if self._loader is not None else ' empty'
         desc += ' @ {}'.format(self.parent.gsid) if self.parent is not None else ''
         desc += '>'
 
         return desc
 
+    @property
+    def loaded(self) -> bool:
+        return self._cells is not None or self._loader is None
+
+    def load(self) -> 'UbeeSheet':
+        if self._loader is None:
+            return self
+
+        with self._load_lock:
+            if self._loader is not None:
+                self.data = self._loader()
+                self._loader = None
+
+        return self
+
+    @property
+    def data(self) -> list:
+        # A new list of rows on every access, nothing is kept next to the flat cells. Changing it does not change
+        # the sheet, assign the rows back to data for that
+        self.load()
+
+        if self._cells is None:
+            return None
+
+        return self.range_view(0, 0, self._h, self._w).values()
+
+    @data.setter
+    def data(self, rows: list):
+        if rows is None:
+            self._cells, self._w, self._h = None, 0, 0
+            return
+
+        # Ragged rows are padded once, dimensions never have to be recomputed afterwards
+        w = max([len(r) for r in rows]) if len(rows) > 0 else 0
+        cells = []
+        for r in rows:
+            cells.extend(r)
+            if len(r) < w:
+                cells.extend([''] * (w - len(r)))
+
+        self._cells, self._w, self._h = cells, w, len(rows)
+
     @property
     def h(self):
-        return len(self.data)
+        self.load()
+        return self._h
 
     @property
     def w(self):
-        return max([len(r) for r in self.data])
-
-    __aton = {c: i for i, c in enumerate(string.ascii_lowercase)}
+        self.load()
+        return self._w
 
     def cell(self, i, j) -> str:
-        if self.data is None or j >= len(self.data):
-            return None
+        # i is the column (index or letters), j the 0-based row
+        self.load()
 
         if isinstance(i, str):
-            i = self.__aton.get(i[0].lower(), None)
+            try:
+                i = col_to_index(i)
+            except ValueError:
+                return None
+
+        if (i is not None and i < 0) or j < 0:
+            raise IndexError('Negative cell index ({}, {})'.format(i, j))
 
-        if i is None or i >= len(self.data[j]):
+        if self._cells is None or j >= self._h:
             return None
 
-        return self.data[j][i]
+        if i is None or i >= self._w:
+            return None
+
+        return self._cells[j * self._w + i]
+
+    def acell(self, label: str) -> str:
+        row, col = a1_to_rowcol(label)
+        return self.cell(col - 1, row - 1)
+
+    def row(self, j: int) -> SheetView:
+        if not 0 <= j < self.h:
+            raise IndexError('Row {} out of range ({} rows)'.format(j, self.h))
+
+        return SheetView(self, j, 0, j + 1, self.w)
+
+    def col(self, i) -> SheetView:
+        if isinstance(i, str):
+            i = col_to_index(i)
+
+        if not 0 <= i < self.w:
+            raise IndexError('Column {} out of range ({} columns)'.format(i, self.w))
+
+        return SheetView(self, 0, i, self.h, i + 1)
+
+    def range_view(self, r0: int, c0: int, r1: int, c1: int) -> SheetView:
+        return SheetView(self, r0, c0, r1, c1)
+
+    def range(self, rng: str) -> SheetView:
+        r0, c0, r1, c1 = parse_range(rng, h=self.h, w=self.w)
+
+        # Ranges running past the edge are clipped, ranges starting outside the sheet are an error
+        if r0 >= self.h or c0 >= self.w:
+            raise IndexError('Range "{}" is outside the sheet ({}x{})'.format(rng, self.w, self.h))
+
+        return SheetView(self, r0, c0, r1, c1)
+
+    def __getitem__(self, rng) -> Union[SheetView, str]:
+        if isinstance(rng, int):
+            return self.row(rng + self.h if rng < 0 else rng)
+
+        view = self.range(rng)
+        return view[0, 0] if view.h == 1 and view.w == 1 else view
 
 
 class UbeeSheetsWorkbook:
@@ -64,6 +362,7 @@ class UbeeSheetsWorkbook:
                  sheets: list = None):
 
         self.gsid = gsid
+        self.title = None
 
         if sheets is not None and isinstance(sheets, list):
             self.sheets = sheets
@@ -86,17 +385,37 @@ class UbeeSheetsWorkbook:
             desc += '\n sheets:'
             for sheet in self.sheets:
                 desc += '\n - {}'.format(sheet.name if sheet.name is not None else 'unnamed')
+                desc += '' if sheet.loaded else ' (not loaded)'
 
         return desc
 
     def __repr__(self):
-        desc = '<UbeeSheet "{name}"'
-        desc += ' ({}x{})'.format(self.w, self.h) if self.data is not None else' empty'
-        desc += ' @ {}'.format(self.parent.gsid) if self.parent is not None else ''
+        desc = '<UbeeSheetsWorkbook'
+        desc += ' {}'.format(self.gsid) if self.gsid is not None else ''
+        desc += ' ({} sheets, {} loaded)'.format(len(self.sheets), len([s for s in self.sheets if s.loaded]))
         desc += '>'
 
         return desc
 
+    def __len__(self):
+        return len(self.sheets)
+
+    def __contains__(self, name: str):
+        return name in self.__sheet_name_map
+
+    def __getitem__(self, key: Union[str, int]) -> UbeeSheet:
+        return self.get_sheet(key)
+
+    def get_sheet(self, key: Union[str, int], load: bool = True) -> UbeeSheet:
+        if isinstance(key, str):
+            if key not in self.__sheet_name_map:
+                raise KeyError('No sheet named "{}"'.format(key))
+            key = self.__sheet_name_map[key]
+
+        sheet = self.sheets[key]
+
+        return sheet.load() if load else sheet
+
     def add_sheet(self, sheet):
         if not isinstance(sheet, UbeeSheet):
             raise TypeError('Can only add UbeeSheet-s')
@@ -104,19 +423,51 @@ class UbeeSheetsWorkbook:
         if sheet.name in self.__sheet_name_map:
             raise IndexError('Sheet with this name already exists. Use replace to replace/update')
 
+        sheet.parent = self
         self.sheets.append(sheet)
-        self.__sheet_name_map[sheet.name] = len(self.sheets)
+        self.__sheet_name_map[sheet.name] = len(self.sheets) - 1
 
-    def fetch_data(self, gsid: str = None, sheets: list = None, sheet_ids: list = None):
+    def replace_sheet(self, sheet):
+        # Swaps a sheet of the same name in place (keeping its position), adds it otherwise
+        if not isinstance(sheet, UbeeSheet):
+            raise TypeError('Can only add UbeeSheet-s')
+
+        if sheet.name not in self.__sheet_name_map:
+            return self.add_sheet(sheet)
+
+        sheet.parent = self
+        self.sheets[self.__sheet_name_map[sheet.name]] = sheet
+
+    def prefetch(self, names: list = None, max_workers: int = 4) -> 'UbeeSheetsWorkbook':
+        pending = [sheet for sheet in self.sheets
+                   if not sheet.loaded and (names is None or sheet.name in names)]
+
+        if len(pending) == 0:
+            return self
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for _ in pool.map(UbeeSheet.load, pending):
+                pass
+
+        return self
+
+    def fetch_data(self,
+                   gsid: str = None,
+                   sheets: list = None,
+                   sheet_ids: list = None,
+                   lazy: bool = True,
+                   prefetch: list = None,
+                   max_workers: int = 4,
+                   credentials_file: str = None):
 
         if self.gsid is None and gsid is None:
             raise ValueError('ID of the workbook must either be set in the object or be supplied here')
 
-        credentials = ServiceAccountCredentials.from_json_keyfile_name(CREDENTIALS_FILE, SCOPES)
-        gc = gspread.authorize(credentials)
+        gsid = gsid if gsid is not None else self.gsid
 
-        ob = gc.open_by_key(gsid)
+        ob = authorize(credentials_file).open_by_key(gsid)
 
+        # Only the sheet list is fetched here, values are downloaded when a sheet is first used
         sheet_list = ob.worksheets()
 
         if sheet_ids is None:
@@ -126,15 +477,87 @@ class UbeeSheetsWorkbook:
             sheets = []
 
         self.gsid = gsid
+        self.title = ob.title
 
         for i, sheet in enumerate(sheet_list):
             if sheet.title in sheets or i in sheet_ids:
                 continue
 
-            self.sheets.append(UbeeSheet(
+            self.replace_sheet(UbeeSheet(
                 name=sheet.title,
-                data=sheet.get_all_values(),
+                sheet_id=sheet.id,
+                loader=sheet.get_all_values,
                 parent=self
             ))
 
+        if not lazy:
+            self.prefetch(max_workers=max_workers)
+        elif prefetch is not None:
+            self.prefetch(names=prefetch, max_workers=max_workers)
+
+        return self
+
+    def fetch_columns(self,
+                      columns: Callable[[list], list],
+                      gsid: str = None,
+                      sheets: list = None,
+                      sheet_ids: list = None,
+                      header_rows: int = 20,
+                      credentials_file: str = None,
+                      client=None):
+
+        # Two batched reads: the first header_rows of every tab, then only the column blocks that
+        # columns(header) asks for. columns returns (c0, c1) 0-based half-open spans, or None for the whole tab.
+        if self.gsid is None and gsid is None:
+            raise ValueError('ID of the workbook must either be set in the object or be supplied here')
+
+        gsid = gsid if gsid is not None else self.gsid
+
+        if client is None:
+            client = authorize(credentials_file)
+
+        ob = client.open_by_key(gsid)
+
+        if sheet_ids is None:
+            sheet_ids = []
+
+        if sheets is None:
+            sheets = []
+
+        sheet_list = [sheet for i, sheet in enumerate(ob.worksheets())
+                      if sheet.title not in sheets and i not in sheet_ids]
+
+        self.gsid = gsid
+        self.title = ob.title
+
+        headers = ob.values_batch_get(
+            ['{}!1:{}'.format(quote_title(sheet.title), header_rows) for sheet in sheet_list]).get('valueRanges', [])
+
+        ranges = []
+        plan = []
+        for sheet, header in zip(sheet_list, headers):
+            blocks = columns(pad_rows(header.get('values', [])))
+
+            if blocks is None:
+                sheet_ranges = [quote_title(sheet.title)]
+            else:
+                blocks = column_blocks(blocks)
+                sheet_ranges = ['{}!{}:{}'.format(quote_title(sheet.title), index_to_col(c0), index_to_col(c1 - 1))
+                                for c0, c1 in blocks]
+
+            plan.append((sheet, blocks, len(ranges), len(sheet_ranges)))
+            ranges += sheet_ranges
+
+        value_ranges = ob.values_batch_get(ranges).get('valueRanges', []) if len(ranges) > 0 else []
+
+        for sheet, blocks, start, n in plan:
+            block_values = [value_range.get('values', []) for value_range in value_ranges[start:start + n]]
+
+            if blocks is None:
+                data = pad_rows(block_values[0]) if len(block_values) > 0 else []
+            else:
+                data = assemble_columns(blocks, block_values)
+
+            self.replace_sheet(UbeeSheet(name=sheet.title, data=data, sheet_id=sheet.id, parent=self))
+
         return self
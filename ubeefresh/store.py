@@ -0,0 +1,219 @@
+import os
+import json
+import zlib
+import time
+import hashlib
+
+from . import ubeefresh as uf
+
+STORE_FORMAT = 'ubeefresh-store'
+STORE_VERSION = 1
+
+# Counters Freshdesk bumps on every view or vote, they would make each backup a new copy of every article
+VOLATILE_FIELDS = ('hits', 'thumbs_up', 'thumbs_down', 'feedback_count')
+
+
+def canonical(obj) -> bytes:
+    # Sorted keys and fixed separators, the same record always hashes the same whatever the codec in use
+    return json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+
+
+def stable(record: dict) -> dict:
+    data = record.get('data')
+
+    if not isinstance(data, dict) or not any(field in data for field in VOLATILE_FIELDS):
+        return record
+
+    return dict(record, data={key: value for key, value in data.items() if key not in VOLATILE_FIELDS})
+
+
+class BackupStore:
+    # Node records (see api.node_record) stored once by content hash under objects/. Records are grouped per
+    # category into tree objects, and a backup manifest lists the trees, so an unchanged category costs one
+    # hash in the manifest and nothing else.
+    def __init__(self, root: str, level: int = 6):
+        self.root = os.path.expanduser(root)
+        self.level = level
+
+        self._init()
+
+    def __repr__(self):
+        return '<BackupStore @ {} [{} backups]>'.format(self.root, len(self.backups()))
+
+    @staticmethod
+    def is_store(path: str) -> bool:
+        return os.path.isfile(os.path.join(os.path.expanduser(path), 'store.json'))
+
+    def _init(self):
+        os.makedirs(os.path.join(self.root, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(self.root, 'backups'), exist_ok=True)
+
+        if not self.is_store(self.root):
+            self._write(os.path.join(self.root, 'store.json'),
+                        json.dumps({'format': STORE_FORMAT, 'version': STORE_VERSION}).encode('utf-8'))
+
+    def _write(self, file: str, data: bytes):
+        # Write-then-rename so an interrupted backup never leaves a truncated object behind
+        with open(file + '.tmp', 'wb') as of:
+            of.write(data)
+
+        os.replace(file + '.tmp', file)
+
+    def _object_file(self, digest: str) -> str:
+        return os.path.join(self.root, 'objects', digest[:2], digest[2:])
+
+    def _manifest_file(self, backup_id: str) -> str:
+        return os.path.join(self.root, 'backups', backup_id + '.json')
+
+    def put(self, obj) -> tuple:
+        # Returns the object's hash and whether it was new
+        data = canonical(obj)
+        digest = hashlib.sha1(data).hexdigest()
+        file = self._object_file(digest)
+
+        if os.path.exists(file):
+            return digest, False
+
+        os.makedirs(os.path.dirname(file), exist_ok=True)
+        self._write(file, zlib.compress(data, self.level))
+
+        return digest, True
+
+    def get(self, digest: str):
+        with open(self._object_file(digest), 'rb') as f:
+            return json.loads(zlib.decompress(f.read()))
+
+    def save(self, records, name: str = None, backup_id: str = None) -> str:
+        # Takes the records as they come from iter_portal, only records not stored before are written
+        created = time.time()
+        backup_id = backup_id if backup_id is not None else time.strftime('%Y%m%d-%H%M%S', time.gmtime(created))
+
+        n = 1
+        base_id = backup_id
+        while os.path.exists(self._manifest_file(backup_id)):
+            n += 1
+            backup_id = '{}-{}'.format(base_id, n)
+
+        trees = []
+        tree = []
+        stats = {'records': 0, 'new_records': 0, 'trees': 0, 'new_trees': 0}
+
+        def close_tree():
+            if len(tree) > 0:
+                digest, new = self.put(tree)
+                trees.append(digest)
+                stats['trees'] += 1
+                stats['new_trees'] += int(new)
+
+        for record in records:
+            # A new top level category starts a new tree, its translations and contents follow it
+            if record['type'] == 'category' and record['lang'] is None:
+                close_tree()
+                tree = []
+
+            digest, new = self.put(stable(record))
+            tree.append(digest)
+            stats['records'] += 1
+            stats['new_records'] += int(new)
+
+        close_tree()
+
+        manifest = {
+            'id': backup_id,
+            'name': name,
+            'created': created,
+            'trees': trees,
+            'stats': stats
+        }
+        self._write(self._manifest_file(backup_id), json.dumps(manifest, indent=1).encode('utf-8'))
+
+        return backup_id
+
+    def backups(self) -> list:
+        # Oldest first by creation time, IDs can be anything so their order means nothing
+        created = dict()
+
+        for file in os.listdir(os.path.join(self.root, 'backups')):
+            if file.endswith('.json'):
+                with open(os.path.join(self.root, 'backups', file)) as f:
+                    created[file[:-len('.json')]] = json.load(f).get('created', 0)
+
+        return sorted(created, key=lambda backup_id: (created[backup_id], backup_id))
+
+    def manifest(self, backup_id: str = None) -> dict:
+        # The latest backup when no ID is given
+        if backup_id is None:
+            backup_ids = self.backups()
+
+            if len(backup_ids) == 0:
+                return None
+
+            backup_id = backup_ids[-1]
+
+        try:
+            with open(self._manifest_file(backup_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            print('Backup {} not found in {}...'.format(backup_id, self.root))
+            return None
+
+    def records(self, backup_id: str = None):
+        manifest = self.manifest(backup_id)
+
+        if manifest is None:
+            return
+
+        yield from self._tree_records(manifest['trees'])
+
+    def _tree_records(self, trees: list):
+        for tree in trees:
+            for digest in self.get(tree):
+                yield self.get(digest)
+
+    def load(self, backup_id: str = None) -> uf.UbeeFreshPortal:
+        manifest = self.manifest(backup_id)
+
+        if manifest is None:
+            return None
+
+        return uf.UbeeFreshPortal.from_records(self.records(manifest['id']), name=manifest.get('name'))
+
+    def load_changed(self, old_id: str = None, new_id: str = None) -> tuple:
+        # Both backups as portals holding only the categories whose tree differs, plus how many were left out.
+        # A category tree with the same hash in both backups is identical and its records are not read.
+        old, new = self.manifest(old_id), self.manifest(new_id)
+
+        if old is None or new is None:
+            return None, None, 0
+
+        same = set(old['trees']) & set(new['trees'])
+
+        def portal(manifest):
+            return uf.UbeeFreshPortal.from_records(
+                self._tree_records([tree for tree in manifest['trees'] if tree not in same]), name=manifest.get('name'))
+
+        return portal(old), portal(new), len(same)
+
+    def remove(self, backup_id: str):
+        # Only drops the manifest, gc() frees the objects nothing else refers to
+        os.remove(self._manifest_file(backup_id))
+
+    def gc(self) -> int:
+        live = set()
+
+        for backup_id in self.backups():
+            for tree in self.manifest(backup_id)['trees']:
+                if tree not in live:
+                    live.add(tree)
+                    live.update(self.get(tree))
+
+        removed = 0
+        objects_dir = os.path.join(self.root, 'objects')
+
+        for prefix in os.listdir(objects_dir):
+            for rest in os.listdir(os.path.join(objects_dir, prefix)):
+                if prefix + rest not in live:
+                    os.remove(os.path.join(objects_dir, prefix, rest))
+                    removed += 1
+
+        return removed
@@ -4,7 +4,7 @@ LANG_LIST = ['en', 'fr', 'de', 'it', 'es', 'ca']
 
 GSID_FR = '1Ds7qctpBkRgrOaGJojrOuZSYNCoejTuG2ocRuUyjoGs'
 
-sheet_fr = ufsheets.UbeeSheetsWorkbook().fetch_data(GSID_FR)
+sheet_fr = ufsheets.UbeeSheetsWorkbook().fetch_data(GSID_FR, lazy=False)
 
 print(sheet_fr)
 
@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import pstats
+import cProfile
+import functools
+import threading
+from contextlib import nullcontext
+
+# Phases used by the instrumented code paths
+CRAWL = 'crawl'
+PARSE = 'parse'
+UPLOAD = 'upload'
+RENDER = 'render'
+HTTP = 'http'
+
+
+class Span:
+    def __init__(self,
+                 tracer: 'Tracer',
+                 name: str,
+                 phase: str,
+                 attrs: dict = None):
+
+        self.tracer = tracer
+        self.name = name
+        self.phase = phase
+        self.attrs = attrs if attrs is not None else dict()
+        self.parent = None
+        self.depth = 0
+        self.thread_id = None
+        self.start_ns = None
+        self.end_ns = None
+
+        self._profile = None
+
+    def __repr__(self):
+        return '<Span[{}/{}, {:.3f} ms]>'.format(self.phase, self.name, self.duration * 1e3)
+
+    @property
+    def duration(self) -> float:
+        if self.start_ns is None or self.end_ns is None:
+            return 0.0
+
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def __enter__(self) -> 'Span':
+        stack = self.tracer._stack()
+
+        self.parent = stack[-1] if len(stack) > 0 else None
+        self.depth = len(stack)
+        self.thread_id = threading.get_ident()
+
+        stack.append(self)
+
+        if self.phase in self.tracer.profile_phases and \
+                all(span.phase != self.phase for span in stack[:-1]):
+            self._profile = cProfile.Profile()
+            try:
+                self._profile.enable()
+            except ValueError:
+                # Another profiler is already running (only one at a time is allowed)
+                self._profile = None
+
+        self.start_ns = time.perf_counter_ns()
+
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.end_ns = time.perf_counter_ns()
+
+        if self._profile is not None:
+            self._profile.disable()
+            self.tracer._add_profile(self.phase, self._profile)
+            self._profile = None
+
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+
+        stack = self.tracer._stack()
+        if len(stack) > 0 and stack[-1] is self:
+            stack.pop()
+
+        self.tracer._finish(self)
+
+        return False
+
+
+class Tracer:
+    def __init__(self):
+        self.hooks = list()
+        self.profile_phases = set()
+        self.profiles = dict()
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<Tracer[{} hooks, profiling: {}]>'.format(
+            len(self.hooks), ', '.join(sorted(self.profile_phases)) if len(self.profile_phases) > 0 else 'off')
+
+    @property
+    def active(self) -> bool:
+        return len(self.hooks) > 0 or len(self.profile_phases) > 0
+
+    def add_hook(self, hook):
+        if not callable(hook):
+            raise TypeError('Hooks must be callables taking a finished Span')
+
+        self.hooks.append(hook)
+
+        return hook
+
+    def remove_hook(self, hook):
+        if hook in self.hooks:
+            self.hooks.remove(hook)
+
+    def span(self, name: str, phase: str = CRAWL, **attrs):
+        if not self.active:
+            return nullcontext()
+
+        return Span(tracer=self, name=name, phase=phase, attrs=attrs)
+
+    def profile(self, *phases: str):
+        self.profile_phases.update(phases)
+
+    def stop_profiling(self, *phases: str):
+        if len(phases) == 0:
+            self.profile_phases.clear()
+        else:
+            self.profile_phases.difference_update(phases)
+
+    def profile_stats(self, phase: str) -> pstats.Stats:
+        return self.profiles.get(phase)
+
+    def dump_profile(self, phase: str, file: str):
+        stats = self.profiles.get(phase)
+
+        if stats is None:
+            print('No profile captured for phase "{}"...'.format(phase))
+            return
+
+        stats.dump_stats(file)
+
+    def _stack(self) -> list:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = list()
+
+        return stack
+
+    def _add_profile(self, phase: str, profile: cProfile.Profile):
+        with self._lock:
+            if phase in self.profiles:
+                self.profiles[phase].add(profile)
+            else:
+                self.profiles[phase] = pstats.Stats(profile)
+
+    def _finish(self, span: Span):
+        for hook in list(self.hooks):
+            hook(span)
+
+
+def traced(phase: str, name: str = None):
+    def decorator(func):
+        span_name = name if name is not None else func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not TRACER.active:
+                return func(*args, **kwargs)
+
+            with TRACER.span(span_name, phase):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class ChromeTraceExporter:
+    def __init__(self, file: str):
+        self.file = file
+        self.events = list()
+
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def __call__(self, span: Span):
+        event = {
+            'name': span.name,
+            'cat': span.phase,
+            'ph': 'X',
+            'ts': span.start_ns / 1e3,
+            'dur': (span.end_ns - span.start_ns) / 1e3,
+            'pid': self._pid,
+            'tid': span.thread_id,
+            'args': {key: value if isinstance(value, (int, float, bool)) or value is None else str(value)
+                     for key, value in span.attrs.items()}
+        }
+
+        with self._lock:
+            self.events.append(event)
+
+    def __enter__(self) -> 'ChromeTraceExporter':
+        return TRACER.add_hook(self)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        TRACER.remove_hook(self)
+        self.write()
+
+        return False
+
+    def write(self, file: str = None):
+        with self._lock:
+            events = sorted(self.events, key=lambda event: event['ts'])
+
+        with open(file if file is not None else self.file, 'w') as of:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, of)
+
+
+TRACER = Tracer()
+span = TRACER.span
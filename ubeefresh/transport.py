@@ -0,0 +1,213 @@
+import json
+import time
+import threading
+from collections import deque
+from concurrent.futures import wait, FIRST_COMPLETED
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Name of the JSON codec in use, orjson when installed
+JSON_CODEC = 'orjson' if orjson is not None else 'json'
+
+
+def json_loads(data: bytes):
+    # Straight from the response bytes, no intermediate str decoding
+    if orjson is not None:
+        return orjson.loads(data)
+
+    return json.loads(data)
+
+
+def json_dumps(obj) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class RateLimiter:
+    def __init__(self,
+                 rate: float,
+                 per: float = 60.0,
+                 burst: int = None):
+
+        if rate is None or rate <= 0:
+            raise ValueError('Rate must be a positive number of calls per period')
+
+        self.rate = rate
+        self.per = per
+        self.capacity = burst if burst is not None else max(1, int(rate))
+
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<RateLimiter[{:g}/{:g}s, burst={}]>'.format(self.rate, self.per, self.capacity)
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate / self.per)
+        self._last = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+
+                if now >= self._blocked_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait = max(self._blocked_until - now, (1 - self._tokens) * self.per / self.rate)
+
+            time.sleep(wait)
+
+    def hold(self, seconds: float):
+        # Used when the server tells us to back off (429 + Retry-After)
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    # Concurrent calls with the same key share one execution of func, later callers wait for its result
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+
+        self._inflight = dict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<SingleFlight[{} calls, {} shared, {} in flight]>'.format(self.calls, self.shared, len(self._inflight))
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._inflight.get(key)
+
+            if call is None:
+                call = self._inflight[key] = _Call()
+                self.calls += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+
+            if call.error is not None:
+                raise call.error
+
+            return call.result
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Forget the key before waking waiters, a call arriving after this point starts a fresh request
+            with self._lock:
+                del self._inflight[key]
+            call.done.set()
+
+        return call.result
+
+
+class LatencyTracker:
+    # Sliding window of successful call latencies per key, e.g. (method, endpoint template)
+    def __init__(self,
+                 window: int = 200,
+                 min_samples: int = 20,
+                 factor: float = 4.0,
+                 floor: float = 2.0,
+                 ceiling: float = 60.0):
+
+        self.window = window
+        self.min_samples = min_samples
+        self.factor = factor
+        self.floor = floor
+        self.ceiling = ceiling
+
+        self._samples = dict()
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return '<LatencyTracker[{} keys, window={}]>'.format(len(self._samples), self.window)
+
+    def observe(self, key, seconds: float):
+        with self._lock:
+            if key not in self._samples:
+                self._samples[key] = deque(maxlen=self.window)
+            self._samples[key].append(seconds)
+
+    def percentile(self, key, q: float) -> float:
+        with self._lock:
+            samples = list(self._samples.get(key, ()))
+
+        if len(samples) < self.min_samples:
+            return None
+
+        samples.sort()
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def timeout(self, key, default: float, shrink: bool = True) -> float:
+        # A multiple of the observed p99 within [floor, ceiling], the default until enough calls were seen.
+        # With shrink=False the result never goes below default (for calls that must not be cut short).
+        p99 = self.percentile(key, 0.99)
+
+        if p99 is None:
+            return default
+
+        timeout = min(self.ceiling, max(self.floor, self.factor * p99))
+
+        return timeout if shrink else max(default, timeout)
+
+
+def hedged(func, delay: float, pool) -> tuple:
+    # Runs func, and a second copy if the first has not finished after delay. The first successful result
+    # wins, the slower copy is left to finish in the background. Returns (result, hedged).
+    # The delay counts from when the first attempt starts running. An attempt that sat in the queue for
+    # longer than delay means the pool is saturated, and a copy would only add to the load, so none is sent.
+    started = threading.Event()
+    queued = [None]
+    submitted = time.monotonic()
+
+    def attempt():
+        queued[0] = time.monotonic() - submitted
+        started.set()
+        return func()
+
+    first = pool.submit(attempt)
+    started.wait()
+
+    done, _ = wait([first], timeout=delay)
+    if len(done) > 0 or queued[0] >= delay:
+        return first.result(), False
+
+    pending = {first, pool.submit(func)}
+    error = None
+
+    while len(pending) > 0:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            if future.exception() is None:
+                return future.result(), True
+            error = future.exception()
+
+    raise error
@@ -1,17 +1,25 @@
 from __future__ import annotations
+import os
 import re
 import pickle
-import gspread
-import markdown2
+import itertools
+from . import tracing
+from . import readers
+from . import export
 from . import preview_templates as tpls
-from bs4 import BeautifulSoup
 from .enums import FreshArticleType, FreshStatus, FreshVisibility
-from typing import List, Dict, Union
-from gspread.utils import rowcol_to_a1
-from oauth2client.service_account import ServiceAccountCredentials
+from typing import List, Dict, Union, Iterable
+from .sheets import UbeeSheetsWorkbook, authorize, rowcol_to_a1
+from .cache import SheetsCache
+
+CREDENTIALS_FILE = '/tmp/gapps_credentials.json'
 
 
 def textify(text: str) -> str:
+    # markdown2 and bs4 (with lxml) are imported on first use, API-only jobs never need them
+    import markdown2
+    from bs4 import BeautifulSoup
+
     # return re.sub(r'\s+', ' ', BeautifulSoup(s.replace('><', '> <')).get_text()).replace(' .', '.')
     return BeautifulSoup(markdown2.markdown(text), features="lxml").get_text().strip()
 
@@ -22,14 +30,23 @@ def filter_article_contents(text: str) -> str:
     # text, _ = re.subn(r'\s{2,}', r'<br>', text)
     # text, _ = re.subn(r'\s+([\!\.])', r'\1', text)
     # text, _ = re.subn(r'</li>\s?<br>', r'</li> ', text)
+    import markdown2
 
     return markdown2.markdown(text)
 
 
 def filter_article_desc_text(text: str) -> str:
+    import markdown2
+    from bs4 import BeautifulSoup
+
     return BeautifulSoup(markdown2.markdown(text), features="lxml").get_text().strip()
 
 
+def render_article_texts(texts: list) -> list:
+    # Process pool job: the markdown / text extraction pair for a chunk of article cells
+    return [(filter_article_contents(text), filter_article_desc_text(text)) for text in texts]
+
+
 def smart_cap(s: str, sep: str = ' ') -> str:
     return s
     # stop_words = ['a', 'the', 'in', 'to', 'on', 'of', 'over']
@@ -50,7 +67,8 @@ class UbeeFreshArticle:
                  gs_id: int = None,
                  gs_sheet: str = None,
                  gs_sheet_id: int = None,
-                 gs_range: str = None):
+                 gs_range: str = None,
+                 fd_state: dict = None):
 
         self.title = title
         self.desc = desc
@@ -66,6 +84,9 @@ class UbeeFreshArticle:
         self.fd_type = fd_type
         self.fd_status = fd_status
 
+        # Last known remote field values, lets updates send only what changed
+        self.fd_state = fd_state
+
         self.gs_id = gs_id
         self.gs_sheet_id = gs_sheet_id
         self.gs_sheet = gs_sheet
@@ -128,7 +149,8 @@ class UbeeFreshFolder:
                  gs_id: str = None,
                  gs_sheet: str = None,
                  gs_sheet_id: int = None,
-                 gs_range: str = None):
+                 gs_range: str = None,
+                 fd_state: dict = None):
 
         self.name = name
         self.desc = desc
@@ -139,6 +161,7 @@ class UbeeFreshFolder:
 
         self.fd_id = fd_id
         self.fd_visible = fd_visible
+        self.fd_state = fd_state
 
         self.gs_id = gs_id
         self.gs_sheet_id = gs_sheet_id
@@ -218,7 +241,8 @@ class UbeeFreshCategory:
                  gs_id: str = None,
                  gs_sheet: str = None,
                  gs_sheet_id: int = None,
-                 gs_range: str = None):
+                 gs_range: str = None,
+                 fd_state: dict = None):
 
         self.name = name
         self.desc = desc
@@ -230,6 +254,7 @@ class UbeeFreshCategory:
         self.fd_id = fd_id
         self.fd_portals = fd_portals if fd_portals is not None else list()
         self.fd_suffix = fd_suffix
+        self.fd_state = fd_state
 
         self.gs_id = gs_id
         self.gs_sheet = gs_sheet
@@ -307,15 +332,7 @@ class UbeeFreshCategory:
 
         gs_id = self.gs_id if self.gs_id is not None else self.parent.gs_id
 
-        scopes = ['https://spreadsheets.google.com/feeds',
-                  'https://www.googleapis.com/auth/drive']
-
-        credentials_file = '/tmp/gapps_credentials.json'
-
-        credentials = ServiceAccountCredentials.from_json_keyfile_name(credentials_file, scopes)
-        gc = gspread.authorize(credentials)
-
-        wb = gc.open_by_key(gs_id)
+        wb = authorize(CREDENTIALS_FILE).open_by_key(gs_id)
 
         cat_sheet = wb.worksheet(self.gs_sheet)
 
@@ -414,131 +431,368 @@ class UbeeFreshPortal:
         return origin, translations
 
     @classmethod
-    def from_gs(cls, gs_id, name: str = None) -> 'UbeeFreshPortal':
-        if gs_id is None:
-            raise ValueError('Need GS ID to ge specified')
+    def content_columns(cls, header: list) -> list:
+        # Column A (language row marker) plus the title/text block of every language
+        origin, translations = cls.init_contents([row if len(row) > 0 else [''] for row in header])
 
-        scopes = ['https://spreadsheets.google.com/feeds',
-                  'https://www.googleapis.com/auth/drive']
+        if origin is None:
+            return None
 
-        credentials_file = '/tmp/gapps_credentials.json'
+        return [(0, 1)] + [(lang_origin[1], lang_origin[1] + 3) for lang_origin in [origin] + list(translations.values())]
 
-        credentials = ServiceAccountCredentials.from_json_keyfile_name(credentials_file, scopes)
-        gc = gspread.authorize(credentials)
+    @classmethod
+    def article_texts(cls, vals: list) -> list:
+        # Distinct article text cells of a sheet, in order, for rendering ahead of parse_sheet
+        origin, translations = cls.init_contents([row if len(row) > 0 else [''] for row in vals])
 
-        wb = gc.open_by_key(gs_id)
+        if origin is None:
+            return []
 
-        portal = cls(name=name if name is not None else wb.title.strip(), gs_id=gs_id)
+        text_cols = [lang_origin[1] + 2 for lang_origin in [origin] + list(translations.values())]
+        texts = dict()
 
-        sheets = wb.worksheets()
+        for row in vals[origin[0] + 3:]:
+            if len(row) > origin[1] + 1 and row[origin[1] + 1] != '':
+                for col in text_cols:
+                    texts[row[col].strip() if len(row) > col else ''] = None
 
-        for sheet in sheets:
+        return list(texts)
 
-            print('Parsing sheet "{}"'.format(sheet.title))
+    @classmethod
+    def parse_sheet(cls,
+                    vals: list,
+                    gs_id: str = None,
+                    sheet_title: str = None,
+                    sheet_id: int = None,
+                    rendered: dict = None) -> 'UbeeFreshCategory':
 
-            vals = sheet.get_all_values()
-            n_rows = len(vals)
-            origin, translations = cls.init_contents(vals)
+        return cls.parse_rows(vals, gs_id=gs_id, sheet_title=sheet_title, sheet_id=sheet_id, rendered=rendered)
 
-            if origin is None:
-                print('\033[FParsing sheet "{}" - No contents found...'.format(sheet.title))
-                continue
+    @classmethod
+    def parse_rows(cls,
+                   rows: Iterable[list],
+                   gs_id: str = None,
+                   sheet_title: str = None,
+                   sheet_id: int = None,
+                   rendered: dict = None) -> 'UbeeFreshCategory':
+
+        # Rows are consumed once, top to bottom, so streamed sheets are never held in memory
+        rows = iter(rows)
+
+        head = []
+        for row in rows:
+            head.append(row if len(row) > 0 else [''])
+            if len(row) > 0 and row[0].lower() in cls.LANG_LIST:
+                break
+
+        origin, translations = cls.init_contents(head)
+
+        if origin is None:
+            print('\033[FParsing sheet "{}" - No contents found...'.format(sheet_title))
+            return None
 
-            category = UbeeFreshCategory(
-                name=smart_cap(vals[origin[0] + 1][origin[1]]),
-                desc=vals[origin[0] + 2][origin[1]],
-                gs_id=gs_id,
-                gs_sheet=sheet.title,
-                gs_sheet_id=sheet.id,
-                gs_range=rowcol_to_a1(origin[0] + 2, origin[1] + 1),
-                fd_id=vals[origin[0] + 1][origin[1] + 1] if vals[origin[0] + 1][origin[1] + 1] != '' else None
+        width = max([origin[1]] + [lang_origin[1] for lang_origin in translations.values()]) + 3
+
+        def padded(row: list) -> list:
+            return row if len(row) >= width else list(row) + [''] * (width - len(row))
+
+        # rendered maps article text to (desc, desc_text) when that was done ahead, e.g. in a process pool
+        def render(text: str) -> tuple:
+            if rendered is not None and text in rendered:
+                return rendered[text]
+
+            return filter_article_contents(text), filter_article_desc_text(text)
+
+        name_row = padded(next(rows, []))
+        desc_row = padded(next(rows, []))
+
+        category = UbeeFreshCategory(
+            name=smart_cap(name_row[origin[1]]),
+            desc=desc_row[origin[1]],
+            gs_id=gs_id,
+            gs_sheet=sheet_title,
+            gs_sheet_id=sheet_id,
+            gs_range=rowcol_to_a1(origin[0] + 2, origin[1] + 1),
+            fd_id=name_row[origin[1] + 1] if name_row[origin[1] + 1] != '' else None
+        )
+
+        for lang, lang_origin in translations.items():
+            translation_name = smart_cap(name_row[lang_origin[1]])
+            translation_desc = desc_row[lang_origin[1]]
+
+            category.add_translation(
+                lang,
+                UbeeFreshCategory(
+                    name=translation_name,
+                    desc=translation_desc,
+                    lang=lang,
+                    gs_id=gs_id,
+                    gs_sheet=sheet_title,
+                    gs_sheet_id=sheet_id,
+                    gs_range=rowcol_to_a1(origin[0] + 1, lang_origin[1] + 1)
+                )
             )
 
-            portal.add_category(category)
+        try:
+            folder = None
+            for row_no, row in enumerate(rows, start=origin[0] + 3):
+                row = padded(row)
 
-            for lang, lang_origin in translations.items():
-                translation_name = smart_cap(vals[lang_origin[0] + 1][lang_origin[1]])
-                translation_desc = vals[lang_origin[0] + 2][lang_origin[1]]
+                if row[origin[1]] != '':
+                    folder_name = row[origin[1]].strip()
 
-                category.add_translation(
-                    lang,
-                    UbeeFreshCategory(
-                        name=translation_name,
-                        desc=translation_desc,
-                        lang=lang,
+                    folder = UbeeFreshFolder(
+                        name=folder_name,
                         gs_id=gs_id,
-                        gs_sheet=sheet.title,
-                        gs_sheet_id=sheet.id,
-                        gs_range=rowcol_to_a1(origin[0] + 1, lang_origin[1] + 1)
-                    )
-                )
+                        gs_sheet=sheet_title,
+                        gs_sheet_id=sheet_id,
+                        gs_range=rowcol_to_a1(row_no + 1, origin[1] + 1))
+
+                    category.add_folder(folder)
 
-            try:
-                folder = None
-                for row in range(origin[0] + 3, n_rows):
-                    if vals[row][origin[1]] != '':
-                        folder_name = vals[row][origin[1]].strip()
+                    for lang, lang_origin in translations.items():
 
-                        folder = UbeeFreshFolder(
-                            name=folder_name,
-                            gs_id=gs_id,
-                            gs_sheet=sheet.title,
-                            gs_sheet_id=sheet.id,
-                            gs_range=rowcol_to_a1(row + 1, origin[1] + 1))
+                        folder_name = row[lang_origin[1]].strip()
 
-                        category.add_folder(folder)
+                        folder.add_translation(
+                            lang=lang,
+                            translation=UbeeFreshFolder(
+                                name=folder_name,
+                                gs_id=gs_id,
+                                gs_sheet=sheet_title,
+                                gs_sheet_id=sheet_id,
+                                gs_range=rowcol_to_a1(row_no + 1, lang_origin[1] + 1)
+                            )
+                        )
 
-                        for lang, lang_origin in translations.items():
+                if row[origin[1] + 1] != '':
+                    article_title = row[origin[1] + 1].strip()
+                    article_desc, article_desc_text = render(row[origin[1] + 2].strip())
 
-                            folder_name = vals[row][lang_origin[1]].strip()
+                    article = UbeeFreshArticle(
+                        title=article_title,
+                        desc=article_desc,
+                        desc_text=article_desc_text,
+                        gs_id=gs_id,
+                        gs_sheet=sheet_title,
+                        gs_sheet_id=sheet_id,
+                        gs_range=rowcol_to_a1(row_no + 1, origin[1] + 2)
+                    )
 
-                            folder.add_translation(
+                    folder.add_article(article)
+
+                    for lang, lang_origin in translations.items():
+                        article_title = row[lang_origin[1] + 1].strip()
+                        article_desc, article_desc_text = render(row[lang_origin[1] + 2].strip())
+
+                        article.add_translation(
+                            lang=lang,
+                            translation=UbeeFreshArticle(
+                                title=article_title,
+                                desc=article_desc,
+                                desc_text=article_desc_text,
                                 lang=lang,
-                                translation=UbeeFreshFolder(
-                                    name=folder_name,
-                                    gs_id=gs_id,
-                                    gs_sheet=sheet.title,
-                                    gs_sheet_id=sheet.id,
-                                    gs_range=rowcol_to_a1(row + 1, lang_origin[1] + 1)
-                                )
+                                gs_id=gs_id,
+                                gs_sheet=sheet_title,
+                                gs_sheet_id=sheet_id,
+                                gs_range=rowcol_to_a1(row_no + 1, lang_origin[1] + 2)
                             )
-
-                    if vals[row][origin[1] + 1] != '':
-                        article_title = vals[row][origin[1] + 1].strip()
-                        article_text = vals[row][origin[1] + 2].strip()
-
-                        article = UbeeFreshArticle(
-                            title=article_title,
-                            desc=filter_article_contents(article_text),
-                            desc_text=filter_article_desc_text(article_text),
-                            gs_id=gs_id,
-                            gs_sheet=sheet.title,
-                            gs_sheet_id=sheet.id,
-                            gs_range=rowcol_to_a1(row + 1, origin[1] + 2)
                         )
 
-                        folder.add_article(article)
+        except IndexError as e:
+            print('Failed to parse the sheet: {}'.format(e.args[0]))
 
-                        for lang, lang_origin in translations.items():
-                            article_title = vals[row][lang_origin[1] + 1].strip()
-                            article_text = vals[row][lang_origin[1] + 2].strip()
+        return category
 
-                            article.add_translation(
-                                lang=lang,
-                                translation=UbeeFreshArticle(
-                                    title=article_title,
-                                    desc=filter_article_contents(article_text),
-                                    desc_text=filter_article_desc_text(article_text),
-                                    lang=lang,
-                                    gs_id=gs_id,
-                                    gs_sheet=sheet.title,
-                                    gs_sheet_id=sheet.id,
-                                    gs_range=rowcol_to_a1(row + 1, lang_origin[1] + 2)
-                                )
-                            )
+    @classmethod
+    @tracing.traced(tracing.PARSE)
+    def from_file(cls, path: str, name: str = None, **kwargs) -> 'UbeeFreshPortal':
+        # Offline counterpart of from_gs for XLSX/ODS/CSV exports (or a directory of CSVs, one per sheet)
+        portal = cls(name=name if name is not None else os.path.splitext(os.path.basename(path.rstrip(os.sep)))[0])
+
+        for index, (title, rows) in enumerate(readers.iter_sheets(path, **kwargs)):
+            with tracing.span('sheet', tracing.PARSE, sheet=title):
+                print('Parsing sheet "{}"'.format(title))
+
+                category = cls.parse_rows(rows, sheet_title=title, sheet_id=index)
+
+            if category is not None:
+                portal.add_category(category)
+
+        return portal
+
+    @classmethod
+    @tracing.traced(tracing.PARSE)
+    def from_gs(cls,
+                gs_id,
+                name: str = None,
+                cache_dir: str = None,
+                pruned: bool = True,
+                max_workers: int = None) -> 'UbeeFreshPortal':
+
+        if gs_id is None:
+            raise ValueError('Need GS ID to ge specified')
+
+        if cache_dir is not None:
+            workbook, _ = SheetsCache(cache_dir).fetch(gs_id, credentials_file=CREDENTIALS_FILE)
+        elif pruned:
+            workbook = UbeeSheetsWorkbook().fetch_columns(cls.content_columns, gs_id, credentials_file=CREDENTIALS_FILE)
+        else:
+            workbook = UbeeSheetsWorkbook().fetch_data(gs_id, credentials_file=CREDENTIALS_FILE)
+
+        return cls.from_workbook(workbook, name=name, max_workers=max_workers)
+
+    @classmethod
+    def from_workbook(cls,
+                      workbook: UbeeSheetsWorkbook,
+                      name: str = None,
+                      max_workers: int = None,
+                      chunk_rows: int = 500) -> 'UbeeFreshPortal':
+
+        title = workbook.title.strip() if workbook.title is not None else None
+        portal = cls(name=name if name is not None else title, gs_id=workbook.gsid)
+
+        # Sequential unless asked for, a process pool only pays off for big workbooks and must not be
+        # started from every threaded caller
+        if max_workers is None or max_workers <= 1:
+            for sheet in workbook.sheets:
+                with tracing.span('sheet', tracing.PARSE, sheet=sheet.name):
+                    print('Parsing sheet "{}"'.format(sheet.name))
+
+                    with tracing.span('get_all_values', tracing.HTTP, sheet=sheet.name):
+                        vals = sheet.data
+
+                    category = cls.parse_sheet(vals, gs_id=workbook.gsid, sheet_title=sheet.name,
+                                               sheet_id=sheet.sheet_id)
+
+                if category is not None:
+                    portal.add_category(category)
+
+            return portal
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Sheets are parsed in worker processes. Sheets longer than chunk_rows get their article texts
+        # rendered in chunks across the pool instead and are assembled here, so one big tab uses every core.
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            jobs = []
+
+            for sheet in workbook.sheets:
+                print('Parsing sheet "{}"'.format(sheet.name))
+
+                with tracing.span('get_all_values', tracing.HTTP, sheet=sheet.name):
+                    vals = sheet.data
+
+                if len(vals) > chunk_rows:
+                    texts = cls.article_texts(vals)
+                    chunk = max(1, min(chunk_rows, -(-len(texts) // max_workers)))
+                    futures = [pool.submit(render_article_texts, texts[i:i + chunk])
+                               for i in range(0, len(texts), chunk)]
+
+                    jobs.append((sheet, vals, texts, futures))
+                else:
+                    jobs.append((sheet, None, None, [pool.submit(
+                        cls.parse_sheet, vals, gs_id=workbook.gsid, sheet_title=sheet.name, sheet_id=sheet.sheet_id)]))
+
+            # Collect in sheet order so the portal matches the sequential result
+            for sheet, vals, texts, futures in jobs:
+                with tracing.span('sheet', tracing.PARSE, sheet=sheet.name):
+                    if vals is None:
+                        category = futures[0].result()
+                    else:
+                        rendered = dict(zip(texts, itertools.chain.from_iterable(f.result() for f in futures)))
+                        category = cls.parse_sheet(vals, gs_id=workbook.gsid, sheet_title=sheet.name,
+                                                   sheet_id=sheet.sheet_id, rendered=rendered)
+
+                if category is not None:
+                    portal.add_category(category)
+
+        return portal
+
+    @classmethod
+    def from_records(cls,
+                     records: Iterable[dict],
+                     name: str = None,
+                     portal: 'UbeeFreshPortal' = None) -> 'UbeeFreshPortal':
+
+        # Builds the tree from node records as yielded by UbeeFreshAPI.iter_portal or stored by a SnapshotSink.
+        # With portal given, records are added to it and may hang below its existing categories and folders.
+        portal = portal if portal is not None else cls(name=name)
+        nodes = dict()
+
+        for category in portal.categories:
+            nodes[('category', category.fd_id)] = category
+            for folder in category.folders:
+                nodes[('folder', folder.fd_id)] = folder
+
+        for record in records:
+            data = record['data']
+            kind = record['type']
+            node = nodes.get((kind, record['id']))
+
+            if kind == 'category':
+                category = UbeeFreshCategory(
+                    name=data.get('name'),
+                    desc=data.get('description'),
+                    parent=portal if record['lang'] is None else node,
+                    fd_id=data.get('id'),
+                    fd_portals=data.get('visible_in_portals'),
+                    fd_state={key: data.get(key) for key in ('name', 'description')}
+                )
+
+                if record['lang'] is None:
+                    portal.add_category(category)
+                    nodes[(kind, record['id'])] = category
+                elif node is not None:
+                    node.add_translation(lang=record['lang'], translation=category)
+
+            elif kind == 'folder':
+                folder = UbeeFreshFolder(
+                    name=data.get('name'),
+                    desc=data.get('description'),
+                    parent=nodes.get(('category', record['parent_id'])) if record['lang'] is None else node,
+                    fd_id=data.get('id'),
+                    fd_visible=data.get('visible') == 1,
+                    fd_state={key: data.get(key) for key in ('name', 'description', 'visibility')}
+                )
+
+                if record['lang'] is None:
+                    if folder.parent is not None:
+                        folder.parent.add_folder(folder)
+                    nodes[(kind, record['id'])] = folder
+                elif node is not None:
+                    node.add_translation(lang=record['lang'], translation=folder)
+
+            elif kind == 'article':
+                # Freshdesk sends plain ints, unknown values fall back to the defaults
+                try:
+                    status = FreshStatus(data.get('status'))
+                except ValueError:
+                    status = FreshStatus.PUBLISHED
+
+                try:
+                    typ = FreshArticleType(data.get('type'))
+                except ValueError:
+                    typ = FreshArticleType.PERMANENT
+
+                article = UbeeFreshArticle(
+                    title=data.get('title'),
+                    desc=data.get('description'),
+                    # Freshdesk sends the plain text along, saves parsing every body again
+                    desc_text=data.get('description_text'),
+                    parent=nodes.get(('folder', record['parent_id'])) if record['lang'] is None else node,
+                    fd_id=data.get('id'),
+                    fd_status=status,
+                    fd_type=typ,
+                    fd_state={key: data.get(key) for key in ('title', 'description', 'status', 'type')}
+                )
 
-            except IndexError as e:
-                print('Failed to parse the sheet: {}'.format(e.args[0]))
+                if record['lang'] is None:
+                    if article.parent is not None:
+                        article.parent.add_article(article)
+                    nodes[(kind, record['id'])] = article
+                elif node is not None:
+                    node.add_translation(lang=record['lang'], translation=article)
 
         return portal
 
@@ -565,10 +819,14 @@ class UbeeFreshPortal:
 
         if isinstance(data, cls):
             return data
+        elif export.is_snapshot_header(data):
+            with in_file:
+                return cls.from_records(export.read_snapshot_records(in_file), name=data.get('name'))
         else:
             print('Data read from {} is not a UbeeFreshPortal! Load failed...'.format(file))
             return None
 
+    @tracing.traced(tracing.RENDER)
     def render_preview(self, file: str = 'preview.html'):
 
         print('Rendering preview of {} to {}...'.format(self.name, file))
@@ -0,0 +1,264 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import tracing
+from . import ubeefresh as uf
+from .cache import SheetsCache, spreadsheet_revision
+from .sheets import authorize
+
+
+def node_ids(category: uf.UbeeFreshCategory) -> dict:
+    # What carry_over needs of a pushed tab, per node its name, sheet range, Freshdesk ID and remote state
+    def entry(node, name: str, children: list = None) -> dict:
+        return {'name': name, 'gs_range': node.gs_range, 'fd_id': node.fd_id,
+                'fd_state': getattr(node, 'fd_state', None),
+                'translations': {lang: getattr(t, 'fd_state', None) for lang, t in node.translations.items()},
+                'children': children if children is not None else []}
+
+    return entry(category, category.name, [
+        entry(folder, folder.name, [entry(article, article.title) for article in folder.articles])
+        for folder in category.folders])
+
+
+def match_nodes(old: list, new: list, name) -> list:
+    # Written-back Freshdesk ID first, then the same name, then a node left over at the same sheet position
+    # (renamed in the sheet). Position goes last, a row inserted above would shift it for every later row.
+    pairs = []
+    used = set()
+
+    def text_id(fd_id):
+        return str(fd_id) if fd_id is not None else None
+
+    for old_key, new_key in ((lambda o: text_id(o['fd_id']), lambda n: text_id(n.fd_id)),
+                             (lambda o: o['name'], name),
+                             (lambda o: o['gs_range'], lambda n: n.gs_range)):
+        index = dict()
+        for i, entry in enumerate(old):
+            if i not in used and old_key(entry) is not None:
+                index.setdefault(old_key(entry), i)
+
+        left = []
+        for node in new:
+            i = index.get(new_key(node)) if new_key(node) is not None else None
+
+            if i is None or i in used:
+                left.append(node)
+                continue
+
+            used.add(i)
+            pairs.append((old[i], node))
+
+        new = left
+
+    return pairs
+
+
+def carry_over(old: dict, new: uf.UbeeFreshCategory):
+    # Copies Freshdesk IDs and known remote state from the previous parse of a tab (see node_ids)
+    def copy(src, dst):
+        # An ID written back to the sheet wins, the state only goes with its own node
+        if dst.fd_id is None:
+            dst.fd_id = src['fd_id']
+
+        # Sheet cells hold IDs as text
+        if str(dst.fd_id) != str(src['fd_id']):
+            return
+
+        dst.fd_state = src['fd_state']
+
+        for lang, translation in dst.translations.items():
+            translation.fd_state = src['translations'].get(lang)
+
+    copy(old, new)
+
+    for old_folder, folder in match_nodes(old['children'], new.folders, lambda n: n.name):
+        copy(old_folder, folder)
+
+        for old_article, article in match_nodes(old_folder['children'], folder.articles, lambda n: n.title):
+            copy(old_article, article)
+
+
+class SheetWatcher:
+    def __init__(self,
+                 gsid: str,
+                 fd,
+                 cache_dir: str = None,
+                 interval: float = 15.0,
+                 debounce: float = 20.0,
+                 max_delay: float = 60.0,
+                 max_workers: int = 4,
+                 max_retry_delay: float = 300.0,
+                 suffix: str = None,
+                 credentials_file: str = None,
+                 client=None):
+
+        self.gsid = gsid
+        self.fd = fd
+        # Its own cache by default, a cache that other tools already brought up to date would hide changes
+        self.cache = SheetsCache(cache_dir if cache_dir is not None else '~/.cache/ubeefresh/watch')
+        self.interval = interval
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.max_workers = max_workers
+        self.max_retry_delay = max_retry_delay
+        self.suffix = suffix
+
+        self.client = client if client is not None else authorize(credentials_file)
+
+        # Freshdesk IDs and remote state per tab (see node_ids), the parsed contents are not kept between syncs
+        self.known = dict()
+
+        self.revision = None
+        self.syncs = 0
+        # Tabs whose last push failed, retried after a delay that doubles with every failed attempt
+        self.failed = []
+        self.retries = 0
+        self._retry_at = None
+        self._changed_at = None
+        self._first_change_at = None
+        self._spreadsheet = None
+        self._stop = threading.Event()
+
+    def __repr__(self):
+        return '<SheetWatcher {} [rev {}, {} tabs, {} syncs]>'.format(
+            self.gsid, self.revision, len(self.known), self.syncs)
+
+    def poll(self) -> str:
+        # One metadata call, the values are only downloaded on sync
+        if self._spreadsheet is None:
+            self._spreadsheet = self.client.open_by_key(self.gsid)
+
+        return spreadsheet_revision(self._spreadsheet)
+
+    def due(self, now: float = None) -> bool:
+        # Edits come in bursts, wait until the revision has been stable for debounce seconds
+        # (but never longer than max_delay after the first unsynced edit)
+        now = now if now is not None else time.monotonic()
+        revision = self.poll()
+
+        if revision != self.revision:
+            if self._first_change_at is None:
+                self._first_change_at = now
+            self._changed_at = now
+            self.revision = revision
+
+        if self._changed_at is not None:
+            return now - self._changed_at >= self.debounce or now - self._first_change_at >= self.max_delay
+
+        return len(self.failed) > 0 and now >= self._retry_at
+
+    @tracing.traced(tracing.UPLOAD, name='watch.sync')
+    def sync(self) -> list:
+        # The cache only records a tab as seen once it was pushed, a failed fetch leaves the debounce state
+        # as it was and the next poll tries again
+        workbook, changed = self.cache.fetch(self.gsid, client=self.client, commit=False)
+        pushed = []
+        failed = []
+
+        for title in list(dict.fromkeys(self.failed + changed)):
+            if title not in workbook:
+                print('Sheet "{}" was removed, its Freshdesk contents are left in place'.format(title))
+                self.known.pop(title, None)
+                continue
+
+            sheet = workbook.get_sheet(title)
+            category = uf.UbeeFreshPortal.parse_sheet(sheet.data, gs_id=workbook.gsid, sheet_title=sheet.name,
+                                                      sheet_id=sheet.sheet_id)
+
+            if category is None:
+                continue
+
+            if self.suffix is not None:
+                category.fd_suffix = self.suffix
+
+            if title in self.known:
+                carry_over(self.known[title], category)
+
+            try:
+                ok = self.push(category)
+            except Exception as e:
+                print('Cannot push sheet "{}": {}'.format(title, e))
+                ok = False
+
+            # Kept either way, the IDs of whatever got created are not lost
+            self.known[title] = node_ids(category)
+
+            if ok:
+                pushed.append(title)
+            else:
+                failed.append(title)
+
+        self.cache.commit(self.gsid, skip=failed)
+        self.failed = failed
+        self.retries = self.retries + 1 if len(failed) > 0 else 0
+        self._retry_at = time.monotonic() + min(self.interval * 2 ** (self.retries - 1), self.max_retry_delay) \
+            if len(failed) > 0 else None
+        self._changed_at = None
+        self._first_change_at = None
+        self.syncs += 1
+
+        return pushed
+
+    def push(self, category: uf.UbeeFreshCategory) -> bool:
+        # New nodes are created (or adopted by name), then every node gets a change-only update,
+        # unchanged ones cost no request at all
+        if category.fd_id is None:
+            self.fd.create_category(category=category, create_folders=False, create_translations=True)
+
+        if category.fd_id is None:
+            print('Cannot push category {}...'.format(category.name))
+            return False
+
+        ok = self.fd.update_category(category, update_translations=True)
+
+        # Folders go to Freshdesk in parallel, the API's index of existing nodes is shared under a lock
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for folder_ok in pool.map(self.push_folder, category.folders):
+                ok = folder_ok and ok
+
+        return ok
+
+    def push_folder(self, folder: uf.UbeeFreshFolder) -> bool:
+        if folder.fd_id is None:
+            self.fd.create_folder(folder=folder, create_translations=True, create_articles=False)
+
+        if folder.fd_id is None:
+            print('Cannot push folder {}...'.format(folder.name))
+            return False
+
+        ok = self.fd.update_folder(folder, update_translations=True)
+
+        for article in folder.articles:
+            if article.fd_id is None:
+                self.fd.create_article(article=article, create_translations=True)
+
+            if article.fd_id is None:
+                print('Cannot push article {}...'.format(article.title))
+                ok = False
+                continue
+
+            ok = self.fd.update_article(article, update_translations=True) and ok
+
+        return ok
+
+    def run(self, iterations: int = None):
+        n = 0
+
+        while not self._stop.is_set() and (iterations is None or n < iterations):
+            try:
+                if self.due():
+                    pushed = self.sync()
+                    print('Synced revision {}: {}'.format(self.revision, ', '.join(pushed) if pushed else 'no changes'))
+                    if len(self.failed) > 0:
+                        print('Will retry in {:.0f}s: {}'.format(self._retry_at - time.monotonic(),
+                                                                  ', '.join(self.failed)))
+            except Exception as e:
+                # Keep watching, the next poll retries
+                print('Sync failed: {}'.format(e))
+
+            n += 1
+            self._stop.wait(self.interval)
+
+    def stop(self):
+        self._stop.set()